@@ -1,3 +1,119 @@
-from LavaTopPayment.lava_top import *
-from LavaTopPayment.models import *
-from LavaTopPayment.models.types import *
\ No newline at end of file
+"""
+Клиент Lava.top. Имена пакета загружаются при первом обращении (PEP 562):
+import LavaTopPayment не тянет httpx и модели, а from LavaTopPayment import
+WebhookReceiver загружает только приём вебхуков и его модели.
+"""
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Dict, List
+
+_EXPORTS: Dict[str, tuple] = {
+    'lava_top': ('LavaTop',),
+    'lava_top_sync': ('LavaTopSync',),
+    'poller': ('InvoicePoller', 'StatusChange', 'TERMINAL_STATUSES'),
+    'webhook_receiver': ('WebhookReceiver', 'RecentIds'),
+    'webhook_reconciler': ('WebhookReconciler', 'WebhookSpec',
+                           'WebhookPlan', 'WebhookAction'),
+    'webhook_history': ('WebhookHistoryScanner', 'WebhookStats',
+                        'ScanResult'),
+    'sales_store': ('SalesStore', 'SalesSync', 'StoredSale'),
+    'subscriptions': ('SubscriptionTracker', 'Subscription'),
+    'tenants': ('TenantManager', 'FairScheduler', 'TenantQueue'),
+    'instrumentation': ('Instrumentation', 'MetricsCollector',
+                        'OpenTelemetryInstrumentation',
+                        'PrometheusInstrumentation', 'RequestEvent',
+                        'PoolStatus'),
+    'aggregation': ('SalesSummary', 'aggregate_sales'),
+    'batch': ('InvoiceBatch', 'CancellationBatch', 'Cancellation',
+              'BatchResult'),
+    'cache': ('CatalogCache', 'CatalogSnapshot', 'OfferEntry'),
+    'disk_cache': ('DiskCache', 'DiskCacheStats'),
+    'export': ('RawPage', 'ReportColumns', 'SalesColumns'),
+    'emulator': ('GatewayEmulator', 'Faults', 'RecordingTransport'),
+    'records': ('SaleRecord', 'DeliveryRecord', 'AmountRecord',
+                'BuyerRecord', 'RecordPool'),
+    'limits': ('RateLimiter',),
+    'retry': ('RetryPolicy', 'RequestStats'),
+    'models.types': ('FeedItemType', 'ProductType', 'PostType',
+                     'FeedVisibility', 'Currency', 'ContractStatusDto',
+                     'Language', 'PaymentMethod', 'AmountTotalDto',
+                     'BuyerDto', 'WebhookEventTypeDto', 'WebhookAuthTypeDto'),
+    'models.products': ('PriceDto', 'OfferResponse', 'ProductItemResponse',
+                        'PostItemResponse', 'ProductsResponse', 'Invoice',
+                        'InvoiceRequest'),
+    'models.reports': ('PartnerSaleDto', 'ReportsResponses',
+                       'PartnerSaleDetailsDto', 'PartnerSalesPageDto',
+                       'Reports'),
+    'models.webhooks': ('WebhookAuthRequest', 'WebhookCreateRequest',
+                        'WebhookResponse', 'WebhookUpdateRequest',
+                        'ErrorResponse', 'WebhookDeliveryResponse',
+                        'WebhookHistoryResponse', 'WebhookProductDto',
+                        'WebhookBuyerDto', 'WebhookEvent'),
+    'models.donate': ('Donate',),
+}
+
+_MODULES: Dict[str, str] = {
+    name: module for module, names in _EXPORTS.items() for name in names
+}
+
+__all__: List[str] = list(_MODULES)
+
+
+def __getattr__(name: str) -> Any:
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(
+            f'module {__name__!r} has no attribute {name!r}'
+        )
+    value = getattr(import_module(f'{__name__}.{module}'), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:  # pragma: no cover
+    from LavaTopPayment.aggregation import SalesSummary, aggregate_sales
+    from LavaTopPayment.batch import BatchResult, Cancellation, \
+        CancellationBatch, InvoiceBatch
+    from LavaTopPayment.cache import CatalogCache, CatalogSnapshot, OfferEntry
+    from LavaTopPayment.disk_cache import DiskCache, DiskCacheStats
+    from LavaTopPayment.emulator import Faults, GatewayEmulator, \
+        RecordingTransport
+    from LavaTopPayment.export import RawPage, ReportColumns, SalesColumns
+    from LavaTopPayment.instrumentation import Instrumentation, \
+        MetricsCollector, OpenTelemetryInstrumentation, PoolStatus, \
+        PrometheusInstrumentation, RequestEvent
+    from LavaTopPayment.lava_top import LavaTop
+    from LavaTopPayment.lava_top_sync import LavaTopSync
+    from LavaTopPayment.limits import RateLimiter
+    from LavaTopPayment.models.donate import Donate
+    from LavaTopPayment.models.products import Invoice, InvoiceRequest, \
+        OfferResponse, PostItemResponse, PriceDto, ProductItemResponse, \
+        ProductsResponse
+    from LavaTopPayment.models.reports import PartnerSaleDetailsDto, \
+        PartnerSaleDto, PartnerSalesPageDto, Reports, ReportsResponses
+    from LavaTopPayment.models.types import AmountTotalDto, BuyerDto, \
+        ContractStatusDto, Currency, FeedItemType, FeedVisibility, Language, \
+        PaymentMethod, PostType, ProductType, WebhookAuthTypeDto, \
+        WebhookEventTypeDto
+    from LavaTopPayment.models.webhooks import ErrorResponse, \
+        WebhookAuthRequest, WebhookBuyerDto, WebhookCreateRequest, \
+        WebhookDeliveryResponse, WebhookEvent, WebhookHistoryResponse, \
+        WebhookProductDto, WebhookResponse, WebhookUpdateRequest
+    from LavaTopPayment.records import AmountRecord, BuyerRecord, \
+        DeliveryRecord, RecordPool, SaleRecord
+    from LavaTopPayment.poller import InvoicePoller, StatusChange, \
+        TERMINAL_STATUSES
+    from LavaTopPayment.retry import RetryPolicy, RequestStats
+    from LavaTopPayment.sales_store import SalesStore, SalesSync, StoredSale
+    from LavaTopPayment.subscriptions import Subscription, \
+        SubscriptionTracker
+    from LavaTopPayment.tenants import FairScheduler, TenantManager, \
+        TenantQueue
+    from LavaTopPayment.webhook_history import ScanResult, \
+        WebhookHistoryScanner, WebhookStats
+    from LavaTopPayment.webhook_reconciler import WebhookAction, \
+        WebhookPlan, WebhookReconciler, WebhookSpec
+    from LavaTopPayment.webhook_receiver import RecentIds, WebhookReceiver
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from LavaTopPayment.lava_top import LavaTop
+
+
+class Totals:
+    """Количество и сумма продаж"""
+    __slots__ = ('count', 'amount')
+
+    def __init__(self, count: int = 0, amount: float = 0.0):
+        self.count = count
+        self.amount = amount
+
+    def add(self, count: int, amount: float) -> None:
+        self.count += count
+        self.amount += amount
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Totals) and \
+            (self.count, self.amount) == (other.count, other.amount)
+
+    def __repr__(self) -> str:
+        return f'Totals(count={self.count}, amount={self.amount})'
+
+
+class SalesSummary:
+    """
+    Итоги продаж в разрезе продукт / валюта / статус.
+    Складывается из продаж по одной (add), объединяется с итогами
+    других запусков (merge или +) и сохраняется через to_dict / from_dict.
+    Сами продажи не хранятся.
+    """
+
+    def __init__(self):
+        self.cells: Dict[Tuple[str, str, str], Totals] = {}
+
+    def add(self, product_id: str, currency: str, status: str,
+            amount: float, count: int = 1) -> None:
+        key = (product_id, currency, status)
+        totals = self.cells.get(key)
+        if totals is None:
+            totals = self.cells[key] = Totals()
+        totals.add(count, amount)
+
+    def add_sales(self, product_id: str,
+                  items: Iterable[Dict[str, Any]]) -> None:
+        """
+        Добавить продажи в виде словарей PartnerSaleDetailsDto.
+        """
+        for item in items:
+            amount_total = item['amountTotal']
+            self.add(product_id, amount_total['currency'], item['status'],
+                     amount_total['amount'])
+
+    def merge(self, other: 'SalesSummary') -> 'SalesSummary':
+        for (product_id, currency, status), totals in other.cells.items():
+            self.add(product_id, currency, status, totals.amount, totals.count)
+        return self
+
+    def __add__(self, other: 'SalesSummary') -> 'SalesSummary':
+        return SalesSummary().merge(self).merge(other)
+
+    def _group(self, position: int) -> Dict[str, Totals]:
+        result: Dict[str, Totals] = {}
+        for key, totals in self.cells.items():
+            group = result.get(key[position])
+            if group is None:
+                group = result[key[position]] = Totals()
+            group.add(totals.count, totals.amount)
+        return result
+
+    def by_product(self) -> Dict[str, Totals]:
+        return self._group(0)
+
+    def by_currency(self) -> Dict[str, Totals]:
+        return self._group(1)
+
+    def by_status(self) -> Dict[str, Totals]:
+        return self._group(2)
+
+    @property
+    def count(self) -> int:
+        return sum(totals.count for totals in self.cells.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'cells': [
+            {'productId': product_id, 'currency': currency, 'status': status,
+             'count': totals.count, 'amount': totals.amount}
+            for (product_id, currency, status), totals in self.cells.items()
+        ]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SalesSummary':
+        summary = cls()
+        for cell in data['cells']:
+            summary.add(cell['productId'], cell['currency'], cell['status'],
+                        cell['amount'], cell['count'])
+        return summary
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, SalesSummary) and self.cells == other.cells
+
+    def __repr__(self) -> str:
+        return f'SalesSummary(products={len(self.by_product())}, ' \
+               f'count={self.count})'
+
+
+async def aggregate_sales(
+    client: 'LavaTop',
+    product_ids: Optional[Iterable[str]] = None,
+    concurrency: int = 8,
+    page_size: int = 500,
+    prefetch: int = 2,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None
+) -> SalesSummary:
+    """
+    Итоги продаж по продуктам. Продажи продуктов загружаются параллельно
+    (не больше concurrency продуктов сразу), каждая страница сразу
+    сворачивается в итоги и отбрасывается.
+    :param client: LavaTop
+    :param product_ids: Продукты, по умолчанию все из get_sales
+    :param concurrency: Сколько продуктов загружать одновременно
+    :param page_size: Размер страницы
+    :param prefetch: Сколько страниц продукта загружать наперёд
+    :param from_date: Начало периода продаж
+    :param to_date: Конец периода продаж
+    :return: SalesSummary
+    """
+    if product_ids is None:
+        product_ids = [item.productId async for item in client.iter_sales()]
+    summary = SalesSummary()
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def one(product_id: str) -> None:
+        async with semaphore:
+            async for page in client.iter_sales_by_product_pages(
+                product_id,
+                size=page_size,
+                from_date=from_date,
+                to_date=to_date,
+                prefetch=prefetch
+            ):
+                summary.add_sales(product_id, page.items)
+
+    await asyncio.gather(*(one(product_id) for product_id in product_ids))
+    return summary
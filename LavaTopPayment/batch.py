@@ -0,0 +1,348 @@
+import asyncio
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, \
+    Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import httpx
+
+from LavaTopPayment.limits import RateLimiter
+from LavaTopPayment.models.products import Invoice, InvoiceRequest
+from LavaTopPayment.models.types import ContractStatusDto
+
+if TYPE_CHECKING:
+    from LavaTopPayment.lava_top import LavaTop
+    from LavaTopPayment.subscriptions import SubscriptionTracker
+
+
+class BatchResult(NamedTuple):
+    """Результат одного элемента пакета"""
+    index: int
+    request: Any
+    result: Optional[Any] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchStats:
+    """Итоги пакета"""
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.succeeded = 0
+        self.failed = 0
+        self.throttled_seconds = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.succeeded + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None \
+            else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.total / elapsed if elapsed > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f'BatchStats(total={self.total}, succeeded={self.succeeded}, '
+            f'failed={self.failed}, elapsed={self.elapsed:.3f}s, '
+            f'per_second={self.per_second:.1f})'
+        )
+
+
+class Batch:
+    """
+    Параллельная обработка пакета запросов.
+    Результаты отдаются в порядке завершения, ошибка одного элемента
+    не прерывает пакет. После обхода итоги лежат в stats.
+    """
+
+    def __init__(
+        self,
+        requests: Union[Iterable[Any], AsyncIterable[Any]],
+        concurrency: int = 10,
+        rate: Optional[float] = None,
+        burst: int = 1
+    ):
+        """
+        :param requests: Запросы, обычный или асинхронный итератор
+        :param concurrency: Сколько запросов выполнять одновременно
+        :param rate: Ограничение запросов в секунду
+        :param burst: Сколько запросов можно отправить подряд сверх rate
+        """
+        self._requests = requests
+        self.concurrency = max(concurrency, 1)
+        self._limiter = RateLimiter(rate, burst) if rate else None
+        self.stats = BatchStats()
+
+    async def process(self, request: Any) -> Any:
+        raise NotImplementedError
+
+    def __aiter__(self) -> AsyncIterator[BatchResult]:
+        return self._run()
+
+    async def _run(self) -> AsyncIterator[BatchResult]:
+        source = _aiter(self._requests)
+        source_lock = asyncio.Lock()
+        # Очередь без предела, чтобы завершение воркера не ждало места;
+        # готовых, но не отданных результатов не больше concurrency
+        results: asyncio.Queue = asyncio.Queue()
+        room = asyncio.Semaphore(self.concurrency)
+        counter = iter(range(2 ** 63))
+
+        async def take() -> Optional[Tuple[int, Any]]:
+            async with source_lock:
+                try:
+                    request = await source.__anext__()
+                except StopAsyncIteration:
+                    return None
+                return next(counter), request
+
+        async def worker() -> None:
+            try:
+                while True:
+                    item = await take()
+                    if item is None:
+                        break
+                    index, request = item
+                    if self._limiter is not None:
+                        self.stats.throttled_seconds += \
+                            await self._limiter.acquire()
+                    try:
+                        result = BatchResult(
+                            index, request, await self.process(request)
+                        )
+                    except Exception as error:
+                        result = BatchResult(index, request, error=error)
+                    await room.acquire()
+                    results.put_nowait(result)
+            finally:
+                results.put_nowait(None)
+
+        self.stats = BatchStats()
+        self.stats.started_at = time.perf_counter()
+        workers = [
+            asyncio.ensure_future(worker()) for _ in range(self.concurrency)
+        ]
+        running = len(workers)
+        try:
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                    continue
+                room.release()
+                if result.ok:
+                    self.stats.succeeded += 1
+                else:
+                    self.stats.failed += 1
+                yield result
+            # Ошибка самого источника запросов - не ошибка элемента
+            for task in workers:
+                task.result()
+        finally:
+            self.stats.finished_at = time.perf_counter()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def collect(self) -> List[BatchResult]:
+        """
+        Выполнить весь пакет и вернуть результаты по порядку запросов.
+        """
+        results = [result async for result in self]
+        results.sort(key=lambda result: result.index)
+        return results
+
+
+class InvoiceBatch(Batch):
+    """
+    Пакетное создание контрактов через LavaTop.create_invoice.
+    Все запросы идут через общий пул соединений клиента.
+    """
+
+    def __init__(
+        self,
+        client: 'LavaTop',
+        requests: Union[Iterable[Any], AsyncIterable[Any]],
+        concurrency: int = 10,
+        rate: Optional[float] = None,
+        burst: int = 1
+    ):
+        super().__init__(requests, concurrency, rate, burst)
+        self._client = client
+
+    async def process(self, request: Any) -> Invoice:
+        if not isinstance(request, InvoiceRequest):
+            request = InvoiceRequest.model_validate(request)
+        return await self._client.create_invoice(
+            email=request.email,
+            offer_id=request.offerId,
+            currency=request.currency,
+            payment_method=request.paymentMethod,
+            buyer_language=request.buyerLanguage,
+            idempotency_key=request.idempotencyKey
+        )
+
+
+class Cancellation(NamedTuple):
+    """Подписка для отмены"""
+    contract_id: str
+    email: str
+
+    @classmethod
+    def of(cls, request: Any) -> 'Cancellation':
+        if isinstance(request, dict):
+            return cls(request['contractId'], request['email'])
+        return cls(*request)
+
+
+class CancellationBatch(Batch):
+    """
+    Пакетная отмена подписок через LavaTop.cancel_subscription.
+    С progress каждый итог дописывается в файл JSON Lines, и повторный
+    запуск с тем же файлом пропускает уже отменённые подписки и
+    подписки с ошибкой 4xx (повторять их бессмысленно); остальные
+    ошибки повторяются. С tracker отменённые подписки сразу получают
+    статус SUBSCRIPTION_CANCELLED.
+
+        batch = client.cancel_subscriptions(rows, progress='cancel.jsonl')
+        async for result in batch:
+            if not result.ok:
+                print(result.request, result.error)
+    """
+
+    def __init__(
+        self,
+        client: 'LavaTop',
+        requests: Union[Iterable[Any], AsyncIterable[Any]],
+        concurrency: int = 10,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        progress: Optional[str] = None,
+        tracker: Optional['SubscriptionTracker'] = None
+    ):
+        """
+        :param requests: Пары (contract_id, email) или dict
+            с ключами contractId и email
+        :param progress: Файл прогресса для продолжения после остановки
+        :param tracker: SubscriptionTracker для обновления статусов
+        """
+        self._client = client
+        self.tracker = tracker
+        self.progress = progress
+        self.done: Dict[str, Dict[str, Any]] = {}
+        self.skipped = 0
+        if progress is not None and os.path.exists(progress):
+            self.done = _load_progress(progress)
+        self._file = None
+        super().__init__(self._pending(requests), concurrency, rate, burst)
+
+    async def _pending(
+        self,
+        requests: Union[Iterable[Any], AsyncIterable[Any]]
+    ) -> AsyncIterator[Any]:
+        async for request in _aiter(requests):
+            done = self.done.get(Cancellation.of(request).contract_id)
+            if done is not None and _final(done):
+                self.skipped += 1
+                continue
+            yield request
+
+    async def _run(self) -> AsyncIterator[BatchResult]:
+        if self.progress is not None:
+            self._file = open(self.progress, 'a', encoding='utf-8')
+            if not _ends_with_newline(self.progress):
+                # Иначе первая запись склеится с оборванной строкой
+                self._file.write('\n')
+        try:
+            async for result in super()._run():
+                yield result
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    async def process(self, request: Any) -> Cancellation:
+        cancellation = Cancellation.of(request)
+        try:
+            await self._client.cancel_subscription(
+                cancellation.contract_id, cancellation.email
+            )
+        except Exception as error:
+            status = error.response.status_code \
+                if isinstance(error, httpx.HTTPStatusError) else None
+            self._record(cancellation, False, status, repr(error))
+            raise
+        self._record(cancellation, True, None, None)
+        if self.tracker is not None:
+            self.tracker.set_status(
+                cancellation.contract_id,
+                ContractStatusDto.SUBSCRIPTION_CANCELLED,
+                cancellation.email
+            )
+        return cancellation
+
+    def _record(self, cancellation: Cancellation, ok: bool,
+                status: Optional[int], error: Optional[str]) -> None:
+        record = {
+            'contractId': cancellation.contract_id,
+            'email': cancellation.email,
+            'ok': ok,
+            'status': status,
+            'error': error,
+        }
+        self.done[cancellation.contract_id] = record
+        if self._file is not None:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+
+def _load_progress(path: str) -> Dict[str, Dict[str, Any]]:
+    done = {}
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # строка, оборванная остановкой процесса
+            done[record['contractId']] = record
+    return done
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as file:
+        if file.seek(0, os.SEEK_END) == 0:
+            return True
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b'\n'
+
+
+def _final(record: Dict[str, Any]) -> bool:
+    status = record.get('status')
+    return record['ok'] or (status is not None and 400 <= status < 500
+                            and status != 429)
+
+
+async def _aiter(
+    items: Union[Iterable[Any], AsyncIterable[Any]]
+) -> AsyncIterator[Any]:
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,157 @@
+# Бенчмарки LavaTop против MockGateway, без сети.
+# python -m LavaTopPayment.benchmarks.client
+# python -m LavaTopPayment.benchmarks.client latency export --latency 0.002
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from LavaTopPayment.benchmarks.mock_gateway import MockGateway, product_id
+from LavaTopPayment.decoding import JSON_BACKEND, decode, loads
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.models.reports import PartnerSalesPageDto
+from LavaTopPayment.models.types import Currency
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name: str, samples: List[float], elapsed: float,
+           unit: str = 'req') -> Dict[str, float]:
+    """
+    Напечатать строку результата: задержки в миллисекундах
+    и пропускную способность.
+    """
+    result = {
+        'n': len(samples),
+        'p50': percentile(samples, 0.50) * 1000,
+        'p95': percentile(samples, 0.95) * 1000,
+        'p99': percentile(samples, 0.99) * 1000,
+        'mean': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'rate': len(samples) / elapsed if elapsed else 0.0,
+    }
+    print(f'{name:<36} n={result["n"]:<7} '
+          f'p50={result["p50"]:8.3f}ms p95={result["p95"]:8.3f}ms '
+          f'p99={result["p99"]:8.3f}ms {result["rate"]:10.1f} {unit}/s')
+    return result
+
+
+async def timed(calls: int, concurrency: int,
+                call: Callable[[int], Awaitable[object]]):
+    samples: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call(index)
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return samples, time.perf_counter() - started
+
+
+async def scenario_latency(args) -> None:
+    """Последовательные одиночные вызовы"""
+    gateway = MockGateway(latency=args.latency)
+    async with LavaTop(api_key='key', transport=gateway.transport()) as client:
+        invoice = await client.create_invoice(
+            'buyer@example.com', gateway.offer_id(), Currency.RUB
+        )
+        for name, call in (
+            ('get_product_by_id',
+             lambda i: client.get_product_by_id(invoice.id)),
+            ('get_donate_link', lambda i: client.get_donate_link()),
+            ('get_products', lambda i: client.get_products()),
+        ):
+            samples, elapsed = await timed(args.calls, 1, call)
+            report(f'latency {name}', samples, elapsed)
+
+
+async def scenario_invoices(args) -> None:
+    """Параллельное создание контрактов"""
+    gateway = MockGateway(latency=args.latency)
+    async with LavaTop(api_key='key', transport=gateway.transport()) as client:
+        samples, elapsed = await timed(
+            args.calls, args.concurrency,
+            lambda i: client.create_invoice(
+                f'buyer{i}@example.com', gateway.offer_id(), Currency.RUB
+            )
+        )
+        report(f'create_invoice x{args.concurrency}', samples, elapsed)
+
+
+async def scenario_export(args) -> None:
+    """Выгрузка всех продаж продукта постранично"""
+    gateway = MockGateway(sales=args.sales, latency=args.latency)
+    async with LavaTop(api_key='key', transport=gateway.transport()) as client:
+        for prefetch in (1, args.prefetch):
+            started = time.perf_counter()
+            count = 0
+            async for _ in client.iter_sales_by_product(
+                product_id(0), size=args.page_size, prefetch=prefetch
+            ):
+                count += 1
+            elapsed = time.perf_counter() - started
+            print(f'{f"export prefetch={prefetch}":<36} items={count:<7} '
+                  f'{elapsed:8.3f}s {count / elapsed:10.1f} items/s')
+
+
+async def scenario_parse(args) -> None:
+    """Стоимость разбора большой страницы продаж"""
+    gateway = MockGateway(sales=args.page_size)
+    body = gateway._product_sales_page(product_id(0), 0, args.page_size)
+    repeats = max(args.calls // 10, 10)
+    for name, parse in (
+        ('parse json.loads + Model(**)',
+         lambda: PartnerSalesPageDto(**json.loads(body))),
+        ('parse decode (model_validate_json)',
+         lambda: decode(PartnerSalesPageDto, body)),
+        (f'parse loads only ({JSON_BACKEND})', lambda: loads(body)),
+    ):
+        samples = []
+        started = time.perf_counter()
+        for _ in range(repeats):
+            call_started = time.perf_counter()
+            parse()
+            samples.append(time.perf_counter() - call_started)
+        report(name, samples, time.perf_counter() - started, unit='page')
+
+
+SCENARIOS = {
+    'latency': scenario_latency,
+    'invoices': scenario_invoices,
+    'export': scenario_export,
+    'parse': scenario_parse,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scenarios', nargs='*',
+                        help=f'Сценарии: {", ".join(SCENARIOS)}')
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Задержка ответа шлюза, секунды')
+    parser.add_argument('--sales', type=int, default=20_000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--prefetch', type=int, default=4)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+    for name in args.scenarios or SCENARIOS:
+        asyncio.run(SCENARIOS[name](args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Время холодного импорта пакета, каждый замер в новом процессе.
+# python -m LavaTopPayment.benchmarks.import_time
+# python -m LavaTopPayment.benchmarks.import_time --budget package=5 --budget webhook_event=150
+# Код возврата 1, если медиана сценария больше бюджета (мс) - для CI.
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+SCENARIOS: Dict[str, str] = {
+    'package': 'import LavaTopPayment',
+    'webhook_event': 'from LavaTopPayment import WebhookEvent',
+    'webhook_receiver': 'from LavaTopPayment import WebhookReceiver',
+    'client': 'from LavaTopPayment import LavaTop',
+    'everything': 'from LavaTopPayment import *',
+}
+
+MEASURE = '''
+import time
+started = time.perf_counter()
+{statement}
+print(time.perf_counter() - started)
+'''
+
+
+def measure(statement: str) -> float:
+    """Время выполнения statement в новом интерпретаторе, секунды"""
+    output = subprocess.run(
+        [sys.executable, '-c', MEASURE.format(statement=statement)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def slowest(statement: str, top: int) -> List[Tuple[int, int, str]]:
+    """
+    Самые долгие модули по данным python -X importtime:
+    (собственное время, общее время в микросекундах, модуль).
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        check=True, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(own), int(cumulative), module.rstrip()))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return rows[:top]
+
+
+def parse_budget(value: str) -> Tuple[str, float]:
+    name, _, limit = value.rpartition('=')
+    if not name:
+        raise argparse.ArgumentTypeError('ожидается сценарий=миллисекунды')
+    return name, float(limit)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scenarios', nargs='*',
+                        help=f'Сценарии: {", ".join(SCENARIOS)}')
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--top', type=int, default=0,
+                        help='Показать столько самых долгих модулей')
+    parser.add_argument('--budget', type=parse_budget, action='append',
+                        default=[], help='сценарий=мс, можно несколько раз')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+    budgets = dict(args.budget)
+    names = args.scenarios or list(SCENARIOS)
+    failed = []
+    for name in names:
+        statement = SCENARIOS[name]
+        samples = [measure(statement) for _ in range(args.runs)]
+        median = statistics.median(samples) * 1000
+        budget = budgets.get(name, budgets.get(statement))
+        verdict = ''
+        if budget is not None:
+            verdict = 'ok' if median <= budget else f'> {budget:g} ms'
+            if median > budget:
+                failed.append(name)
+        print(f'{name:<18} median={median:8.2f} ms '
+              f'min={min(samples) * 1000:8.2f} ms  {verdict}')
+        for own, cumulative, module in slowest(statement, args.top):
+            print(f'    {own / 1000:8.2f} ms self {cumulative / 1000:8.2f} ms '
+                  f'total  {module.strip()}')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
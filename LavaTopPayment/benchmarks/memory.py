@@ -0,0 +1,90 @@
+# Память на запись: модели pydantic против лёгких записей (records).
+# python -m LavaTopPayment.benchmarks.memory
+# python -m LavaTopPayment.benchmarks.memory --records 200000 --buyers 5000
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Any, Callable, List
+
+from LavaTopPayment.benchmarks.mock_gateway import delivery_payload, \
+    product_id, sale_payload
+from LavaTopPayment.decoding import decode, loads
+from LavaTopPayment.models.reports import PartnerSalesPageDto
+from LavaTopPayment.models.webhooks import WebhookHistoryResponse
+from LavaTopPayment.records import DeliveryRecord, RecordPool, SaleRecord
+
+
+def retained(build: Callable[[], List[Any]]) -> int:
+    """
+    Сколько байт остаётся занято объектами, которые вернула build,
+    после сборки мусора (промежуточные данные не учитываются).
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def compare(name: str, content: bytes, count: int,
+            models: Callable[[bytes], List[Any]],
+            records: Callable[[bytes], List[Any]]) -> None:
+    model_items = models(content)
+    record_items = records(content)
+    assert all(record.to_model() == model
+               for record, model in zip(record_items, model_items)), \
+        f'{name}: to_model() differs from the model'
+    del model_items, record_items
+
+    model_size = retained(lambda: models(content))
+    record_size = retained(lambda: records(content))
+    print(f'{name:<28} models={model_size / count:8.1f} B/rec  '
+          f'records={record_size / count:8.1f} B/rec  '
+          f'saved={1 - record_size / model_size:6.1%}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--buyers', type=int, default=5000,
+                        help='Уникальных покупателей (не больше 5000)')
+    args = parser.parse_args()
+    count = args.records
+    product = product_id(0)
+
+    sales = []
+    for index in range(count):
+        item = sale_payload(product, index)
+        item['buyer']['email'] = f'buyer{index % args.buyers}@example.com'
+        sales.append(item)
+    sales_page = json.dumps({
+        'items': sales, 'total': count, 'page': 0, 'size': count,
+        'totalPages': 1,
+    }).encode()
+    compare(
+        'PartnerSaleDetailsDto', sales_page, count,
+        lambda content: decode(PartnerSalesPageDto, content).items,
+        lambda content: [SaleRecord.from_dict(item, pool)
+                         for pool in [RecordPool()]
+                         for item in loads(content)['items']],
+    )
+
+    history_page = json.dumps({
+        'items': [delivery_payload(index) for index in range(count)],
+        'total': count, 'page': 0, 'size': count,
+    }).encode()
+    compare(
+        'WebhookDeliveryResponse', history_page, count,
+        lambda content: decode(WebhookHistoryResponse, content).items,
+        lambda content: [DeliveryRecord.from_dict(item, pool)
+                         for pool in [RecordPool()]
+                         for item in loads(content)['items']],
+    )
+
+
+if __name__ == '__main__':
+    main()
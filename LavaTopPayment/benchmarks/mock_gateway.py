@@ -0,0 +1,282 @@
+import asyncio
+import json
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import httpx
+
+from LavaTopPayment.emulator import EmulatorRequest, GatewayEmulator, Reply
+
+STATUSES = ('new', 'in-progress', 'completed', 'failed', 'cancelled',
+            'subscription-active')
+CURRENCIES = ('RUB', 'USD', 'EUR')
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class MockGateway(GatewayEmulator):
+    """
+    GatewayEmulator для бенчмарков: каталог, контракты и вебхуки
+    берутся из эмулятора, а отчёты и история вебхуков отдаются
+    готовыми страницами нужного размера. Страницы сериализуются один
+    раз и кэшируются, чтобы стоимость имитации не попадала в замеры.
+    Транспорт вызывает эмулятор напрямую, без ASGI.
+
+        gateway = MockGateway(products=1000, sales=100_000)
+        client = LavaTop(api_key='key', transport=gateway.transport())
+    """
+
+    def __init__(
+        self,
+        products: int = 100,
+        offers_per_product: int = 3,
+        products_page_size: int = 100,
+        sales: int = 10_000,
+        webhook_deliveries: int = 10_000,
+        latency: float = 0.0
+    ):
+        """
+        :param products: Количество продуктов в каталоге
+        :param offers_per_product: Предложений у каждого продукта
+        :param products_page_size: Элементов каталога на странице
+        :param sales: Продаж у каждого продукта
+        :param webhook_deliveries: Записей в истории вебхуков
+        :param latency: Задержка ответа, секунды
+        """
+        super().__init__(
+            products=products,
+            offers_per_product=offers_per_product,
+            products_page_size=products_page_size,
+            settle_after=None,
+            seed=0,
+        )
+        self.sales_per_product = sales
+        self.webhook_deliveries = webhook_deliveries
+        self.latency = latency
+        self.webhooks['webhook-1'] = {
+            **webhook_payload('webhook-1'), 'authValue': None
+        }
+        self._catalog_page = lru_cache(maxsize=1024)(self._catalog_page)
+        self._sales_page = lru_cache(maxsize=1024)(self._sales_page)
+        self._product_sales_page = lru_cache(maxsize=4096)(
+            self._product_sales_page
+        )
+        self._history_page = lru_cache(maxsize=1024)(self._history_page)
+
+    @property
+    def requests(self) -> int:
+        return self.stats.requests
+
+    def offer_id(self, product: int = 0, offer: int = 0) -> str:
+        """Идентификатор предложения из каталога, для create_invoice"""
+        return self.products[product_id(product)]['offers'][offer]['id']
+
+    def transport(self) -> httpx.MockTransport:
+        """Транспорт для LavaTop"""
+        return httpx.MockTransport(self.handle_async)
+
+    def sync_transport(self) -> httpx.MockTransport:
+        """Транспорт для LavaTopSync"""
+        return httpx.MockTransport(self.handle_sync)
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return _response(await self.handle(_emulator_request(request)))
+
+    def handle_sync(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        # Без задержек и отложенных оплат handle() не уступает
+        # управление, поэтому корутину можно выполнить без цикла событий
+        coroutine = self.handle(_emulator_request(request))
+        try:
+            coroutine.send(None)
+        except StopIteration as stop:
+            return _response(stop.value)
+        coroutine.close()
+        raise RuntimeError('MockGateway handler must not suspend')
+
+    # Каталог
+    def _get_products(self, request: EmulatorRequest) -> Reply:
+        return Reply(200, self._catalog_page(
+            max(int(request.query.get('page', 0)), 0)
+        ))
+
+    def _catalog_page(self, page: int) -> bytes:
+        return super()._get_products(
+            EmulatorRequest('GET', '', {'page': str(page)}, {}, b'')
+        ).body
+
+    def _update_product_v2(self, request: EmulatorRequest,
+                           productId: str) -> Reply:
+        self._catalog_page.cache_clear()
+        return super()._update_product_v2(request, productId)
+
+    # Отчёты
+    def _get_sales(self, request: EmulatorRequest) -> Reply:
+        page, size = _page_args(request.query, 20)
+        return Reply(200, self._sales_page(page, size))
+
+    def _sales_page(self, page: int, size: int) -> bytes:
+        start = page * size
+        stop = min(start + size, len(self.products))
+        items = [{
+            'productId': product_id(i),
+            'title': f'Продукт {i}',
+            'status': 'completed',
+            'sales': [
+                {'currency': currency, 'count': i % 50 + 1,
+                 'amountTotal': float((i % 50 + 1) * 990)}
+                for currency in CURRENCIES
+            ],
+        } for i in range(start, stop)]
+        return json.dumps(_page(items, len(self.products), page, size)).encode()
+
+    def _get_sales_by_product(self, request: EmulatorRequest,
+                              productId: str) -> Reply:
+        if productId not in self.products:
+            return super()._get_sales_by_product(request, productId)
+        page, size = _page_args(request.query, 20)
+        # Продажа с номером i создана в EPOCH + i минут
+        first, last = 0, self.sales_per_product
+        from_date = request.query.get('fromDate')
+        to_date = request.query.get('toDate')
+        if from_date:
+            first = max(0, math.ceil(_minutes(from_date)))
+        if to_date:
+            last = min(last, math.floor(_minutes(to_date)) + 1)
+        return Reply(200, self._product_sales_page(
+            productId, page, size, first, max(first, last)
+        ))
+
+    def _product_sales_page(self, id: str, page: int, size: int,
+                            first: int = 0, last: Optional[int] = None
+                            ) -> bytes:
+        last = self.sales_per_product if last is None else last
+        start = first + page * size
+        stop = min(start + size, last)
+        items = [sale_payload(id, i) for i in range(start, stop)]
+        return json.dumps(_page(items, last - first, page, size)).encode()
+
+    # Вебхуки
+    def _get_webhook_history(self, request: EmulatorRequest) -> Reply:
+        return Reply(200, self._history_page(
+            *_page_args(request.query, 20)
+        ))
+
+    def _history_page(self, page: int, size: int) -> bytes:
+        start = page * size
+        stop = min(start + size, self.webhook_deliveries)
+        items = [delivery_payload(i) for i in range(start, stop)]
+        data = _page(items, self.webhook_deliveries, page, size)
+        del data['totalPages']
+        return json.dumps(data).encode()
+
+
+def _emulator_request(request: httpx.Request) -> EmulatorRequest:
+    return EmulatorRequest(
+        request.method,
+        request.url.path,
+        dict(request.url.params),
+        {key.lower(): value for key, value in request.headers.items()},
+        request.content,
+    )
+
+
+def _response(reply: Reply) -> httpx.Response:
+    headers = dict(reply.headers or {})
+    if reply.body:
+        headers['content-type'] = 'application/json'
+    return httpx.Response(reply.status, content=reply.body, headers=headers)
+
+
+def _page_args(query: Dict[str, str], default_size: int):
+    page = int(query.get('page', 0))
+    size = int(query.get('size', default_size))
+    return page, max(size, 1)
+
+
+def product_id(index: int) -> str:
+    return f'00000000-0000-0000-0000-{index:012d}'
+
+
+def _iso(index: int) -> str:
+    return (EPOCH + timedelta(minutes=index)).isoformat()
+
+
+def _minutes(value: str) -> float:
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH).total_seconds() / 60
+
+
+def _page(items, total: int, page: int, size: int) -> Dict[str, Any]:
+    return {
+        'items': items,
+        'total': total,
+        'page': page,
+        'size': size,
+        'totalPages': math.ceil(total / size),
+    }
+
+
+def product_payload(index: int, offers: int) -> Dict[str, Any]:
+    return {
+        'id': product_id(index),
+        'title': f'Продукт {index}',
+        'description': 'Описание продукта ' * 5,
+        'type': 'COURSE',
+        'offers': [{
+            'id': f'{product_id(index)[:-4]}{offer:04d}',
+            'name': f'Тариф {offer}',
+            'description': None,
+            'prices': [
+                {'amount': 990.0 * (offer + 1), 'currency': currency}
+                for currency in CURRENCIES
+            ],
+        } for offer in range(offers)],
+    }
+
+
+def sale_payload(product: str, index: int) -> Dict[str, Any]:
+    return {
+        'id': f'{product[:24]}{index:012d}',
+        'created': _iso(index),
+        'status': STATUSES[index % len(STATUSES)],
+        'amountTotal': {
+            'amount': float(990 + index % 10 * 100),
+            'currency': CURRENCIES[index % len(CURRENCIES)],
+        },
+        'buyer': {'email': f'buyer{index % 5000}@example.com'},
+    }
+
+
+def webhook_payload(id: str) -> Dict[str, Any]:
+    return {
+        'id': id,
+        'name': 'Webhook',
+        'apiKeyId': 'api-key-1',
+        'url': 'https://example.com/webhook',
+        'eventType': 'payment_result',
+        'isActive': True,
+        'authType': 'api_key',
+        'createdAt': _iso(0),
+        'updatedAt': _iso(1),
+    }
+
+
+def delivery_payload(index: int) -> Dict[str, Any]:
+    delivered = index % 10 != 0
+    return {
+        'id': f'delivery-{index}',
+        'webhookId': f'webhook-{index % 3}',
+        'isDelivered': delivered,
+        'deliveredAt': _iso(index) if delivered else None,
+        'lastDeliveryAttemptAt': _iso(index),
+        'responseStatus': 200 if delivered else 500,
+        'createdAt': _iso(index),
+    }
@@ -0,0 +1,131 @@
+# Нагрузочный прогон оформления заказов против GatewayEmulator, без сети.
+# python -m LavaTopPayment.benchmarks.soak --duration 30 --concurrency 200
+# python -m LavaTopPayment.benchmarks.soak --error-rate 0.02 --throttle-rate 0.01
+# python -m LavaTopPayment.benchmarks.soak --url http://127.0.0.1:8080
+# python -m LavaTopPayment.benchmarks.soak --replay traffic.jsonl
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, List
+
+from LavaTopPayment.benchmarks.client import report
+from LavaTopPayment.emulator import Faults, GatewayEmulator
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.models.types import Currency
+from LavaTopPayment.retry import RetryPolicy
+
+
+async def checkout(client: LavaTop, offers: List[str], index: int) -> None:
+    """Заказ как на сайте: контракт, проверка статуса, иногда отчёт"""
+    invoice = await client.create_invoice(
+        email=f'buyer{index % 5000}@example.com',
+        offer_id=offers[index % len(offers)],
+        currency=Currency.RUB,
+        idempotency_key=str(uuid.uuid4()),
+    )
+    await client.get_product_by_id(invoice.id)
+    if index % 20 == 0:
+        await client.get_sales(page=0, size=20)
+
+
+async def soak(args) -> None:
+    emulator = None
+    if args.url is None:
+        emulator = GatewayEmulator(
+            products=args.products,
+            faults=Faults(latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate,
+                          throttle_rate=args.throttle_rate,
+                          retry_after=0.0),
+            settle_after=args.settle_after,
+            replay=args.replay,
+            seed=1,
+        )
+    client = LavaTop(
+        api_key='key',
+        base_url=args.url or 'http://emulator',
+        transport=emulator.transport() if emulator else None,
+        max_connections=args.concurrency,
+        retry=RetryPolicy(backoff=0.01, max_backoff=0.1),
+    )
+    errors: Dict[str, int] = {}
+    samples: List[float] = []
+    async with client:
+        if args.replay:
+            calls = replay_calls(client, args.replay)
+        else:
+            catalog = await client.get_products()
+            offers = [offer.id for product in catalog.items
+                      for offer in product.offers or ()]
+            calls = [lambda index: checkout(client, offers, index)]
+        deadline = time.perf_counter() + args.duration
+        counter = iter(range(10 ** 12))
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                index = next(counter)
+                started = time.perf_counter()
+                try:
+                    await calls[index % len(calls)](index)
+                except Exception as error:
+                    name = type(error).__name__
+                    errors[name] = errors.get(name, 0) + 1
+                else:
+                    samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    report('soak replay' if args.replay else 'soak checkout',
+           samples, elapsed, 'op')
+    print(f'errors={errors} retries={client.stats.retries}')
+    if emulator is not None:
+        await emulator.stop()
+        print(emulator.stats, f'contracts={len(emulator.contracts)}')
+
+
+def replay_calls(client: LavaTop, path: str):
+    """Запросы из записи RecordingTransport, по одному на вызов"""
+    calls = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+
+            async def call(index: int, record=record) -> None:
+                await client._request(
+                    record['method'], client.base_url + record['path'],
+                    params=record['query'] or None,
+                    json=json.loads(record['request'])
+                    if record['request'] else None,
+                )
+            calls.append(call)
+    if not calls:
+        raise SystemExit(f'{path}: no recorded requests')
+    return calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='Задержка ответа шлюза, секунды')
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--settle-after', type=float, default=0.05)
+    parser.add_argument('--url', default=None,
+                        help='Адрес запущенного эмулятора вместо встроенного')
+    parser.add_argument('--replay', default=None,
+                        help='Прогнать запросы из записи RecordingTransport')
+    args = parser.parse_args()
+    asyncio.run(soak(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Нагрузочный тест WebhookReceiver без сети: запросы подаются
+# прямо в ASGI-приложение.
+# python -m LavaTopPayment.benchmarks.webhook_receiver --events 100000
+import argparse
+import asyncio
+import json
+import time
+
+from LavaTopPayment.models.types import WebhookAuthTypeDto
+from LavaTopPayment.webhook_receiver import WebhookReceiver
+
+
+def make_body(index: int) -> bytes:
+    return json.dumps({
+        'eventType': 'payment.success',
+        'product': {'id': 'product-1', 'title': 'Курс'},
+        'contractId': f'contract-{index}',
+        'buyer': {'email': f'buyer{index % 1000}@example.com'},
+        'amount': 990.0,
+        'currency': 'RUB',
+        'status': 'completed',
+        'timestamp': '2024-10-01T12:00:00+03:00',
+    }).encode()
+
+
+async def run(events: int, duplicates: float, concurrency: int) -> None:
+    handled = 0
+
+    async def handler(event) -> None:
+        nonlocal handled
+        handled += 1
+
+    receiver = WebhookReceiver(
+        handler, WebhookAuthTypeDto.API_KEY, 'secret',
+        queue_size=events + 1
+    )
+    bodies = [make_body(i) for i in range(events)]
+    redelivered = int(events * duplicates)
+    bodies += bodies[:redelivered]
+    headers = [(b'content-type', b'application/json'),
+               (b'x-api-key', b'secret')]
+    scope = {'type': 'http', 'method': 'POST', 'path': '/', 'headers': headers}
+    statuses = {}
+
+    async def deliver(body: bytes) -> None:
+        sent = False
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            nonlocal sent
+            if message['type'] == 'http.response.start':
+                statuses[message['status']] = \
+                    statuses.get(message['status'], 0) + 1
+                sent = True
+
+        await receiver(scope, receive, send)
+        assert sent
+
+    async def client(chunk):
+        for body in chunk:
+            await deliver(body)
+
+    chunks = [bodies[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(client(chunk) for chunk in chunks))
+    acked = time.perf_counter() - started
+    await receiver.stop()
+    total = time.perf_counter() - started
+
+    print(f'deliveries: {len(bodies)} ({redelivered} redelivered)')
+    print(f'statuses:   {statuses}')
+    print(f'ack:        {acked:.3f}s, {len(bodies) / acked:.0f} req/s')
+    print(f'handled:    {handled} in {total:.3f}s, '
+          f'{handled / total:.0f} events/s')
+    print(receiver.stats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=50_000)
+    parser.add_argument('--duplicates', type=float, default=0.1,
+                        help='Доля повторных доставок')
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.duplicates, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
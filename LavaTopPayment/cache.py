@@ -0,0 +1,129 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, \
+    Union
+
+from LavaTopPayment.models.products import OfferResponse, PostItemResponse, \
+    PriceDto, ProductItemResponse
+
+
+class OfferEntry(NamedTuple):
+    """Предложение вместе с продуктом, которому оно принадлежит"""
+    product: ProductItemResponse
+    offer: OfferResponse
+    prices: List[PriceDto]
+
+
+class CatalogSnapshot:
+    """
+    Загруженный каталог с индексами по id продукта и id предложения.
+    """
+
+    def __init__(
+        self,
+        items: List[Union[ProductItemResponse, PostItemResponse]],
+        loaded_at: float
+    ):
+        self.items = items
+        self.loaded_at = loaded_at
+        self.products: Dict[str, ProductItemResponse] = {}
+        self.offers: Dict[str, OfferEntry] = {}
+        for item in items:
+            if not isinstance(item, ProductItemResponse):
+                continue
+            self.products[item.id] = item
+            for offer in item.offers or ():
+                self.offers[offer.id] = OfferEntry(item, offer, offer.prices)
+
+
+class CatalogCache:
+    """
+    Кэш каталога продуктов в памяти процесса.
+    Первые ttl секунд после загрузки каталог отдаётся как есть.
+    Следующие stale_ttl секунд отдаётся устаревшая копия, а в фоне
+    запускается обновление. Позже get() ждёт новую загрузку.
+    Одновременные обновления объединяются в одно.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[
+            [], Awaitable[List[Union[ProductItemResponse, PostItemResponse]]]
+        ],
+        ttl: float,
+        stale_ttl: float = 0.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param loader: Корутина, загружающая весь каталог
+        :param ttl: Сколько секунд каталог считается свежим
+        :param stale_ttl: Сколько секунд после ttl можно отдавать
+            устаревший каталог, обновляя его в фоне
+        :param clock: Источник времени
+        """
+        self._loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._generation = 0
+
+    async def get(self) -> CatalogSnapshot:
+        """
+        Получить каталог с учётом ttl и stale_ttl.
+        :return: CatalogSnapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            age = self._clock() - snapshot.loaded_at
+            if age < self.ttl:
+                return snapshot
+            if age < self.ttl + self.stale_ttl:
+                self._start_refresh()
+                return snapshot
+        return await self.refresh()
+
+    async def refresh(self) -> CatalogSnapshot:
+        """
+        Загрузить каталог заново. Если загрузка уже идёт,
+        дождаться её. Отмена ожидающего не прерывает загрузку.
+        :return: CatalogSnapshot
+        """
+        return await asyncio.shield(self._start_refresh())
+
+    async def get_offer(self, offer_id: str) -> Optional[OfferEntry]:
+        """
+        Найти предложение по id.
+        :param offer_id: Идентификатор предложения
+        :return: OfferEntry или None
+        """
+        return (await self.get()).offers.get(offer_id)
+
+    def invalidate(self) -> None:
+        """
+        Сбросить каталог. Результат уже идущей загрузки
+        в кэш не попадёт.
+        """
+        self._snapshot = None
+        self._task = None
+        self._generation += 1
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._load(self._generation))
+            self._task.add_done_callback(_consume_exception)
+        return self._task
+
+    async def _load(self, generation: int) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot(await self._loader(), self._clock())
+        if generation == self._generation:
+            self._snapshot = snapshot
+        return snapshot
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Ошибку фонового обновления получат те, кто ждёт refresh();
+    # остальные продолжают работать со старым каталогом
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,37 @@
+import json
+from typing import Any, Callable, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
+
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
+if orjson is not None:
+    loads: Callable[[Union[bytes, str]], Any] = orjson.loads
+    JSON_BACKEND = 'orjson'
+elif msgspec is not None:
+    loads = msgspec.json.decode
+    JSON_BACKEND = 'msgspec'
+else:
+    loads = json.loads
+    JSON_BACKEND = 'json'
+
+
+def decode(model: Type[ModelT], content: Union[bytes, str]) -> ModelT:
+    """
+    Разобрать тело ответа в модель за один проход прямо из байтов
+    (model_validate_json), без промежуточного dict из response.json().
+    :param model: Класс модели
+    :param content: Тело ответа
+    :return: Экземпляр модели
+    """
+    return model.model_validate_json(content)
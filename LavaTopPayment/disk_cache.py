@@ -0,0 +1,359 @@
+import hashlib
+import hmac
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+import httpx
+
+IMMUTABLE = float('inf')
+
+# Секунды свежести по методам из ENDPOINTS. Методов без политики
+# (статус счёта get_product_by_id, история вебхуков) кэш не касается
+DEFAULT_TTL: Dict[str, float] = {
+    'get_products': 300.0,
+    'get_webhooks': 60.0,
+    'list_webhooks': 60.0,
+    'get_sales': 60.0,
+    'get_sales_by_product': 60.0,
+    'get_donate_link': 3600.0,
+}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+'''
+
+
+class CachedResponse(NamedTuple):
+    """Запись DiskCache. stored - время загрузки или последней проверки"""
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored: float
+
+    def validators(self) -> Optional[Dict[str, str]]:
+        """Заголовки условного запроса или None, если проверять нечем"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers or None
+
+
+class DiskCacheStats:
+    """
+    Счётчики DiskCache. hits - ответы без запроса, revalidated -
+    подтверждённые ответом 304, misses - загруженные заново,
+    busy - обращения, пропущенные из-за блокировки базы.
+    """
+    __slots__ = ('hits', 'misses', 'revalidated', 'stored', 'evicted',
+                 'busy')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stored = 0
+        self.evicted = 0
+        self.busy = 0
+
+    def __repr__(self) -> str:
+        return f'DiskCacheStats(hits={self.hits}, misses={self.misses}, ' \
+               f'revalidated={self.revalidated}, stored={self.stored}, ' \
+               f'evicted={self.evicted}, busy={self.busy})'
+
+
+class DiskCache:
+    """
+    Кэш ответов GET запросов LavaTop в SQLite, переживает перезапуск
+    процесса (cron, serverless). Ключ - метод API, URL, параметры и
+    отпечаток авторизации, поэтому один файл можно делить между
+    аккаунтами и процессами. Авторизация входит в ключ как HMAC
+    с секретом, случайным для каждой базы: по файлу кэша ключи
+    не подобрать перебором. Свежесть задаётся политикой по методам;
+    устаревшая запись с ETag или Last-Modified проверяется условным
+    запросом, и на 304 тело берётся из кэша. Страницы
+    get_sales_by_product с toDate в прошлом не устаревают.
+    Размер ограничен max_bytes, вытесняются давно не читанные записи.
+    SQLite вызывается прямо в цикле событий, поэтому блокировку базы
+    другим процессом кэш ждёт не дольше timeout, а затем считает
+    запись отсутствующей и запрос уходит в сеть.
+
+        cache = DiskCache('lava_cache.sqlite3', max_bytes=50 * 2 ** 20)
+        client = LavaTop(api_key=key, cache=cache)
+    """
+
+    def __init__(
+        self,
+        path: str = 'lava_cache.sqlite3',
+        max_bytes: int = 64 * 2 ** 20,
+        ttl: Optional[Mapping[str, Optional[float]]] = None,
+        immutable_after: Optional[timedelta] = timedelta(days=1),
+        timeout: float = 0.05
+    ):
+        """
+        :param path: Путь к файлу базы или ':memory:'
+        :param max_bytes: Предельный суммарный размер тел ответов
+        :param ttl: Изменения DEFAULT_TTL: секунды свежести по имени
+            метода, 0 - всегда проверять условным запросом,
+            None - не кэшировать метод
+        :param immutable_after: Через сколько после toDate страница
+            продаж считается закрытой; None - не считать страницы
+            неизменными
+        :param timeout: Сколько секунд ждать блокировки базы
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = dict(DEFAULT_TTL)
+        for endpoint, seconds in (ttl or {}).items():
+            if seconds is None:
+                self.ttl.pop(endpoint, None)
+            else:
+                self.ttl[endpoint] = seconds
+        self.immutable_after = immutable_after
+        self.stats = DiskCacheStats()
+        # Кэш можно делить между потоками LavaTopSync: соединение одно,
+        # обращения к нему идут под блокировкой
+        self._db = sqlite3.connect(path, timeout=timeout,
+                                   check_same_thread=False)
+        self._lock = threading.RLock()
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        self._secret = self._load_secret()
+        self._size = self._total()
+        if self._size > max_bytes:
+            self.evict()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> 'DiskCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _load_secret(self) -> bytes:
+        with self._db:
+            created = self._db.execute(
+                "INSERT OR IGNORE INTO meta (name, value) VALUES ('secret', ?)",
+                (secrets.token_bytes(32),)
+            ).rowcount
+            if created:
+                # Записи прежних версий с ключом без секрета
+                self._db.execute('DELETE FROM responses')
+        return self._db.execute(
+            "SELECT value FROM meta WHERE name = 'secret'"
+        ).fetchone()[0]
+
+    def credentials_key(self, *credentials: Optional[str]) -> str:
+        """
+        Отпечаток авторизации для ключа кэша: HMAC-SHA256 с секретом
+        базы. Сами ключи и пароли не сохраняются.
+        """
+        return hmac.new(self._secret, json.dumps(credentials).encode(),
+                        hashlib.sha256).hexdigest()
+
+    def cacheable(self, endpoint: Optional[str]) -> bool:
+        return endpoint in self.ttl
+
+    @staticmethod
+    def key(
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        credentials: str
+    ) -> str:
+        query = sorted((str(name), str(value))
+                       for name, value in (params or {}).items())
+        return hashlib.sha256(
+            json.dumps([endpoint, url, query, credentials]).encode()
+        ).hexdigest()
+
+    def ttl_for(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        now: Optional[float] = None
+    ) -> float:
+        """
+        Секунды свежести ответа; IMMUTABLE - ответ не устаревает.
+        """
+        if endpoint == 'get_sales_by_product' and params \
+                and self.immutable_after is not None \
+                and params.get('toDate'):
+            try:
+                to_date = datetime.fromisoformat(params['toDate'])
+            except (TypeError, ValueError):
+                pass
+            else:
+                closed = (to_date + self.immutable_after).timestamp()
+                if closed < (now if now is not None else time.time()):
+                    return IMMUTABLE
+        return self.ttl[endpoint]
+
+    def fresh(
+        self,
+        entry: CachedResponse,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        now: Optional[float] = None
+    ) -> bool:
+        """
+        Можно ли отдать запись без запроса. Считается по текущей
+        политике, поэтому изменение ttl действует и на старые записи.
+        """
+        now = now if now is not None else time.time()
+        return now < entry.stored + self.ttl_for(endpoint, params, now)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        Запись по ключу; None, если её нет или база занята.
+        """
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    'SELECT body, etag, last_modified, stored '
+                    'FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+            except sqlite3.OperationalError:
+                self.stats.busy += 1
+                return None
+            if row is None:
+                return None
+            try:
+                with self._db:
+                    self._db.execute(
+                        'UPDATE responses SET accessed = ? WHERE key = ?',
+                        (time.time(), key)
+                    )
+            except sqlite3.OperationalError:
+                self.stats.busy += 1
+            return CachedResponse(*row)
+
+    def put(self, key: str, endpoint: str, response: httpx.Response) -> None:
+        """
+        Сохранить успешный ответ. Ответы с Cache-Control: no-store
+        и больше max_bytes не сохраняются, как и ответы, пришедшие,
+        пока база занята.
+        """
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        body = response.content
+        if 'no-store' in cache_control or len(body) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                with self._db:
+                    previous = self._db.execute(
+                        'SELECT size FROM responses WHERE key = ?', (key,)
+                    ).fetchone()
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO responses (key, endpoint, '
+                        'body, etag, last_modified, stored, accessed, size) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (key, endpoint, body, response.headers.get('ETag'),
+                         response.headers.get('Last-Modified'), now, now,
+                         len(body))
+                    )
+                self._size += len(body) - (previous[0] if previous else 0)
+                self.stats.stored += 1
+                if self._size > self.max_bytes:
+                    self.evict()
+            except sqlite3.OperationalError:
+                self.stats.busy += 1
+
+    def refresh(self, key: str, response: httpx.Response) -> None:
+        """
+        Продлить свежесть записи после ответа 304. Если база занята,
+        запись останется устаревшей и будет проверена снова.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute(
+                        'UPDATE responses SET stored = ?, accessed = ?, '
+                        'etag = COALESCE(?, etag), '
+                        'last_modified = COALESCE(?, last_modified) '
+                        'WHERE key = ?',
+                        (now, now, response.headers.get('ETag'),
+                         response.headers.get('Last-Modified'), key)
+                    )
+            except sqlite3.OperationalError:
+                self.stats.busy += 1
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Удалить давно не читанные записи, пока размер больше max_bytes.
+        Размер пересчитывается по базе: файл могут менять другие процессы.
+        :return: Сколько записей удалено
+        """
+        with self._lock:
+            limit = self.max_bytes if max_bytes is None else max_bytes
+            self._size = self._total()
+            removed = []
+            for key, size in self._db.execute(
+                'SELECT key, size FROM responses ORDER BY accessed'
+            ):
+                if self._size <= limit:
+                    break
+                removed.append((key,))
+                self._size -= size
+            if removed:
+                with self._db:
+                    self._db.executemany(
+                        'DELETE FROM responses WHERE key = ?', removed
+                    )
+            self.stats.evicted += len(removed)
+            return len(removed)
+
+    def clear(self, endpoint: Optional[str] = None) -> None:
+        """
+        Удалить все записи или записи одного метода.
+        """
+        with self._lock:
+            with self._db:
+                if endpoint is None:
+                    self._db.execute('DELETE FROM responses')
+                else:
+                    self._db.execute(
+                        'DELETE FROM responses WHERE endpoint = ?', (endpoint,)
+                    )
+            self._size = self._total()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM responses'
+            ).fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        """Суммарный размер тел ответов, байты"""
+        return self._size
+
+    def _total(self) -> int:
+        return self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses'
+        ).fetchone()[0]
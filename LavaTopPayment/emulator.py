@@ -0,0 +1,1001 @@
+# Локальный шлюз Lava.top для нагрузочных тестов без сети.
+# python -m LavaTopPayment.emulator --port 8080 --latency 0.02 --error-rate 0.01
+# python -m LavaTopPayment.emulator --replay traffic.jsonl
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, \
+    Tuple
+
+import httpx
+
+from LavaTopPayment.endpoints import ENDPOINTS
+from LavaTopPayment.records import parse_datetime
+
+CURRENCIES = ('RUB', 'USD', 'EUR')
+EVENT_TYPES = ('payment_result', 'recurrent_payment')
+AUTH_TYPES = ('none', 'basic', 'api_key')
+
+
+class Faults:
+    """
+    Искажения ответов шлюза: задержка, ошибки сервера и 429.
+    Доли задаются вероятностью на запрос.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0
+    ):
+        """
+        :param latency: Задержка ответа, секунды
+        :param jitter: Случайная добавка к задержке от 0 до jitter секунд
+        :param error_rate: Доля ответов с error_status
+        :param error_status: Статус ошибки сервера
+        :param throttle_rate: Доля ответов 429
+        :param retry_after: Значение Retry-After у 429 и 503, секунды
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def delay(self, rng: random.Random) -> float:
+        return self.latency + (rng.random() * self.jitter
+                               if self.jitter else 0.0)
+
+    def inject(self, rng: random.Random) -> Optional['Reply']:
+        """Ответ-сбой или None, если запрос нужно обработать"""
+        if self.throttle_rate and rng.random() < self.throttle_rate:
+            return _error(429, 'Too many requests',
+                          {'retry-after': _seconds(self.retry_after)})
+        if self.error_rate and rng.random() < self.error_rate:
+            return _error(self.error_status, 'Injected failure',
+                          {'retry-after': _seconds(self.retry_after)})
+        return None
+
+    def __repr__(self) -> str:
+        return f'Faults(latency={self.latency}, jitter={self.jitter}, ' \
+               f'error_rate={self.error_rate}, ' \
+               f'throttle_rate={self.throttle_rate})'
+
+
+class EmulatorRequest(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+
+class Reply(NamedTuple):
+    status: int
+    body: bytes = b''
+    headers: Optional[Dict[str, str]] = None
+
+
+class EmulatorStats:
+    def __init__(self):
+        self.requests = 0
+        self.unauthorized = 0
+        self.throttled = 0
+        self.injected = 0
+        self.not_modified = 0
+        self.replayed = 0
+        self.webhooks_sent = 0
+        self.webhooks_failed = 0
+        self.by_endpoint: Dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{key}={value}' for key, value in vars(self).items()
+                           if key != 'by_endpoint')
+        return f'EmulatorStats({fields})'
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+def _seconds(value: float) -> str:
+    return str(max(0, math.ceil(value)))
+
+
+def _json(data: Any, status: int = 200,
+          headers: Optional[Dict[str, str]] = None) -> Reply:
+    return Reply(status, json.dumps(data).encode(), headers)
+
+
+def _error(status: int, message: str,
+           headers: Optional[Dict[str, str]] = None,
+           details: Optional[Dict[str, str]] = None) -> Reply:
+    return _json({
+        'error': message, 'details': details, 'timestamp': _iso(_now()),
+    }, status, headers)
+
+
+def _route(path: str) -> 're.Pattern':
+    return re.compile(re.sub(r'\{(\w+)\}', r'(?P<\1>[^/]+)', path) + '$')
+
+
+def _request_key(method: str, path: str, query: Dict[str, str],
+                 body: bytes) -> Tuple[str, str, str, str]:
+    if body:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True).encode()
+        except ValueError:
+            pass
+    return (method, path, json.dumps(sorted(query.items())),
+            body.decode('utf-8', 'replace'))
+
+
+class GatewayEmulator:
+    """
+    Локальная имитация gate.lava.top с состоянием в памяти.
+    Отвечает на все методы LavaTop: каталог, контракты, отчёты,
+    вебхуки, подписки и донаты. Созданный контракт через settle_after
+    секунд оплачивается (или нет, с долей payment_failure_rate), попадает
+    в продажи, а на вебхуки payment_result уходит событие; подписки
+    продлеваются renew() и шлют recurrent_payment.
+    Задержки, ошибки и 429 настраиваются через Faults, в том числе
+    отдельно для методов из ENDPOINTS. С replay отвечает записанным
+    RecordingTransport трафиком.
+
+        emulator = GatewayEmulator(products=50, settle_after=0.1)
+        client = LavaTop(api_key='key', transport=emulator.transport())
+        # или по сети: python -m LavaTopPayment.emulator --port 8080
+    """
+
+    def __init__(
+        self,
+        products: int = 20,
+        offers_per_product: int = 2,
+        products_page_size: int = 50,
+        sales: int = 0,
+        faults: Optional[Faults] = None,
+        endpoint_faults: Optional[Dict[str, Faults]] = None,
+        api_keys: Optional[Set[str]] = None,
+        rate_limit: Optional[float] = None,
+        rate_burst: int = 10,
+        settle_after: Optional[float] = 0.0,
+        payment_failure_rate: float = 0.0,
+        renew_every: Optional[float] = None,
+        webhook_transport: Optional[httpx.AsyncBaseTransport] = None,
+        replay: Optional[str] = None,
+        replay_fallback: bool = True,
+        webhook_list: bool = False,
+        etags: bool = False,
+        seed: Optional[int] = None
+    ):
+        """
+        :param products: Количество продуктов в каталоге;
+            каждый четвёртый - подписка
+        :param offers_per_product: Предложений у каждого продукта
+        :param products_page_size: Элементов каталога на странице
+        :param sales: Сколько оплаченных продаж создать у каждого продукта
+        :param faults: Искажения ответов для всех методов
+        :param endpoint_faults: Искажения для отдельных методов
+            по имени из ENDPOINTS, например {'create_invoice': Faults(...)}
+        :param api_keys: Допустимые ключи X-Api-Key и Bearer токены,
+            None - любой непустой
+        :param rate_limit: Запросов в секунду на ключ, сверх - 429
+        :param rate_burst: Сколько запросов подряд можно сверх rate_limit
+        :param settle_after: Через сколько секунд оплачивать контракт,
+            None - только вызовом settle()
+        :param payment_failure_rate: Доля неуспешных оплат
+        :param renew_every: Продлевать подписки раз в столько секунд
+        :param webhook_transport: Транспорт для доставки вебхуков,
+            например httpx.ASGITransport(app=WebhookReceiver(...))
+        :param replay: Файл RecordingTransport: записанные запросы
+            получают записанные ответы по порядку
+        :param replay_fallback: Незаписанные запросы обрабатывать
+            имитацией, иначе отвечать 404
+        :param webhook_list: GET /api/v1/webhooks отвечает списком всех
+            вебхуков (для list_webhooks), иначе последним созданным,
+            как ожидает get_webhooks
+        :param etags: Отдавать ETag в успешных GET ответах и 304
+            на If-None-Match с тем же ETag (для DiskCache)
+        :param seed: Зерно случайных чисел для воспроизводимых прогонов
+        """
+        self.faults = faults or Faults()
+        self.endpoint_faults = endpoint_faults or {}
+        unknown = set(self.endpoint_faults) - set(ENDPOINTS)
+        if unknown:
+            raise ValueError(f'Unknown endpoints: {sorted(unknown)}')
+        self.api_keys = api_keys
+        self.rate_limit = rate_limit
+        self.rate_burst = max(rate_burst, 1)
+        self.settle_after = settle_after
+        self.payment_failure_rate = payment_failure_rate
+        self.renew_every = renew_every
+        self.products_page_size = products_page_size
+        self.replay_fallback = replay_fallback
+        self.webhook_list = webhook_list
+        self.etags = etags
+        self.stats = EmulatorStats()
+        self._rng = random.Random(seed)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._webhook_transport = webhook_transport
+        self._webhook_client: Optional[httpx.AsyncClient] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._renewer: Optional[asyncio.Task] = None
+        # list_webhooks - тот же запрос, что get_webhooks
+        routes = {}
+        for endpoint in ENDPOINTS.values():
+            routes.setdefault((endpoint.method, endpoint.path), endpoint.name)
+        self._routes = [
+            (method, _route(path), name, getattr(self, f'_{name}'))
+            for (method, path), name in routes.items()
+        ]
+        self._replay: Dict[Tuple[str, str, str, str], List[Dict]] = {}
+        self._replay_next: Dict[Tuple[str, str, str, str], int] = {}
+
+        self.products: Dict[str, Dict[str, Any]] = {}
+        self.offers: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.contracts: Dict[str, Dict[str, Any]] = {}
+        self.sales: Dict[str, List[Dict[str, Any]]] = {}
+        self.webhooks: Dict[str, Dict[str, Any]] = {}
+        self.deliveries: List[Dict[str, Any]] = []
+        self._delivery_events: Dict[str, Tuple[str, bytes]] = {}
+        self._idempotency: Dict[str, str] = {}
+        self._seed_catalog(products, offers_per_product)
+        self._seed_sales(sales)
+        if replay is not None:
+            self.load_recording(replay)
+
+    # region Состояние
+    def _seed_catalog(self, products: int, offers: int) -> None:
+        for index in range(products):
+            id = f'00000000-0000-0000-0000-{index:012d}'
+            product = {
+                'id': id,
+                'title': f'Продукт {index}',
+                'description': f'Описание продукта {index}',
+                'type': 'SUBSCRIPTION' if index % 4 == 3 else 'COURSE',
+                'offers': [{
+                    'id': f'{index:08d}-0000-0000-0001-{offer:012d}',
+                    'name': f'Тариф {offer}',
+                    'description': None,
+                    'prices': [
+                        {'amount': 990.0 * (offer + 1), 'currency': currency}
+                        for currency in CURRENCIES
+                    ],
+                } for offer in range(offers)],
+            }
+            self.products[id] = product
+            self.sales[id] = []
+            for offer in product['offers']:
+                self.offers[offer['id']] = (id, offer)
+
+    def _seed_sales(self, count: int) -> None:
+        if not count:
+            return
+        start = _now() - timedelta(minutes=count)
+        for product_id, product in self.products.items():
+            offer = product['offers'][0]
+            for index in range(count):
+                price = offer['prices'][index % len(offer['prices'])]
+                contract = self._new_contract(
+                    f'buyer{index % 5000}@example.com', product_id, offer,
+                    price['currency'],
+                    created=start + timedelta(minutes=index)
+                )
+                self._complete(contract, True)
+
+    def _new_contract(self, email: str, product_id: str,
+                      offer: Dict[str, Any], currency: str,
+                      created: Optional[datetime] = None,
+                      parent: Optional[str] = None) -> Dict[str, Any]:
+        price = next(item for item in offer['prices']
+                     if item['currency'] == currency)
+        id = str(uuid.UUID(int=self._rng.getrandbits(128), version=4))
+        contract = self.contracts[id] = {
+            'id': id,
+            'status': 'new',
+            'amountTotal': {'amount': price['amount'], 'currency': currency},
+            'paymentUrl': f'https://app.lava.top/pay/{id}',
+            'email': email,
+            'productId': product_id,
+            'offerId': offer['id'],
+            'parentContractId': parent,
+            'subscription':
+                self.products[product_id]['type'] == 'SUBSCRIPTION',
+            'created': _iso(created or _now()),
+        }
+        return contract
+
+    def _complete(self, contract: Dict[str, Any], success: bool) -> None:
+        if not success:
+            contract['status'] = 'failed'
+        elif contract['subscription'] and contract['parentContractId'] is None:
+            contract['status'] = 'subscription-active'
+        else:
+            contract['status'] = 'completed'
+        if success:
+            self.sales[contract['productId']].append({
+                'id': contract['id'],
+                'created': contract['created'],
+                'status': contract['status'],
+                'amountTotal': contract['amountTotal'],
+                'buyer': {'email': contract['email']},
+            })
+
+    @staticmethod
+    def _invoice(contract: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: contract[key]
+                for key in ('id', 'status', 'amountTotal', 'paymentUrl')}
+
+    def _event(self, event_type: str, contract: Dict[str, Any],
+               error: Optional[str] = None) -> Dict[str, Any]:
+        product = self.products[contract['productId']]
+        return {
+            'eventType': event_type,
+            'product': {'id': product['id'], 'title': product['title']},
+            'contractId': contract['id'],
+            'parentContractId': contract['parentContractId'],
+            'buyer': {'email': contract['email']},
+            'amount': contract['amountTotal']['amount'],
+            'currency': contract['amountTotal']['currency'],
+            'status': contract['status'],
+            'timestamp': _iso(_now()),
+            'errorMessage': error,
+        }
+    # endregion
+
+    # region Симуляция оплат
+    async def settle(self, contract_id: str,
+                     success: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Завершить оплату контракта и отправить payment_result.
+        :param success: Итог оплаты, None - по payment_failure_rate
+        :return: Контракт
+        """
+        contract = self.contracts[contract_id]
+        if contract['status'] != 'new':
+            return contract
+        if success is None:
+            success = self._rng.random() >= self.payment_failure_rate
+        self._complete(contract, success)
+        await self._fire('payment_result', self._event(
+            'payment.success' if success else 'payment.failed', contract,
+            None if success else 'Payment declined'
+        ))
+        return contract
+
+    async def renew(self, contract_id: str,
+                    success: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Списать очередной платёж подписки и отправить recurrent_payment.
+        :param contract_id: Контракт подписки в статусе subscription-active
+        :param success: Итог списания, None - по payment_failure_rate
+        :return: Дочерний контракт платежа
+        """
+        parent = self.contracts[contract_id]
+        if parent['status'] != 'subscription-active':
+            raise ValueError(f'Subscription {contract_id} is not active')
+        if success is None:
+            success = self._rng.random() >= self.payment_failure_rate
+        product_id, offer = self.offers[parent['offerId']]
+        contract = self._new_contract(
+            parent['email'], product_id, offer,
+            parent['amountTotal']['currency'], parent=contract_id
+        )
+        self._complete(contract, success)
+        if not success:
+            parent['status'] = 'subscription-failed'
+        await self._fire('recurrent_payment', self._event(
+            'subscription.recurring.payment.success' if success
+            else 'subscription.recurring.payment.failed', contract,
+            None if success else 'Payment declined'
+        ))
+        return contract
+
+    async def renew_all(self) -> int:
+        """
+        Продлить все активные подписки.
+        :return: Сколько платежей создано
+        """
+        active = [id for id, contract in self.contracts.items()
+                  if contract['status'] == 'subscription-active']
+        for id in active:
+            await self.renew(id)
+        return len(active)
+
+    async def redeliver(self) -> int:
+        """
+        Повторить недоставленные вебхуки, как это делает шлюз.
+        :return: Сколько доставлено
+        """
+        delivered = 0
+        for delivery in self.deliveries:
+            if delivery['isDelivered']:
+                continue
+            webhook_id, body = self._delivery_events[delivery['id']]
+            webhook = self.webhooks.get(webhook_id)
+            if webhook is None:
+                continue
+            status = await self._post(webhook, body)
+            now = _iso(_now())
+            delivery['lastDeliveryAttemptAt'] = now
+            delivery['responseStatus'] = status
+            if status is not None and 200 <= status < 300:
+                delivery['isDelivered'] = True
+                delivery['deliveredAt'] = now
+                delivered += 1
+        return delivered
+
+    async def _fire(self, event_type: str, event: Dict[str, Any]) -> None:
+        body = json.dumps(event).encode()
+        hooks = [webhook for webhook in self.webhooks.values()
+                 if webhook['eventType'] == event_type and webhook['isActive']]
+        for webhook in hooks:
+            status = await self._post(webhook, body)
+            now = _iso(_now())
+            delivered = status is not None and 200 <= status < 300
+            delivery = {
+                'id': str(uuid.UUID(int=self._rng.getrandbits(128),
+                                    version=4)),
+                'webhookId': webhook['id'],
+                'isDelivered': delivered,
+                'deliveredAt': now if delivered else None,
+                'lastDeliveryAttemptAt': now,
+                'responseStatus': status,
+                'createdAt': now,
+            }
+            self.deliveries.append(delivery)
+            self._delivery_events[delivery['id']] = (webhook['id'], body)
+
+    async def _post(self, webhook: Dict[str, Any],
+                    body: bytes) -> Optional[int]:
+        headers = {'content-type': 'application/json'}
+        auth_type, auth_value = webhook['authType'], webhook['authValue']
+        if auth_type == 'basic' and auth_value:
+            token = base64.b64encode(auth_value.encode()).decode()
+            headers['authorization'] = f'Basic {token}'
+        elif auth_type == 'api_key' and auth_value:
+            headers['x-api-key'] = auth_value
+        if self._webhook_client is None:
+            self._webhook_client = httpx.AsyncClient(
+                transport=self._webhook_transport, timeout=5.0
+            )
+        try:
+            response = await self._webhook_client.post(
+                webhook['url'], content=body, headers=headers
+            )
+        except httpx.HTTPError:
+            self.stats.webhooks_failed += 1
+            return None
+        self.stats.webhooks_sent += 1
+        if response.status_code >= 300:
+            self.stats.webhooks_failed += 1
+        return response.status_code
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _settle_later(self, contract_id: str) -> None:
+        await asyncio.sleep(self.settle_after)
+        await self.settle(contract_id)
+
+    async def _renew_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.renew_every)
+            await self.renew_all()
+
+    def start(self) -> None:
+        """
+        Запустить продление подписок. Вызывается сам при lifespan
+        startup или при первом запросе.
+        """
+        if self.renew_every and self._renewer is None:
+            self._renewer = asyncio.ensure_future(self._renew_loop())
+
+    async def stop(self) -> None:
+        """
+        Остановить фоновые задачи и закрыть клиент вебхуков.
+        """
+        if self._renewer is not None:
+            self._renewer.cancel()
+            self._renewer = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+    # endregion
+
+    # region Запись и воспроизведение
+    def load_recording(self, path: str) -> int:
+        """
+        Загрузить трафик, записанный RecordingTransport.
+        :return: Сколько ответов загружено
+        """
+        count = 0
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = _request_key(
+                    record['method'], record['path'], record['query'],
+                    (record['request'] or '').encode()
+                )
+                self._replay.setdefault(key, []).append(record)
+                count += 1
+        return count
+
+    def _replayed(self, request: EmulatorRequest) -> Optional[Reply]:
+        key = _request_key(request.method, request.path, request.query,
+                           request.body)
+        records = self._replay.get(key)
+        if not records:
+            return None
+        index = self._replay_next.get(key, 0)
+        self._replay_next[key] = index + 1
+        record = records[index % len(records)]
+        self.stats.replayed += 1
+        return Reply(record['status'], record['body'].encode(),
+                     record['headers'])
+    # endregion
+
+    # region Обработка запросов
+    def transport(self) -> httpx.ASGITransport:
+        """Транспорт для LavaTop без сети"""
+        return httpx.ASGITransport(app=self)
+
+    def _authorized(self, headers: Dict[str, str]) -> Optional[str]:
+        credential = headers.get('x-api-key')
+        if credential is None:
+            authorization = headers.get('authorization', '')
+            if authorization.startswith('Bearer '):
+                credential = authorization[7:]
+            elif authorization.startswith('Basic '):
+                return authorization
+        if not credential:
+            return None
+        if self.api_keys is not None and credential not in self.api_keys:
+            return None
+        return credential
+
+    def _throttled(self, credential: str) -> bool:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(
+            credential, (float(self.rate_burst), now)
+        )
+        tokens = min(self.rate_burst,
+                     tokens + (now - updated) * self.rate_limit)
+        if tokens < 1:
+            self._buckets[credential] = (tokens, now)
+            return True
+        self._buckets[credential] = (tokens - 1, now)
+        return False
+
+    async def handle(self, request: EmulatorRequest) -> Reply:
+        """
+        Ответ на запрос: авторизация, ограничение частоты, искажения,
+        записанный трафик, затем имитация.
+        """
+        self.stats.requests += 1
+        for method, pattern, name, handler in self._routes:
+            if method != request.method:
+                continue
+            match = pattern.match(request.path)
+            if match is not None:
+                break
+        else:
+            return _error(404, 'Not found')
+        self.stats.by_endpoint[name] = self.stats.by_endpoint.get(name, 0) + 1
+        faults = self.endpoint_faults.get(name, self.faults)
+        delay = faults.delay(self._rng)
+        if delay:
+            await asyncio.sleep(delay)
+        credential = self._authorized(request.headers)
+        if credential is None:
+            self.stats.unauthorized += 1
+            return _error(401, 'Unauthorized')
+        if self.rate_limit and self._throttled(credential):
+            self.stats.throttled += 1
+            return _error(429, 'Too many requests', {
+                'retry-after': _seconds(1 / self.rate_limit)
+            })
+        reply = faults.inject(self._rng)
+        if reply is not None:
+            self.stats.injected += 1
+            return reply
+        if self._replay:
+            reply = self._replayed(request)
+            if reply is not None:
+                return reply
+            if not self.replay_fallback:
+                return _error(404, 'Not recorded')
+        try:
+            reply = handler(request, **match.groupdict())
+        except (ValueError, KeyError, TypeError) as error:
+            return _error(400, 'Bad request', details={'error': str(error)})
+        if self.etags and request.method == 'GET' and reply.status == 200:
+            reply = self._tagged(request, reply)
+        return reply
+
+    def _tagged(self, request: EmulatorRequest, reply: Reply) -> Reply:
+        etag = f'"{hashlib.sha256(reply.body).hexdigest()[:32]}"'
+        if request.headers.get('if-none-match') == etag:
+            self.stats.not_modified += 1
+            return Reply(304, headers={'etag': etag})
+        return reply._replace(headers={**(reply.headers or {}), 'etag': etag})
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        self.start()
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        query = httpx.QueryParams(scope.get('query_string', b'').decode())
+        reply = await self.handle(EmulatorRequest(
+            scope['method'],
+            scope['path'],
+            dict(query),
+            {key.decode('latin-1').lower(): value.decode('latin-1')
+             for key, value in scope['headers']},
+            body,
+        ))
+        headers = [(b'content-length', str(len(reply.body)).encode())]
+        if reply.body:
+            headers.append((b'content-type', b'application/json'))
+        for key, value in (reply.headers or {}).items():
+            if key.lower() not in ('content-length', 'content-type'):
+                headers.append((key.lower().encode(), value.encode()))
+        await send({
+            'type': 'http.response.start',
+            'status': reply.status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': reply.body})
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    def _page(items: List[Any], query: Dict[str, str],
+              default_size: int = 20) -> Dict[str, Any]:
+        page = max(int(query.get('page', 0)), 0)
+        size = max(int(query.get('size', default_size)), 1)
+        return {
+            'items': items[page * size:(page + 1) * size],
+            'total': len(items),
+            'page': page,
+            'size': size,
+            'totalPages': math.ceil(len(items) / size),
+        }
+    # endregion
+
+    # region Вебхуки
+    def _webhook(self, webhook: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in webhook.items()
+                if key != 'authValue'}
+
+    def _apply_webhook(self, webhook: Dict[str, Any],
+                       data: Dict[str, Any]) -> Optional[Reply]:
+        if 'eventType' in data and data['eventType'] not in EVENT_TYPES:
+            return _error(400, 'Unknown eventType')
+        for key in ('url', 'name', 'apiKeyId', 'eventType', 'isActive'):
+            if key in data:
+                webhook[key] = data[key]
+        auth = data.get('authConfig')
+        if auth is not None:
+            if auth.get('authType') not in AUTH_TYPES:
+                return _error(400, 'Unknown authType')
+            webhook['authType'] = auth['authType']
+            webhook['authValue'] = auth.get('authValue')
+        webhook['updatedAt'] = _iso(_now())
+        return None
+
+    def _create_webhook(self, request: EmulatorRequest) -> Reply:
+        data = request.json()
+        missing = [key for key in ('url', 'name', 'apiKeyId', 'eventType')
+                   if not data.get(key)]
+        if missing:
+            return _error(400, 'Validation failed',
+                          details={key: 'required' for key in missing})
+        now = _iso(_now())
+        webhook = {
+            'id': str(uuid.UUID(int=self._rng.getrandbits(128), version=4)),
+            'isActive': True, 'authType': 'none', 'authValue': None,
+            'createdAt': now,
+        }
+        error = self._apply_webhook(webhook, data)
+        if error is not None:
+            return error
+        self.webhooks[webhook['id']] = webhook
+        return _json(self._webhook(webhook))
+
+    def _get_webhooks(self, request: EmulatorRequest) -> Reply:
+        if self.webhook_list:
+            return _json([self._webhook(webhook)
+                          for webhook in self.webhooks.values()])
+        if not self.webhooks:
+            return _error(404, 'Webhook not found')
+        return _json(self._webhook(list(self.webhooks.values())[-1]))
+
+    def _get_webhook_history(self, request: EmulatorRequest) -> Reply:
+        page = self._page(self.deliveries[::-1], request.query)
+        del page['totalPages']
+        return _json(page)
+
+    def _update_webhook(self, request: EmulatorRequest,
+                        webhookId: str) -> Reply:
+        webhook = self.webhooks.get(webhookId)
+        if webhook is None:
+            return _error(404, 'Webhook not found')
+        error = self._apply_webhook(webhook, request.json() or {})
+        if error is not None:
+            return error
+        return _json(self._webhook(webhook))
+
+    def _delete_webhook(self, request: EmulatorRequest,
+                        webhookId: str) -> Reply:
+        if self.webhooks.pop(webhookId, None) is None:
+            return _error(404, 'Webhook not found')
+        return Reply(204)
+    # endregion
+
+    # region Продукты и контракты
+    def _get_products(self, request: EmulatorRequest) -> Reply:
+        page = max(int(request.query.get('page', 0)), 0)
+        products = list(self.products.values())
+        start = page * self.products_page_size
+        stop = start + self.products_page_size
+        return _json({
+            'items': products[start:stop],
+            'nextPage': f'/api/v2/products?page={page + 1}'
+            if stop < len(products) else None,
+        })
+
+    def _create_invoice(self, request: EmulatorRequest) -> Reply:
+        key = request.headers.get('idempotency-key')
+        if key is not None and key in self._idempotency:
+            return _json(self._invoice(
+                self.contracts[self._idempotency[key]]
+            ))
+        data = request.json()
+        missing = [field for field in ('email', 'offerId', 'currency')
+                   if not data.get(field)]
+        if missing:
+            return _error(400, 'Validation failed',
+                          details={field: 'required' for field in missing})
+        offer = self.offers.get(data['offerId'])
+        if offer is None:
+            return _error(404, 'Offer not found')
+        product_id, offer = offer
+        if not any(price['currency'] == data['currency']
+                   for price in offer['prices']):
+            return _error(400, 'Currency is not available for the offer')
+        contract = self._new_contract(data['email'], product_id, offer,
+                                      data['currency'])
+        if key is not None:
+            self._idempotency[key] = contract['id']
+        if self.settle_after is not None:
+            self._spawn(self._settle_later(contract['id']))
+        return _json(self._invoice(contract))
+
+    def _get_product_by_id(self, request: EmulatorRequest) -> Reply:
+        contract = self.contracts.get(request.query.get('id'))
+        if contract is None:
+            return _error(404, 'Contract not found')
+        return _json(self._invoice(contract))
+
+    def _update_product_v2(self, request: EmulatorRequest,
+                           productId: str) -> Reply:
+        product = self.products.get(productId)
+        if product is None:
+            return _error(404, 'Product not found')
+        data = request.json() or {}
+        for key in ('title', 'description'):
+            if key in data:
+                product[key] = data[key]
+        for change in data.get('offers') or ():
+            offer = self.offers.get(change.get('id'), (None, None))[1]
+            if offer is not None:
+                offer.update({key: value for key, value in change.items()
+                              if key != 'id'})
+        return _json(product)
+
+    def _cancel_subscription(self, request: EmulatorRequest) -> Reply:
+        contract = self.contracts.get(request.query.get('contractId'))
+        if contract is None or \
+                contract['email'] != request.query.get('email') or \
+                not contract['subscription']:
+            return _error(404, 'Subscription not found')
+        if contract['status'] == 'subscription-active':
+            contract['status'] = 'subscription-cancelled'
+        return Reply(204)
+    # endregion
+
+    # region Отчёты
+    def _get_sales(self, request: EmulatorRequest) -> Reply:
+        items = []
+        for product_id, sales in self.sales.items():
+            totals: Dict[str, List[float]] = {}
+            for sale in sales:
+                amount = sale['amountTotal']
+                total = totals.setdefault(amount['currency'], [0, 0.0])
+                total[0] += 1
+                total[1] += amount['amount']
+            items.append({
+                'productId': product_id,
+                'title': self.products[product_id]['title'],
+                'status': 'completed',
+                'sales': [{'currency': currency, 'count': count,
+                           'amountTotal': amount}
+                          for currency, (count, amount) in totals.items()],
+            })
+        return _json(self._page(items, request.query))
+
+    def _get_sales_by_product(self, request: EmulatorRequest,
+                              productId: str) -> Reply:
+        sales = self.sales.get(productId)
+        if sales is None:
+            return _error(404, 'Product not found')
+        query = request.query
+        filters: List[Callable[[Dict[str, Any]], bool]] = []
+        if query.get('fromDate'):
+            start = parse_datetime(query['fromDate'])
+            filters.append(
+                lambda sale: parse_datetime(sale['created']) >= start
+            )
+        if query.get('toDate'):
+            end = parse_datetime(query['toDate'])
+            filters.append(lambda sale: parse_datetime(sale['created']) <= end)
+        if query.get('currency'):
+            filters.append(lambda sale: sale['amountTotal']['currency']
+                           == query['currency'])
+        if query.get('status'):
+            filters.append(lambda sale: sale['status'] == query['status'])
+        if query.get('search'):
+            search = query['search'].lower()
+            filters.append(lambda sale: search in sale['buyer']['email'])
+        items = [sale for sale in sales
+                 if all(check(sale) for check in filters)]
+        return _json(self._page(items, query))
+    # endregion
+
+    # region Прочее
+    def _get_donate_link(self, request: EmulatorRequest) -> Reply:
+        return _json({'url': 'https://app.lava.top/donate/emulator'})
+    # endregion
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Транспорт, который записывает запросы и ответы в JSON Lines для
+    GatewayEmulator(replay=...). Заголовки авторизации не пишутся.
+
+        transport = RecordingTransport('traffic.jsonl')
+        client = LavaTop(api_key=key, transport=transport)
+    """
+
+    def __init__(self, path: str,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        :param path: Файл записи, дописывается
+        :param transport: Транспорт, через который идут запросы,
+            по умолчанию сеть
+        """
+        self.path = path
+        self.recorded = 0
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    async def handle_async_request(
+        self,
+        request: httpx.Request
+    ) -> httpx.Response:
+        body = await request.aread()
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        content = await response.aread()
+        elapsed = time.perf_counter() - started
+        headers = {key: value for key, value in response.headers.items()
+                   if key.lower() in ('content-type', 'retry-after', 'etag',
+                                      'last-modified')}
+        self._file.write(json.dumps({
+            'method': request.method,
+            'path': request.url.path,
+            'query': dict(request.url.params),
+            'request': body.decode('utf-8', 'replace') or None,
+            'status': response.status_code,
+            'headers': headers,
+            'body': content.decode('utf-8', 'replace'),
+            'elapsed': round(elapsed, 6),
+        }, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.recorded += 1
+        return httpx.Response(response.status_code, headers=headers,
+                              content=content, request=request)
+
+    async def aclose(self) -> None:
+        self._file.close()
+        await self._transport.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Локальный шлюз Lava.top (нужен uvicorn)'
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--sales', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None)
+    parser.add_argument('--settle-after', type=float, default=0.0)
+    parser.add_argument('--payment-failure-rate', type=float, default=0.0)
+    parser.add_argument('--renew-every', type=float, default=None)
+    parser.add_argument('--replay', default=None,
+                        help='Файл RecordingTransport')
+    parser.add_argument('--etags', action='store_true',
+                        help='ETag и 304 на If-None-Match')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    import uvicorn
+
+    emulator = GatewayEmulator(
+        products=args.products,
+        sales=args.sales,
+        faults=Faults(latency=args.latency, jitter=args.jitter,
+                      error_rate=args.error_rate,
+                      throttle_rate=args.throttle_rate),
+        rate_limit=args.rate_limit,
+        settle_after=args.settle_after,
+        payment_failure_rate=args.payment_failure_rate,
+        renew_every=args.renew_every,
+        replay=args.replay,
+        etags=args.etags,
+        seed=args.seed,
+    )
+    uvicorn.run(emulator, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
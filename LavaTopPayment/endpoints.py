@@ -0,0 +1,336 @@
+from datetime import datetime
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, \
+    Optional, Tuple, Type, Union
+
+import httpx
+from pydantic import BaseModel
+
+from LavaTopPayment.decoding import decode, loads
+from LavaTopPayment.models.donate import Donate
+from LavaTopPayment.models.products import Invoice, ProductsResponse
+from LavaTopPayment.models.reports import PartnerSalesPageDto, Reports
+from LavaTopPayment.models.webhooks import WebhookHistoryResponse, \
+    WebhookResponse
+
+if TYPE_CHECKING:
+    from LavaTopPayment.disk_cache import CachedResponse, DiskCache
+    from LavaTopPayment.instrumentation import Instrumentation
+
+PATH = 'path'
+QUERY = 'query'
+BODY = 'body'
+JSON = 'json'
+HEADER = 'header'
+
+
+class Param(NamedTuple):
+    """
+    Параметр метода клиента.
+    name - имя аргумента метода, alias - имя в запросе,
+    location - куда он попадает: path, query, body (поле JSON тела),
+    json (всё тело целиком) или header.
+    """
+    name: str
+    alias: str
+    location: str
+    convert: Optional[Callable[[Any], Any]] = None
+
+
+class Request(NamedTuple):
+    method: str
+    url: str
+    params: Optional[Dict[str, Any]]
+    json: Any
+    headers: Optional[Dict[str, str]]
+    idempotent: Optional[bool]
+
+
+def _isoformat(value: datetime) -> str:
+    return value.isoformat()
+
+
+def _enum_value(value: Any) -> Any:
+    """Currency.USD -> 'USD'; строки передаются как есть"""
+    return value.value if isinstance(value, Enum) else value
+
+
+def _dump(value: BaseModel) -> Dict[str, Any]:
+    return value.model_dump()
+
+
+def next_page_url(base_url: str, next_page: str) -> str:
+    """
+    Полный URL ссылки nextPage. Ссылка на другой адрес отклоняется:
+    запрос по ней ушёл бы с ключами авторизации клиента.
+    """
+    base = httpx.URL(base_url)
+    url = base.join(next_page)
+    if (url.scheme, url.host, url.port) != (base.scheme, base.host,
+                                            base.port):
+        raise ValueError(f'nextPage points outside {base_url}: {next_page}')
+    return str(url)
+
+
+def webhook_list(data: Any) -> List[WebhookResponse]:
+    """
+    Вебхуки из ответа list_webhooks: список, страница с items
+    или один вебхук.
+    """
+    if isinstance(data, dict):
+        data = data['items'] if 'items' in data else [data]
+    return [WebhookResponse.model_validate(item) for item in data or ()]
+
+
+class Endpoint:
+    """
+    Описание метода API: HTTP метод, шаблон пути, параметры и модель ответа.
+    response - класс модели, dict (ответ без модели) или None (без тела).
+    idempotent_if - имя параметра, с которым неидемпотентный запрос
+    можно повторять (ключ идемпотентности).
+    """
+    __slots__ = ('name', 'method', 'path', 'params', 'response',
+                 'idempotent_if')
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        path: str,
+        params: Tuple[Param, ...] = (),
+        response: Union[Type[BaseModel], Type[dict], None] = None,
+        idempotent_if: Optional[str] = None
+    ):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.params = params
+        self.response = response
+        self.idempotent_if = idempotent_if
+
+    def build(self, base_url: str, arguments: Dict[str, Any]) -> Request:
+        """
+        Собрать запрос из аргументов метода.
+        Параметры со значением None не отправляются.
+        """
+        path_args = {}
+        query = None
+        body = None
+        headers = None
+        for param in self.params:
+            value = arguments.get(param.name)
+            if value is None:
+                continue
+            if param.convert is not None:
+                value = param.convert(value)
+            location = param.location
+            if location == QUERY:
+                if query is None:
+                    query = {}
+                query[param.alias] = value
+            elif location == BODY:
+                if body is None:
+                    body = {}
+                body[param.alias] = value
+            elif location == PATH:
+                path_args[param.alias] = value
+            elif location == JSON:
+                body = value
+            elif location == HEADER:
+                if headers is None:
+                    headers = {}
+                headers[param.alias] = value
+        idempotent = None
+        if self.idempotent_if is not None:
+            idempotent = arguments.get(self.idempotent_if) is not None
+        url = base_url + (self.path.format(**path_args) if path_args
+                          else self.path)
+        return Request(self.method, url, query, body, headers, idempotent)
+
+    def at(self, url: str) -> Request:
+        """
+        Запрос метода по готовому URL без параметров, например nextPage.
+        """
+        return Request(self.method, url, None, None, None, None)
+
+    @property
+    def coalescible(self) -> bool:
+        """GET с моделью ответа: такие запросы можно объединять"""
+        return self.method == 'GET' and self.response not in (None, dict)
+
+    def parse(self, content: bytes) -> Any:
+        """
+        Разобрать тело ответа по описанию метода.
+        """
+        if self.response is None:
+            return None
+        if self.response is dict:
+            return loads(content)
+        return decode(self.response, content)
+
+
+class EndpointCall:
+    """
+    Один вызов метода API, общий для LavaTop и LavaTopSync: событие
+    instrumentation, DiskCache и разбор ответа. Запрос выполняет клиент:
+
+        call = EndpointCall(name, request, parse, instrumentation,
+                            cache, credentials)
+        response = None
+        if call.request is not None:
+            response = client._request(*call.request, event=call.event,
+                                       endpoint=name)
+        return call.result(response)
+
+    request - запрос с условными заголовками, если в кэше есть
+    устаревшая запись, или None, если свежий ответ есть в кэше.
+    Исход кэша - в event.context['cache']: hit, revalidated или miss.
+    На hit хуки instrumentation не вызываются: запроса не было.
+    """
+    __slots__ = ('endpoint', 'request', 'event', '_parse',
+                 '_instrumentation', '_cache', '_key', '_entry')
+
+    def __init__(
+        self,
+        endpoint: str,
+        request: Request,
+        parse: Callable[[bytes], Any],
+        instrumentation: Optional['Instrumentation'] = None,
+        cache: Optional['DiskCache'] = None,
+        credentials: Optional[str] = None
+    ):
+        """
+        :param endpoint: Имя метода из ENDPOINTS
+        :param request: Собранный запрос, см. Endpoint.build
+        :param parse: Разбор тела ответа
+        :param instrumentation: Хуки клиента
+        :param cache: DiskCache клиента
+        :param credentials: Отпечаток авторизации для ключа кэша
+        """
+        self.endpoint = endpoint
+        self._parse = parse
+        self._instrumentation = instrumentation
+        self.event = None
+        if instrumentation is not None:
+            from LavaTopPayment.instrumentation import RequestEvent
+
+            self.event = RequestEvent(endpoint, request.method, request.url)
+        self._cache: Optional['DiskCache'] = None
+        self._entry: Optional['CachedResponse'] = None
+        if cache is not None and request.method == 'GET' \
+                and request.headers is None and cache.cacheable(endpoint):
+            self._cache = cache
+            self._key = cache.key(endpoint, request.url, request.params,
+                                  credentials)
+            entry = self._entry = cache.get(self._key)
+            if entry is not None and cache.fresh(entry, endpoint,
+                                                 request.params):
+                cache.stats.hits += 1
+                if self.event is not None:
+                    self.event.context['cache'] = 'hit'
+                request = None
+            elif entry is not None:
+                request = request._replace(headers=entry.validators())
+        self.request: Optional[Request] = request
+
+    def result(self, response: Optional[httpx.Response] = None) -> Any:
+        """
+        Разобрать ответ на request; без ответа - запись из кэша.
+        С instrumentation - с замером времени разбора.
+        """
+        if response is None:
+            return self._parse(self._entry.body)
+        content = self._content(response)
+        if self.event is None:
+            return self._parse(content)
+        from LavaTopPayment.instrumentation import timed_parse
+
+        return timed_parse(self._instrumentation, self.event, self._parse,
+                           content)
+
+    def _content(self, response: httpx.Response) -> bytes:
+        cache = self._cache
+        if cache is None:
+            return response.content
+        if response.status_code == 304 and self._entry is not None:
+            cache.refresh(self._key, response)
+            cache.stats.revalidated += 1
+            outcome = 'revalidated'
+            content = self._entry.body
+        else:
+            cache.put(self._key, self.endpoint, response)
+            cache.stats.misses += 1
+            outcome = 'miss'
+            content = response.content
+        if self.event is not None:
+            self.event.context['cache'] = outcome
+        return content
+
+
+_PAGE = (
+    Param('page', 'page', QUERY),
+    Param('size', 'size', QUERY),
+)
+
+ENDPOINTS: Dict[str, Endpoint] = {endpoint.name: endpoint for endpoint in (
+    # Вебхуки
+    Endpoint('create_webhook', 'POST', '/api/v1/webhooks', (
+        Param('url', 'url', BODY),
+        Param('name', 'name', BODY),
+        Param('api_key_id', 'apiKeyId', BODY),
+        Param('event_type', 'eventType', BODY),
+        Param('auth_config', 'authConfig', BODY, _dump),
+    ), WebhookResponse),
+    Endpoint('get_webhooks', 'GET', '/api/v1/webhooks',
+             response=WebhookResponse),
+    Endpoint('list_webhooks', 'GET', '/api/v1/webhooks', response=dict),
+    Endpoint('get_webhook_history', 'GET', '/api/v1/webhook-history',
+             _PAGE, WebhookHistoryResponse),
+    Endpoint('update_webhook', 'PUT', '/api/v1/webhooks/{webhookId}', (
+        Param('webhook_id', 'webhookId', PATH),
+        Param('url', 'url', BODY),
+        Param('is_active', 'isActive', BODY),
+        Param('name', 'name', BODY),
+        Param('event_type', 'eventType', BODY),
+        Param('auth_config', 'authConfig', BODY, _dump),
+    ), WebhookResponse),
+    Endpoint('delete_webhook', 'DELETE', '/api/v1/webhooks/{webhookId}', (
+        Param('webhook_id', 'webhookId', PATH),
+    )),
+    # Продукты
+    Endpoint('get_products', 'GET', '/api/v2/products',
+             response=ProductsResponse),
+    Endpoint('create_invoice', 'POST', '/api/v2/invoice', (
+        Param('email', 'email', BODY),
+        Param('offer_id', 'offerId', BODY),
+        Param('currency', 'currency', BODY),
+        Param('payment_method', 'paymentMethod', BODY),
+        Param('buyer_language', 'buyerLanguage', BODY),
+        Param('idempotency_key', 'Idempotency-Key', HEADER),
+    ), Invoice, idempotent_if='idempotency_key'),
+    Endpoint('get_product_by_id', 'GET', '/api/v1/invoice', (
+        Param('payment_id', 'id', QUERY),
+    ), Invoice),
+    Endpoint('update_product_v2', 'PUT', '/api/v2/products/{productId}', (
+        Param('product_id', 'productId', PATH),
+        Param('product_data', 'product_data', JSON),
+    ), dict),
+    # Подписки
+    Endpoint('cancel_subscription', 'DELETE', '/api/v1/subscriptions', (
+        Param('contract_id', 'contractId', QUERY),
+        Param('email', 'email', QUERY),
+    )),
+    # Отчёты
+    Endpoint('get_sales', 'GET', '/api/v1/sales', _PAGE, Reports),
+    Endpoint('get_sales_by_product', 'GET', '/api/v1/sales/{productId}', (
+        Param('product_id', 'productId', PATH),
+        *_PAGE,
+        Param('from_date', 'fromDate', QUERY, _isoformat),
+        Param('to_date', 'toDate', QUERY, _isoformat),
+        Param('currency', 'currency', QUERY, _enum_value),
+        Param('status', 'status', QUERY, _enum_value),
+        Param('search', 'search', QUERY),
+    ), PartnerSalesPageDto),
+    # Донаты
+    Endpoint('get_donate_link', 'GET', '/api/v1/donate', response=Donate),
+)}
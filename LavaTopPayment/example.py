@@ -1,5 +1,7 @@
 # Пример использования клиента
+# python -m LavaTopPayment.example --offline - против GatewayEmulator, без сети
 import asyncio
+import sys
 
 from LavaTopPayment import (
     LavaTop,
@@ -15,12 +17,25 @@ TOKEN = 'TOKEN'
 
 
 async def main():
-    client = LavaTop(api_key=TOKEN)
+    async with LavaTop(api_key=TOKEN) as client:
+        await run(client)
+
+
+async def main_offline():
+    from LavaTopPayment.emulator import GatewayEmulator
+
+    emulator = GatewayEmulator(settle_after=None)
+    async with LavaTop(api_key=TOKEN,
+                       transport=emulator.transport()) as client:
+        await run(client, offer_id=next(iter(emulator.offers)))
+
+
+async def run(client: LavaTop, offer_id: str = 'uuid'):
     products = await client.get_products()
     print(products)
     invoice = await client.create_invoice(
         email='email@gmail.com',
-        offer_id='uuid',
+        offer_id=offer_id,
         currency=Currency.RUB,
         payment_method=PaymentMethod.BANK131,
         buyer_language=Language.RU
@@ -49,5 +64,5 @@ async def main():
 
 if __name__ == '__main__':
     pass
-    asyncio.run(main())
+    asyncio.run(main_offline() if '--offline' in sys.argv else main())
 
@@ -0,0 +1,236 @@
+import csv
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, IO, Iterable, List, Optional, Union
+
+
+class RawPage:
+    """
+    Страница ответа в виде словарей, без моделей.
+    Подходит для iter_pages.
+    """
+    __slots__ = ('items', 'total', 'page', 'size', 'totalPages')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.items: List[Dict[str, Any]] = data['items']
+        self.total: int = data.get('total', 0)
+        self.page: int = data.get('page', 0)
+        self.size: int = data.get('size', 0)
+        self.totalPages: Optional[int] = data.get('totalPages')
+
+
+class DictColumn:
+    """
+    Колонка строк со словарным кодированием: коды в array,
+    каждое уникальное значение хранится один раз.
+    """
+
+    def __init__(self, typecode: str = 'I'):
+        self.codes = array(typecode)
+        self.values: List[Optional[str]] = []
+        self._index: Dict[Optional[str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def append(self, value: Optional[str]) -> None:
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+    def to_numpy(self):
+        import numpy
+
+        return numpy.asarray(self.values, dtype=object)[
+            numpy.frombuffer(self.codes, dtype=self.codes.typecode)
+        ]
+
+    def to_arrow(self):
+        import pyarrow
+        import pyarrow.compute
+
+        indices = pyarrow.array(self.codes, type=pyarrow.uint32())
+        values = self.values
+        null = self._index.get(None)
+        if null is not None:
+            # None - пустой индекс, а не null в словаре: такой словарь
+            # Parquet записать не может
+            indices = pyarrow.compute.if_else(
+                pyarrow.compute.equal(indices, null), None, indices
+            )
+            values = [value if value is not None else '' for value in values]
+        return pyarrow.DictionaryArray.from_arrays(
+            indices, pyarrow.array(values, type=pyarrow.string())
+        )
+
+
+class Columns:
+    """
+    Базовый класс колоночного буфера.
+    Наследники задают columns - имена колонок в порядке вывода.
+    """
+    columns: tuple = ()
+
+    def __len__(self) -> int:
+        return len(getattr(self, self.columns[0]))
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        Колонки как массивы NumPy (нужен numpy).
+        """
+        return {name: self._numpy_column(name) for name in self.columns}
+
+    def _numpy_column(self, name: str):
+        import numpy
+
+        column = getattr(self, name)
+        if isinstance(column, DictColumn):
+            return column.to_numpy()
+        if isinstance(column, array):
+            return numpy.frombuffer(column, dtype=column.typecode)
+        return numpy.asarray(column, dtype=object)
+
+    def to_arrow(self):
+        """
+        Колонки как pyarrow.Table (нужен pyarrow).
+        Строковые колонки со словарным кодированием - DictionaryArray.
+        """
+        import pyarrow
+
+        return pyarrow.Table.from_arrays(
+            [self._arrow_column(name) for name in self.columns],
+            names=list(self.columns)
+        )
+
+    def _arrow_column(self, name: str):
+        import pyarrow
+
+        column = getattr(self, name)
+        if isinstance(column, DictColumn):
+            return column.to_arrow()
+        return pyarrow.array(column)
+
+    def write_parquet(self, path: str, **kwargs) -> None:
+        """
+        Записать Parquet файл (нужен pyarrow).
+        """
+        import pyarrow.parquet
+
+        pyarrow.parquet.write_table(self.to_arrow(), path, **kwargs)
+
+    def write_csv(self, file: Union[str, IO[str]]) -> None:
+        """
+        Записать CSV с заголовком.
+        :param file: Путь или открытый текстовый файл
+        """
+        if isinstance(file, str):
+            with open(file, 'w', newline='', encoding='utf-8') as handle:
+                self.write_csv(handle)
+            return
+        writer = csv.writer(file)
+        writer.writerow(self.columns)
+        writer.writerows(zip(*(self._csv_column(name) for name in self.columns)))
+
+    def _csv_column(self, name: str) -> Iterable[Any]:
+        return iter(getattr(self, name))
+
+
+class SalesColumns(Columns):
+    """
+    Продажи по продукту (PartnerSaleDetailsDto) в колонках.
+    created - время в секундах от эпохи (UTC),
+    status, currency и email - словарное кодирование.
+    """
+    columns = ('id', 'created', 'status', 'amount', 'currency', 'email')
+
+    def __init__(self):
+        self.id: List[str] = []
+        self.created = array('d')
+        self.status = DictColumn('B')
+        self.amount = array('d')
+        self.currency = DictColumn('B')
+        self.email = DictColumn('I')
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> None:
+        """
+        Добавить элементы страницы продаж в виде словарей.
+        """
+        for item in items:
+            amount_total = item['amountTotal']
+            self.id.append(item['id'])
+            self.created.append(iso_timestamp(item['created']))
+            self.status.append(item['status'])
+            self.amount.append(amount_total['amount'])
+            self.currency.append(amount_total['currency'])
+            self.email.append((item.get('buyer') or {}).get('email'))
+
+    def _numpy_column(self, name: str):
+        column = super()._numpy_column(name)
+        if name == 'created':
+            column = (column * 1_000_000).astype('int64') \
+                .astype('datetime64[us]')
+        return column
+
+    def _arrow_column(self, name: str):
+        import pyarrow
+
+        if name == 'created':
+            return pyarrow.array(
+                [int(value * 1_000_000) for value in self.created],
+                type=pyarrow.timestamp('us', tz='UTC')
+            )
+        return super()._arrow_column(name)
+
+    def _csv_column(self, name: str) -> Iterable[Any]:
+        if name == 'created':
+            return (datetime.fromtimestamp(value, timezone.utc).isoformat()
+                    for value in self.created)
+        return super()._csv_column(name)
+
+
+class ReportColumns(Columns):
+    """
+    Отчёт по продажам (ReportsResponses) в колонках:
+    одна строка на каждую пару продукт / валюта из sales.
+    """
+    columns = ('productId', 'title', 'status', 'currency', 'count',
+               'amountTotal')
+
+    def __init__(self):
+        self.productId = DictColumn('I')
+        self.title = DictColumn('I')
+        self.status = DictColumn('B')
+        self.currency = DictColumn('B')
+        self.count = array('q')
+        self.amountTotal = array('d')
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> None:
+        """
+        Добавить элементы страницы отчёта в виде словарей.
+        """
+        for item in items:
+            for sale in item['sales']:
+                self.productId.append(item['productId'])
+                self.title.append(item['title'])
+                self.status.append(item['status'])
+                self.currency.append(sale['currency'])
+                self.count.append(sale['count'])
+                self.amountTotal.append(sale['amountTotal'])
+
+
+def iso_timestamp(value: str) -> float:
+    """
+    Время ISO 8601 в секундах от эпохи, без зоны - UTC.
+    """
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
@@ -0,0 +1,516 @@
+import time
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, \
+    Sequence, TypeVar, Union
+
+import httpx
+
+T = TypeVar('T')
+
+# Фазы запроса по событиям trace из httpcore
+PHASES: Dict[str, str] = {
+    'connect_tcp': 'connect',
+    'connect_unix_socket': 'connect',
+    'start_tls': 'tls',
+    'send_request_headers': 'send',
+    'send_request_body': 'send',
+    'receive_response_headers': 'wait',
+    'receive_response_body': 'receive',
+}
+
+
+class PhaseTrace:
+    """
+    Сбор времени фаз одной попытки запроса через расширение trace httpx:
+    queue - ожидание соединения из пула, connect - TCP, tls - рукопожатие,
+    send - отправка запроса, wait - ответ сервера до заголовков,
+    receive - чтение тела.
+    """
+    __slots__ = ('started', 'first', 'phases', '_open')
+
+    def __init__(self, started: float):
+        self.started = started
+        self.first: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self._open: Dict[str, float] = {}
+
+    def trace(self, name: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        name, _, state = name.partition('.')[2].rpartition('.')
+        phase = PHASES.get(name)
+        if phase is None:
+            return
+        if state == 'started':
+            if self.first is None:
+                self.first = now
+                self.phases['queue'] = now - self.started
+            self._open[name] = now
+        else:
+            started = self._open.pop(name, None)
+            if started is not None:
+                self.phases[phase] = self.phases.get(phase, 0.0) + \
+                    now - started
+
+    async def atrace(self, name: str, info: Dict[str, Any]) -> None:
+        self.trace(name, info)
+
+
+class RequestEvent:
+    """
+    Один вызов метода API, передаётся во все хуки Instrumentation.
+    Попытки одного вызова (повторы) обновляют тот же объект.
+    context - место для данных адаптера, например span.
+    """
+    __slots__ = ('endpoint', 'method', 'url', 'attempt', 'status',
+                 'request_bytes', 'response_bytes', 'network_seconds',
+                 'decode_seconds', 'phases', 'retry_delay', 'error',
+                 'context', '_started', '_trace')
+
+    def __init__(self, endpoint: Optional[str], method: str, url: str):
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.attempt = 0
+        self.status: Optional[int] = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.network_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.phases: Dict[str, float] = {}
+        self.retry_delay = 0.0
+        self.error: Optional[BaseException] = None
+        self.context: Dict[str, Any] = {}
+        self._started = 0.0
+        self._trace: Optional[PhaseTrace] = None
+
+    def begin(self, attempt: int, phases: bool) -> Optional[PhaseTrace]:
+        """Начало попытки; при phases возвращает сборщик фаз"""
+        self.attempt = attempt
+        self.status = None
+        self.error = None
+        self._started = time.perf_counter()
+        self._trace = PhaseTrace(self._started) if phases else None
+        return self._trace
+
+    def received(self, response: httpx.Response) -> None:
+        self.network_seconds = time.perf_counter() - self._started
+        self.status = response.status_code
+        self.request_bytes = len(response.request.content)
+        self.response_bytes = len(response.content)
+        if self._trace is not None:
+            self.phases = self._trace.phases
+
+    def failed(self, error: BaseException) -> None:
+        if self.status is None:
+            self.network_seconds = time.perf_counter() - self._started
+            if self._trace is not None:
+                self.phases = self._trace.phases
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f'RequestEvent({self.endpoint or self.method} {self.url}, ' \
+               f'attempt={self.attempt}, status={self.status})'
+
+
+class Instrumentation:
+    """
+    Хуки клиента. Все методы по умолчанию ничего не делают,
+    переопределите нужные. Порядок для одного вызова:
+    on_request -> on_response / on_retry (на каждую попытку) ->
+    on_complete (ответ разобран) или on_error (вызов завершился ошибкой).
+    Хуки вызываются синхронно в пути запроса и не должны блокировать.
+    phases = True включает замер фаз queue/connect/tls/send/wait/receive.
+    """
+    phases = False
+
+    def on_request(self, event: RequestEvent) -> None:
+        """Перед каждой попыткой"""
+
+    def on_response(self, event: RequestEvent) -> None:
+        """Получен ответ, в том числе тот, что будет повторён"""
+
+    def on_retry(self, event: RequestEvent) -> None:
+        """Запланирован повтор через event.retry_delay секунд"""
+
+    def on_complete(self, event: RequestEvent) -> None:
+        """Вызов успешен, ответ разобран за event.decode_seconds"""
+
+    def on_error(self, event: RequestEvent) -> None:
+        """Вызов завершился ошибкой event.error"""
+
+
+class MultiInstrumentation(Instrumentation):
+    """
+    Несколько Instrumentation сразу, хуки вызываются по порядку.
+    """
+
+    def __init__(self, *instruments: Instrumentation):
+        self.instruments: Sequence[Instrumentation] = instruments
+        self.phases = any(item.phases for item in instruments)
+
+    def on_request(self, event: RequestEvent) -> None:
+        for item in self.instruments:
+            item.on_request(event)
+
+    def on_response(self, event: RequestEvent) -> None:
+        for item in self.instruments:
+            item.on_response(event)
+
+    def on_retry(self, event: RequestEvent) -> None:
+        for item in self.instruments:
+            item.on_retry(event)
+
+    def on_complete(self, event: RequestEvent) -> None:
+        for item in self.instruments:
+            item.on_complete(event)
+
+    def on_error(self, event: RequestEvent) -> None:
+        for item in self.instruments:
+            item.on_error(event)
+
+
+def instrumentation_of(
+    value: Union[Instrumentation, Iterable[Instrumentation], None]
+) -> Optional[Instrumentation]:
+    """Привести параметр instrumentation клиента к одному объекту"""
+    if value is None or isinstance(value, Instrumentation):
+        return value
+    instruments = list(value)
+    if not instruments:
+        return None
+    if len(instruments) == 1:
+        return instruments[0]
+    return MultiInstrumentation(*instruments)
+
+
+def timed_parse(
+    instrumentation: Instrumentation,
+    event: RequestEvent,
+    parse: Callable[[bytes], T],
+    content: bytes
+) -> T:
+    """
+    Разобрать ответ с замером времени и вызвать on_complete / on_error.
+    """
+    started = time.perf_counter()
+    try:
+        result = parse(content)
+    except Exception as error:
+        event.decode_seconds = time.perf_counter() - started
+        event.error = error
+        instrumentation.on_error(event)
+        raise
+    event.decode_seconds = time.perf_counter() - started
+    instrumentation.on_complete(event)
+    return result
+
+
+class PoolStatus(NamedTuple):
+    """
+    Состояние пула соединений.
+    active и queued - запросы, которые заняли соединение и ждут его.
+    """
+    connections: int
+    idle: int
+    active: int
+    queued: int
+    max_connections: Optional[int]
+
+
+def pool_status(
+    client: Union[httpx.Client, httpx.AsyncClient]
+) -> Optional[PoolStatus]:
+    """
+    Состояние пула стандартного транспорта httpx.
+    :return: PoolStatus или None для своего транспорта (MockTransport)
+    """
+    pool = getattr(getattr(client, '_transport', None), '_pool', None)
+    if pool is None or not hasattr(pool, 'connections'):
+        return None
+    connections = list(pool.connections)
+    requests = list(getattr(pool, '_requests', ()))
+    queued = sum(1 for request in requests if request.is_queued())
+    return PoolStatus(
+        connections=len(connections),
+        idle=sum(1 for connection in connections if connection.is_idle()),
+        active=len(requests) - queued,
+        queued=queued,
+        max_connections=getattr(pool, '_max_connections', None),
+    )
+
+
+class Timing:
+    """Сумма и максимум значений"""
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def __repr__(self) -> str:
+        return f'Timing(count={self.count}, mean={self.mean:.6f}, ' \
+               f'max={self.max:.6f})'
+
+
+class EndpointMetrics:
+    """Метрики одного метода API"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.attempts = 0
+        self.retries = 0
+        self.statuses: Dict[int, int] = {}
+        self.network = Timing()
+        self.decode = Timing()
+        self.phases: Dict[str, Timing] = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def __repr__(self) -> str:
+        return f'EndpointMetrics(calls={self.calls}, errors={self.errors}, ' \
+               f'retries={self.retries}, network={self.network}, ' \
+               f'decode={self.decode})'
+
+
+class MetricsCollector(Instrumentation):
+    """
+    Метрики в памяти процесса по методам API:
+    время сети и разбора, фазы (при phases=True), повторы, размеры тел.
+    """
+
+    def __init__(self, phases: bool = False):
+        self.phases = phases
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+
+    def _metrics(self, event: RequestEvent) -> EndpointMetrics:
+        name = event.endpoint or event.method
+        metrics = self.endpoints.get(name)
+        if metrics is None:
+            metrics = self.endpoints[name] = EndpointMetrics()
+        return metrics
+
+    def on_request(self, event: RequestEvent) -> None:
+        metrics = self._metrics(event)
+        metrics.attempts += 1
+        if event.attempt == 0:
+            metrics.calls += 1
+
+    def on_response(self, event: RequestEvent) -> None:
+        metrics = self._metrics(event)
+        metrics.statuses[event.status] = \
+            metrics.statuses.get(event.status, 0) + 1
+        metrics.network.add(event.network_seconds)
+        metrics.request_bytes += event.request_bytes
+        metrics.response_bytes += event.response_bytes
+        for phase, seconds in event.phases.items():
+            timing = metrics.phases.get(phase)
+            if timing is None:
+                timing = metrics.phases[phase] = Timing()
+            timing.add(seconds)
+
+    def on_retry(self, event: RequestEvent) -> None:
+        self._metrics(event).retries += 1
+
+    def on_complete(self, event: RequestEvent) -> None:
+        self._metrics(event).decode.add(event.decode_seconds)
+
+    def on_error(self, event: RequestEvent) -> None:
+        self._metrics(event).errors += 1
+
+    def reset(self) -> None:
+        self.endpoints.clear()
+
+
+def _label(event: RequestEvent) -> str:
+    return event.endpoint or 'other'
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Span OpenTelemetry на каждый вызов метода API (пакет opentelemetry-api).
+    Попытки и повторы - события span, фазы и время разбора - атрибуты.
+    """
+
+    def __init__(self, tracer: Any = None, phases: bool = True):
+        """
+        :param tracer: Tracer, по умолчанию trace.get_tracer('LavaTopPayment')
+        :param phases: Добавлять время фаз запроса
+        """
+        from opentelemetry import trace
+
+        self._trace = trace
+        self.tracer = tracer if tracer is not None \
+            else trace.get_tracer('LavaTopPayment')
+        self.phases = phases
+
+    def on_request(self, event: RequestEvent) -> None:
+        if event.attempt == 0:
+            event.context['span'] = self.tracer.start_span(
+                f'LavaTop {event.endpoint or event.method}',
+                kind=self._trace.SpanKind.CLIENT,
+                attributes={
+                    'http.request.method': event.method,
+                    'url.full': event.url,
+                    'lava_top.endpoint': _label(event),
+                }
+            )
+        else:
+            event.context['span'].set_attribute(
+                'http.request.resend_count', event.attempt
+            )
+
+    def on_response(self, event: RequestEvent) -> None:
+        attributes = {
+            'http.response.status_code': event.status,
+            'lava_top.network_seconds': event.network_seconds,
+        }
+        for phase, seconds in event.phases.items():
+            attributes[f'lava_top.phase.{phase}_seconds'] = seconds
+        event.context['span'].add_event('response', attributes)
+
+    def on_retry(self, event: RequestEvent) -> None:
+        event.context['span'].add_event(
+            'retry', {'lava_top.retry_delay_seconds': event.retry_delay}
+        )
+
+    def on_complete(self, event: RequestEvent) -> None:
+        span = event.context.pop('span', None)
+        if span is None:
+            return
+        span.set_attributes({
+            'http.response.status_code': event.status,
+            'http.request.body.size': event.request_bytes,
+            'http.response.body.size': event.response_bytes,
+            'lava_top.decode_seconds': event.decode_seconds,
+        })
+        span.end()
+
+    def on_error(self, event: RequestEvent) -> None:
+        span = event.context.pop('span', None)
+        if span is None:
+            return
+        if event.status is not None:
+            span.set_attribute('http.response.status_code', event.status)
+        span.set_attribute('error.type', type(event.error).__name__)
+        span.record_exception(event.error)
+        span.set_status(self._trace.Status(
+            self._trace.StatusCode.ERROR, str(event.error)
+        ))
+        span.end()
+
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """
+    Гистограммы и счётчики prometheus_client по методам API.
+    """
+
+    def __init__(
+        self,
+        registry: Any = None,
+        namespace: str = 'lavatop',
+        phases: bool = False,
+        buckets: Optional[Sequence[float]] = None
+    ):
+        """
+        :param registry: CollectorRegistry, по умолчанию глобальный REGISTRY
+        :param namespace: Префикс метрик
+        :param phases: Гистограмма фаз запроса
+        :param buckets: Границы гистограмм времени
+        """
+        import prometheus_client
+
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+        self.phases = phases
+        options: Dict[str, Any] = {
+            'namespace': namespace, 'registry': registry
+        }
+        time_options = dict(options)
+        if buckets is not None:
+            time_options['buckets'] = buckets
+        self.network = prometheus_client.Histogram(
+            'request_network_seconds', 'Время сетевой части попытки',
+            ['endpoint', 'status'], **time_options
+        )
+        self.decode = prometheus_client.Histogram(
+            'response_decode_seconds', 'Время разбора ответа',
+            ['endpoint'], **time_options
+        )
+        self.phase = prometheus_client.Histogram(
+            'request_phase_seconds', 'Время фаз попытки',
+            ['endpoint', 'phase'], **time_options
+        ) if phases else None
+        self.calls = prometheus_client.Counter(
+            'calls', 'Вызовы методов API', ['endpoint'], **options
+        )
+        self.retries = prometheus_client.Counter(
+            'retries', 'Повторы запросов', ['endpoint'], **options
+        )
+        self.errors = prometheus_client.Counter(
+            'errors', 'Вызовы, завершившиеся ошибкой',
+            ['endpoint', 'error'], **options
+        )
+        self.request_bytes = prometheus_client.Histogram(
+            'request_bytes', 'Размер тела запроса', ['endpoint'],
+            buckets=SIZE_BUCKETS, **options
+        )
+        self.response_bytes = prometheus_client.Histogram(
+            'response_bytes', 'Размер тела ответа', ['endpoint'],
+            buckets=SIZE_BUCKETS, **options
+        )
+        self.pool = prometheus_client.Gauge(
+            'pool_connections', 'Пул соединений', ['state'], **options
+        )
+
+    def bind_pool(self, client: Any) -> None:
+        """
+        Отдавать состояние пула клиента (LavaTop или LavaTopSync)
+        в метрике pool_connections при каждом сборе.
+        """
+        def value(field: str) -> Callable[[], float]:
+            def get() -> float:
+                status = client.pool_status()
+                return float(getattr(status, field)) if status else 0.0
+            return get
+
+        for field in ('connections', 'idle', 'active', 'queued'):
+            self.pool.labels(field).set_function(value(field))
+
+    def on_request(self, event: RequestEvent) -> None:
+        if event.attempt == 0:
+            self.calls.labels(_label(event)).inc()
+
+    def on_response(self, event: RequestEvent) -> None:
+        endpoint = _label(event)
+        self.network.labels(endpoint, str(event.status)).observe(
+            event.network_seconds
+        )
+        self.request_bytes.labels(endpoint).observe(event.request_bytes)
+        self.response_bytes.labels(endpoint).observe(event.response_bytes)
+        if self.phase is not None:
+            for phase, seconds in event.phases.items():
+                self.phase.labels(endpoint, phase).observe(seconds)
+
+    def on_retry(self, event: RequestEvent) -> None:
+        self.retries.labels(_label(event)).inc()
+
+    def on_complete(self, event: RequestEvent) -> None:
+        self.decode.labels(_label(event)).observe(event.decode_seconds)
+
+    def on_error(self, event: RequestEvent) -> None:
+        self.errors.labels(_label(event), type(event.error).__name__).inc()
+
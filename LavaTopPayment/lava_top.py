@@ -1,22 +1,103 @@
+import asyncio
+import time
 from datetime import datetime
 
 import httpx
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any, AsyncIterator, \
+    Union, List, Iterable, AsyncIterable, Callable
 
+from LavaTopPayment.decoding import loads
+from LavaTopPayment.endpoints import ENDPOINTS, EndpointCall, Request, \
+    next_page_url, webhook_list
+from LavaTopPayment.limits import RateLimiter
 from LavaTopPayment.models.donate import Donate
-from LavaTopPayment.models.products import Invoice, ProductsResponse
-from LavaTopPayment.models.reports import Reports, PartnerSalesPageDto
+from LavaTopPayment.models.products import Invoice, ProductsResponse, \
+    ProductItemResponse, PostItemResponse
+from LavaTopPayment.models.reports import Reports, PartnerSalesPageDto, \
+    ReportsResponses, PartnerSaleDetailsDto
 from LavaTopPayment.models.types import Currency, PaymentMethod, Language
 from LavaTopPayment.models.webhooks import WebhookResponse, WebhookEventTypeDto, \
-    WebhookAuthRequest, WebhookHistoryResponse
+    WebhookAuthRequest, WebhookHistoryResponse, WebhookDeliveryResponse
+from LavaTopPayment.pagination import iter_items, iter_cursor, iter_pages
+from LavaTopPayment.retry import Attempts, RetryPolicy, RequestStats
+from LavaTopPayment.singleflight import SingleFlight
+
+# Модули отдельных возможностей (пакеты, кэши, выгрузки, хуки)
+# импортируются в методах, которые их используют: импорт клиента
+# загружает только то, что нужно для запросов
+if TYPE_CHECKING:
+    from LavaTopPayment.aggregation import SalesSummary
+    from LavaTopPayment.batch import CancellationBatch, InvoiceBatch
+    from LavaTopPayment.cache import CatalogCache, CatalogSnapshot, \
+        OfferEntry
+    from LavaTopPayment.disk_cache import DiskCache
+    from LavaTopPayment.export import RawPage, ReportColumns, SalesColumns
+    from LavaTopPayment.instrumentation import Instrumentation, PoolStatus, \
+        RequestEvent
+    from LavaTopPayment.records import DeliveryRecord, RecordPool, \
+        SaleRecord
 
 
 class LavaTop:
     def __init__(self, api_key: Optional[str] = None,
                  token: Optional[str] = None,
                  username: Optional[str] = None,
-                 password: Optional[str] = None):
-        self.base_url = 'https://gate.lava.top'
+                 password: Optional[str] = None,
+                 base_url: str = 'https://gate.lava.top',
+                 timeout: float = 5.0,
+                 max_connections: Optional[int] = 100,
+                 max_keepalive_connections: Optional[int] = 20,
+                 keepalive_expiry: Optional[float] = 30.0,
+                 http2: bool = False,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 catalog_ttl: Optional[float] = None,
+                 catalog_stale_ttl: float = 0.0,
+                 retry: Optional[RetryPolicy] = None,
+                 rate_limit: Optional[float] = None,
+                 rate_burst: int = 1,
+                 coalesce: bool = False,
+                 instrumentation: Union[
+                     'Instrumentation', Iterable['Instrumentation'], None
+                 ] = None,
+                 http_client: Optional[httpx.AsyncClient] = None,
+                 scheduler: Optional[Any] = None,
+                 cache: Optional['DiskCache'] = None):
+        """
+        Клиент Lava.top. Все запросы идут через один пул соединений,
+        поэтому клиент стоит создавать один раз и закрывать через
+        aclose() или использовать как async context manager.
+        :param api_key: API ключ
+        :param token: Bearer токен
+        :param username: Логин для basic авторизации
+        :param password: Пароль для basic авторизации
+        :param base_url: Адрес шлюза
+        :param timeout: Таймаут запроса в секундах
+        :param max_connections: Максимум одновременных соединений
+        :param max_keepalive_connections: Максимум простаивающих keep-alive соединений
+        :param keepalive_expiry: Через сколько секунд закрывать простаивающее соединение
+        :param http2: Включить HTTP/2 (нужен пакет httpx[http2])
+        :param transport: Свой транспорт httpx, например MockTransport для стабов
+        :param catalog_ttl: Включить кэш каталога продуктов на столько секунд
+        :param catalog_stale_ttl: Сколько секунд после catalog_ttl отдавать
+            устаревший каталог, обновляя его в фоне
+        :param retry: Правила повторов, по умолчанию RetryPolicy();
+            RetryPolicy(max_retries=0) отключает повторы
+        :param rate_limit: Ограничение запросов в секунду
+        :param rate_burst: Сколько запросов можно отправить подряд сверх rate_limit
+        :param coalesce: Объединять одинаковые одновременные GET запросы
+            в один; все ожидающие получают один и тот же объект модели
+        :param instrumentation: Хуки запросов (Instrumentation или список),
+            например MetricsCollector; без них замеры не выполняются
+        :param http_client: Общий httpx.AsyncClient нескольких клиентов
+            (см. TenantManager); параметры пула и transport тогда
+            не используются, aclose() его не закрывает
+        :param scheduler: Очередь запросов с методами acquire(endpoint)
+            и release(ticket), через которую проходит каждая попытка
+            (см. TenantManager)
+        :param cache: DiskCache - кэш GET ответов на диске, общий
+            для процессов и перезапусков
+        """
+        self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         self.token = token
         self.auth = (username, password) if username and password else None
@@ -26,6 +107,214 @@ class LavaTop:
             self.headers["X-Api-Key"] = api_key
         if token:
             self.headers["Authorization"] = f"Bearer {token}"
+
+        self._owns_client = http_client is None
+        self._closed = False
+        self._client = http_client if http_client is not None \
+            else httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                http2=http2,
+                transport=transport,
+            )
+        self.scheduler = scheduler
+        self.cache = cache
+        self._credentials = None
+        if cache is not None:
+            self._credentials = cache.credentials_key(api_key, token,
+                                                      username, password)
+        self.retry = retry if retry is not None else RetryPolicy()
+        self._limiter = RateLimiter(rate_limit, rate_burst) \
+            if rate_limit else None
+        self.stats = RequestStats()
+        self._single_flight = SingleFlight() if coalesce else None
+        self.instrumentation: Optional['Instrumentation'] = None
+        if instrumentation is not None:
+            from LavaTopPayment.instrumentation import instrumentation_of
+
+            self.instrumentation = instrumentation_of(instrumentation)
+        self.catalog: Optional['CatalogCache'] = None
+        if catalog_ttl is not None:
+            self.catalog = self._catalog_cache(catalog_ttl,
+                                               catalog_stale_ttl)
+
+    async def __aenter__(self) -> 'LavaTop':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Закрыть пул соединений (общий http_client не закрывается).
+        """
+        self._closed = True
+        if self._owns_client:
+            await self._client.aclose()
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed or self._client.is_closed
+
+    def pool_status(self) -> Optional['PoolStatus']:
+        """
+        Соединения пула и запросы, которые их заняли или ждут.
+        :return: PoolStatus или None для своего transport
+        """
+        from LavaTopPayment.instrumentation import pool_status
+
+        return pool_status(self._client)
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        idempotent: Optional[bool] = None,
+        event: Optional['RequestEvent'] = None,
+        endpoint: Optional[str] = None
+    ) -> httpx.Response:
+        """
+        Выполнить запрос: ограничение частоты, авторизация, повторы.
+        :param method: HTTP метод
+        :param url: Полный URL
+        :param params: Query параметры
+        :param json: Тело запроса
+        :param headers: Дополнительные заголовки
+        :param idempotent: Можно ли повторять запрос после 5xx и обрывов,
+            по умолчанию определяется по методу
+        :param event: RequestEvent вызова для хуков instrumentation
+        :param endpoint: Имя метода из ENDPOINTS, для scheduler
+        :return: httpx.Response с успешным статусом или 304
+            на условный запрос
+        """
+        if headers:
+            headers = {**self.headers, **headers}
+        else:
+            headers = self.headers
+        attempts = Attempts(self.retry, self._count, method, url, idempotent,
+                            self.instrumentation, event)
+        while True:
+            if self._limiter is not None:
+                attempts.throttled(await self._limiter.acquire())
+            trace = attempts.begin()
+            extensions = {'trace': trace.atrace} if trace is not None \
+                else None
+            try:
+                if self.scheduler is None:
+                    response = await self._client.request(
+                        method, url,
+                        params=params,
+                        json=json,
+                        headers=headers,
+                        auth=self.auth,
+                        extensions=extensions
+                    )
+                else:
+                    ticket = await self.scheduler.acquire(endpoint)
+                    try:
+                        response = await self._client.request(
+                            method, url,
+                            params=params,
+                            json=json,
+                            headers=headers,
+                            auth=self.auth,
+                            extensions=extensions
+                        )
+                    finally:
+                        self.scheduler.release(ticket)
+            except httpx.TransportError as error:
+                delay = attempts.failed(error)
+                if delay is None:
+                    raise
+            else:
+                delay = attempts.received(response)
+                if delay is None:
+                    return response
+                await response.aclose()
+            attempts.retrying(delay)
+            await asyncio.sleep(delay)
+
+    def _count(self, name: str, value: Union[int, float]) -> None:
+        setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    async def _call(self, endpoint_name: str, /, **arguments: Any) -> Any:
+        """
+        Выполнить метод API по его описанию из ENDPOINTS.
+        :param endpoint_name: Имя метода
+        :param arguments: Аргументы метода, None не отправляются
+        :return: Ответ, разобранный по описанию метода
+        """
+        endpoint = ENDPOINTS[endpoint_name]
+        request = endpoint.build(self.base_url, arguments)
+        if endpoint.coalescible and request.headers is None:
+            return await self._coalesced(endpoint_name, request,
+                                         endpoint.parse)
+        return await self._send(endpoint_name, request, endpoint.parse)
+
+    async def _call_page(
+        self,
+        endpoint_name: str,
+        /,
+        **arguments: Any
+    ) -> 'RawPage':
+        """
+        GET запрос страницы без разбора в модели.
+        """
+        from LavaTopPayment.export import RawPage
+
+        request = ENDPOINTS[endpoint_name].build(self.base_url, arguments)
+        return await self._send(endpoint_name, request,
+                                lambda content: RawPage(loads(content)))
+
+    async def _coalesced(
+        self,
+        endpoint_name: str,
+        request: Request,
+        parse: Callable[[bytes], Any]
+    ) -> Any:
+        """
+        GET запрос с разбором ответа в модель.
+        При coalesce одинаковые одновременные запросы
+        (URL, параметры, авторизация) выполняются один раз.
+        """
+        if self._single_flight is None:
+            return await self._send(endpoint_name, request, parse)
+        key = (
+            request.url,
+            tuple(sorted(request.params.items())) if request.params else (),
+            tuple(sorted(self.headers.items())),
+            self.auth,
+            endpoint_name,
+        )
+        return await self._single_flight.do(
+            key, lambda: self._send(endpoint_name, request, parse)
+        )
+
+    async def _send(
+        self,
+        endpoint_name: str,
+        request: Request,
+        parse: Callable[[bytes], Any]
+    ) -> Any:
+        """
+        Выполнить вызов через EndpointCall: DiskCache, запрос, разбор.
+        """
+        call = EndpointCall(endpoint_name, request, parse,
+                            self.instrumentation, self.cache,
+                            self._credentials)
+        response = None
+        if call.request is not None:
+            response = await self._request(*call.request, event=call.event,
+                                           endpoint=endpoint_name)
+        return call.result(response)
+
     #region Webhooks
     async def create_webhook(
         self,
@@ -44,38 +333,25 @@ class LavaTop:
         :param auth_config: Авторизационные данные для вебхука на сервисе партнёра
         :return: WebhookResponse
         """
-        url_path = f"{self.base_url}/api/v1/webhooks"
-        data = {
-            'url': url,
-            'name': name,
-            'apiKeyId': api_key_id,
-            'eventType': event_type,
-        }
-        if auth_config is not None:
-            data['authConfig'] = auth_config.model_dump()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url_path, json=data,
-                headers=self.headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return WebhookResponse(**response.json())
+        return await self._call(
+            'create_webhook', url=url, name=name, api_key_id=api_key_id,
+            event_type=event_type, auth_config=auth_config
+        )
 
     async def get_webhooks(self) -> WebhookResponse:
         """
         Получить вебхуки партнёра
         :return: WebhookResponse
         """
-        url = f"{self.base_url}/api/v1/webhooks"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=self.headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return WebhookResponse(**response.json())
+        return await self._call('get_webhooks')
+
+    async def list_webhooks(self) -> List[WebhookResponse]:
+        """
+        Все вебхуки партнёра. Ответ может быть списком, страницей
+        с items или одним вебхуком.
+        :return: Список WebhookResponse
+        """
+        return webhook_list(await self._call('list_webhooks'))
 
     async def get_webhook_history(
         self,
@@ -88,22 +364,70 @@ class LavaTop:
         :param size: Количество возвращаемых элементов страницы
         :return:
         """
-        url = f"{self.base_url}/api/v1/webhook-history"
-        params = {}
-
-        if page is not None:
-            params["page"] = page
-        if size is not None:
-            params["size"] = size
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=self.headers,
-                params=params,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return WebhookHistoryResponse(**response.json())
+        return await self._call('get_webhook_history', page=page, size=size)
+
+    async def get_webhook_history_page(
+        self,
+        page: Optional[int] = None,
+        size: Optional[int] = None
+    ) -> 'RawPage':
+        """
+        Страница истории вебхуков без разбора в модели:
+        элементы - словари в формате WebhookDeliveryResponse.
+        :param page: Номер страницы
+        :param size: Количество возвращаемых элементов страницы
+        :return: RawPage
+        """
+        return await self._call_page(
+            'get_webhook_history', page=page, size=size
+        )
+
+    async def iter_webhook_history(
+        self,
+        size: Optional[int] = None,
+        prefetch: int = 4
+    ) -> AsyncIterator[WebhookDeliveryResponse]:
+        """
+        Вся история вебхуков по одному элементу.
+        Следующие страницы загружаются параллельно наперёд.
+        :param size: Количество элементов на странице
+        :param prefetch: Сколько страниц загружать наперёд
+        :return: WebhookDeliveryResponse
+        """
+        async for item in iter_items(
+            lambda page: self.get_webhook_history(page=page, size=size),
+            prefetch=prefetch
+        ):
+            yield item
+
+    async def iter_webhook_history_records(
+        self,
+        size: Optional[int] = None,
+        prefetch: int = 4,
+        pool: Optional['RecordPool'] = None
+    ) -> AsyncIterator['DeliveryRecord']:
+        """
+        Вся история вебхуков в виде лёгких DeliveryRecord вместо моделей,
+        для больших выгрузок. DeliveryRecord.to_model() возвращает
+        WebhookDeliveryResponse.
+        :param size: Количество элементов на странице
+        :param prefetch: Сколько страниц загружать наперёд
+        :param pool: Общие значения записей, можно передать один пул
+            в несколько выгрузок
+        :return: DeliveryRecord
+        """
+        from LavaTopPayment.records import DeliveryRecord, RecordPool
+
+        pool = pool if pool is not None else RecordPool()
+        from_dict = DeliveryRecord.from_dict
+        async for page in iter_pages(
+            lambda page: self._call_page(
+                'get_webhook_history', page=page, size=size
+            ),
+            prefetch=prefetch
+        ):
+            for item in page.items:
+                yield from_dict(item, pool)
 
     async def update_webhook(
         self,
@@ -115,7 +439,7 @@ class LavaTop:
         auth_config: Optional[WebhookAuthRequest] = None,
     ) -> WebhookResponse:
         """
-        Обновление вебхука по ID.
+        Обновление вебхука по ID. Отправляются только переданные поля.
         :param str webhook_id: Идентификатор вебхука
         :param str url: URL сервиса, который будет принимать запросы
         :param bool is_active: Активен ли вебхук
@@ -124,24 +448,11 @@ class LavaTop:
         :param WebhookAuthRequest auth_config: Авторизационные данные для вебхука на сервисе партнёра
         :return:
         """
-        url_path = f"{self.base_url}/api/v1/webhooks/{webhook_id}"
-        data = {
-            'url': url,
-            'isActive': is_active,
-            'name': name,
-            'eventType': event_type,
-        }
-        if auth_config is not None:
-            data['authConfig'] = auth_config.model_dump()
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                url_path,
-                json=data,
-                headers=self.headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return WebhookResponse(**response.json())
+        return await self._call(
+            'update_webhook', webhook_id=webhook_id, url=url,
+            is_active=is_active, name=name, event_type=event_type,
+            auth_config=auth_config
+        )
 
     async def delete_webhook(self, webhook_id: str) -> None:
         """
@@ -149,31 +460,76 @@ class LavaTop:
         :param webhook_id:
         :return:
         """
-        url = f"{self.base_url}/api/v1/webhooks/{webhook_id}"
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                url,
-                headers=self.headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
+        await self._call('delete_webhook', webhook_id=webhook_id)
     #endregion
 
     #region Products
-    async def get_products(self) -> ProductsResponse:
+    async def get_products(
+        self,
+        next_page: Optional[str] = None
+    ) -> ProductsResponse:
         """
         Метод для получения списка продуктов.
+        :param next_page: Ссылка nextPage из предыдущего ответа
         """
-        url = f"{self.base_url}/api/v2/products"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=self.headers,
-                auth=self.auth
+        if next_page:
+            endpoint = ENDPOINTS['get_products']
+            return await self._coalesced(
+                'get_products',
+                endpoint.at(next_page_url(self.base_url, next_page)),
+                endpoint.parse
             )
-            response.raise_for_status()
-            data = response.json()
-            return ProductsResponse(**data)
+        return await self._call('get_products')
+
+    async def iter_products(
+        self
+    ) -> AsyncIterator[Union[ProductItemResponse, PostItemResponse]]:
+        """
+        Все продукты и посты с переходом по nextPage.
+        Следующая страница загружается, пока отдаются элементы текущей.
+        :return: ProductItemResponse или PostItemResponse
+        """
+        async for item in iter_cursor(
+            lambda next_page: self.get_products(next_page=next_page)
+        ):
+            yield item
+
+    async def _load_catalog(
+        self
+    ) -> List[Union[ProductItemResponse, PostItemResponse]]:
+        return [item async for item in self.iter_products()]
+
+    def _catalog_cache(self, ttl: float, stale_ttl: float) -> 'CatalogCache':
+        from LavaTopPayment.cache import CatalogCache
+
+        return CatalogCache(self._load_catalog, ttl=ttl, stale_ttl=stale_ttl)
+
+    async def get_catalog(self) -> 'CatalogSnapshot':
+        """
+        Весь каталог с индексами по продуктам и предложениям.
+        Если включён кэш (catalog_ttl), каталог берётся из него.
+        :return: CatalogSnapshot
+        """
+        if self.catalog is not None:
+            return await self.catalog.get()
+        from LavaTopPayment.cache import CatalogSnapshot
+
+        return CatalogSnapshot(await self._load_catalog(), time.monotonic())
+
+    async def get_offer(self, offer_id: str) -> Optional['OfferEntry']:
+        """
+        Найти предложение, его продукт и цены по id предложения.
+        :param offer_id: Идентификатор предложения
+        :return: OfferEntry или None
+        """
+        return (await self.get_catalog()).offers.get(offer_id)
+
+    def invalidate_catalog(self) -> None:
+        """
+        Сбросить кэш каталога.
+        """
+        if self.catalog is not None:
+            self.catalog.invalidate()
 
     async def create_invoice(
         self,
@@ -181,7 +537,8 @@ class LavaTop:
         offer_id: str,
         currency: Currency,
         payment_method: Optional[PaymentMethod] = None,
-        buyer_language: Optional[Language] = None
+        buyer_language: Optional[Language] = None,
+        idempotency_key: Optional[str] = None
     ) -> Invoice:
         """
         Создание контракта на покупку контента.
@@ -190,27 +547,37 @@ class LavaTop:
         :param Currency currency: Валюта
         :param PaymentMethod payment_method: Тип оплаты
         :param Optional[Language] buyer_language: Язык пользователя
+        :param str idempotency_key: Ключ идемпотентности (заголовок
+            Idempotency-Key). С ним запрос можно безопасно повторять
         :return: Invoice
         """
-        url = f"{self.base_url}/api/v2/invoice"
-        json_data = {
-            "email": email,
-            "offerId": offer_id,
-            "currency": currency,
-        }
-        if payment_method is not None:
-            json_data['paymentMethod'] = payment_method
-        if buyer_language is not None:
-            json_data["buyerLanguage"] = buyer_language
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                json=json_data,
-                headers=self.headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return Invoice(**response.json())
+        return await self._call(
+            'create_invoice', email=email, offer_id=offer_id,
+            currency=currency, payment_method=payment_method,
+            buyer_language=buyer_language, idempotency_key=idempotency_key
+        )
+
+    def create_invoices(
+        self,
+        requests: Union[Iterable[Any], AsyncIterable[Any]],
+        concurrency: int = 10,
+        rate: Optional[float] = None,
+        burst: int = 1
+    ) -> 'InvoiceBatch':
+        """
+        Пакетное создание контрактов.
+        Результаты (BatchResult) отдаются в порядке завершения,
+        ошибка одного контракта не прерывает пакет.
+        Итоги после обхода - в InvoiceBatch.stats.
+        :param requests: InvoiceRequest или dict с теми же полями
+        :param int concurrency: Сколько контрактов создавать одновременно
+        :param float rate: Ограничение запросов в секунду
+        :param int burst: Сколько запросов можно отправить подряд сверх rate
+        :return: InvoiceBatch
+        """
+        from LavaTopPayment.batch import InvoiceBatch
+
+        return InvoiceBatch(self, requests, concurrency, rate, burst)
 
     async def get_product_by_id(
         self,
@@ -221,15 +588,7 @@ class LavaTop:
         :param payment_id: ID платежа
         :return: Invoice
         """
-        url = f"{self.base_url}/api/v1/invoice?id={payment_id}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers=self.headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return Invoice(**response.json())
+        return await self._call('get_product_by_id', payment_id=payment_id)
 
     async def update_product_v2(
         self,
@@ -242,30 +601,48 @@ class LavaTop:
         :param product_data:
         :return:
         """
-        url = f"{self.base_url}/api/v2/products/{product_id}"
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                url,
-                json=product_data,
-                headers=self.headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return response.json()
+        result = await self._call(
+            'update_product_v2', product_id=product_id,
+            product_data=product_data
+        )
+        self.invalidate_catalog()
+        return result
     #endregion
 
     #region Subscriptions
     async def cancel_subscription(self, contract_id: str, email: str) -> None:
-        url = f"{self.base_url}/api/v1/subscriptions"
-        params = {
-            "contractId": contract_id,
-            "email": email
-        }
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(url, params=params,
-                                           headers=self.headers)
-            response.raise_for_status()
-            return None
+        await self._call(
+            'cancel_subscription', contract_id=contract_id, email=email
+        )
+        return None
+
+    def cancel_subscriptions(
+        self,
+        requests: Union[Iterable[Any], AsyncIterable[Any]],
+        concurrency: int = 10,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        progress: Optional[str] = None,
+        tracker: Optional[Any] = None
+    ) -> 'CancellationBatch':
+        """
+        Пакетная отмена подписок.
+        Результаты (BatchResult) отдаются в порядке завершения,
+        ошибка одной подписки не прерывает пакет.
+        :param requests: Пары (contract_id, email) или dict
+            с ключами contractId и email
+        :param int concurrency: Сколько подписок отменять одновременно
+        :param float rate: Ограничение запросов в секунду
+        :param int burst: Сколько запросов можно отправить подряд сверх rate
+        :param str progress: Файл прогресса: повторный запуск с ним
+            продолжает с места остановки
+        :param tracker: SubscriptionTracker, куда записать отмену
+        :return: CancellationBatch
+        """
+        from LavaTopPayment.batch import CancellationBatch
+
+        return CancellationBatch(self, requests, concurrency, rate, burst,
+                                 progress, tracker)
     #endregion
 
     #region Reports
@@ -280,19 +657,25 @@ class LavaTop:
         :param int size: Количество возвращаемых элементов страницы
         :return:
         """
-        url = f"{self.base_url}/api/v1/sales"
-        params = {}
+        return await self._call('get_sales', page=page, size=size)
 
-        if page is not None:
-            params["page"] = page
-        if size is not None:
-            params["size"] = size
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers,
-                                        params=params)
-            response.raise_for_status()  # Генерирует исключение при ошибке
-            return Reports(**response.json())
+    async def iter_sales(
+        self,
+        size: Optional[int] = None,
+        prefetch: int = 4
+    ) -> AsyncIterator[ReportsResponses]:
+        """
+        Все продажи партнёра по одному элементу.
+        Следующие страницы загружаются параллельно наперёд.
+        :param int size: Количество элементов на странице
+        :param int prefetch: Сколько страниц загружать наперёд
+        :return: ReportsResponses
+        """
+        async for item in iter_items(
+            lambda page: self.get_sales(page=page, size=size),
+            prefetch=prefetch
+        ):
+            yield item
 
     async def get_sales_by_product(
         self, product_id: str,
@@ -316,38 +699,195 @@ class LavaTop:
         :param str search: Строка для поиска
         :return:
         """
-        url = f"{self.base_url}/api/v1/sales/{product_id}"
-        params = {}
-
-        if page is not None:
-            params["page"] = page
-        if size is not None:
-            params["size"] = size
-        if from_date is not None:
-            params["fromDate"] = from_date.isoformat() if from_date else None
-        if to_date is not None:
-            params["toDate"] = to_date.isoformat() if to_date else None
-        if currency is not None:
-            params["currency"] = currency
-        if status is not None:
-            params["status"] = status
-        if search is not None:
-            params["search"] = search
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers,
-                                        params=params)
-            response.raise_for_status()
-            return PartnerSalesPageDto(**response.json())
+        return await self._call(
+            'get_sales_by_product', product_id=product_id,
+            page=page, size=size, from_date=from_date, to_date=to_date,
+            currency=currency, status=status, search=search
+        )
+
+    async def iter_sales_by_product(
+        self, product_id: str,
+        size: Optional[int] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        currency: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        prefetch: int = 4
+    ) -> AsyncIterator[PartnerSaleDetailsDto]:
+        """
+        Все продажи по продукту по одному элементу.
+        Фильтры те же, что у get_sales_by_product.
+        :param str product_id: Идентификатор продукта
+        :param int size: Количество элементов на странице
+        :param int prefetch: Сколько страниц загружать наперёд
+        :return: PartnerSaleDetailsDto
+        """
+        async for item in iter_items(
+            lambda page: self.get_sales_by_product(
+                product_id, page=page, size=size,
+                from_date=from_date, to_date=to_date,
+                currency=currency, status=status, search=search
+            ),
+            prefetch=prefetch
+        ):
+            yield item
+
+    async def iter_sales_by_product_records(
+        self, product_id: str,
+        size: Optional[int] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        currency: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        prefetch: int = 4,
+        pool: Optional['RecordPool'] = None
+    ) -> AsyncIterator['SaleRecord']:
+        """
+        Все продажи по продукту в виде лёгких SaleRecord вместо моделей,
+        для больших выгрузок. SaleRecord.to_model() возвращает
+        PartnerSaleDetailsDto. Фильтры те же, что у get_sales_by_product.
+        :param str product_id: Идентификатор продукта
+        :param int size: Количество элементов на странице
+        :param int prefetch: Сколько страниц загружать наперёд
+        :param RecordPool pool: Общие значения записей, можно передать
+            один пул в несколько выгрузок
+        :return: SaleRecord
+        """
+        from LavaTopPayment.records import RecordPool, SaleRecord
+
+        pool = pool if pool is not None else RecordPool()
+        from_dict = SaleRecord.from_dict
+        async for page in self.iter_sales_by_product_pages(
+            product_id, size=size,
+            from_date=from_date, to_date=to_date,
+            currency=currency, status=status, search=search,
+            prefetch=prefetch
+        ):
+            for item in page.items:
+                yield from_dict(item, pool)
+
+    async def export_sales(
+        self,
+        size: Optional[int] = None,
+        prefetch: int = 4
+    ) -> 'ReportColumns':
+        """
+        Выгрузить все продажи партнёра в колонки, без моделей на строку.
+        :param int size: Количество элементов на странице
+        :param int prefetch: Сколько страниц загружать наперёд
+        :return: ReportColumns
+        """
+        from LavaTopPayment.export import ReportColumns
+
+        columns = ReportColumns()
+        async for page in iter_pages(
+            lambda page: self._call_page('get_sales', page=page, size=size),
+            prefetch=prefetch
+        ):
+            columns.extend(page.items)
+        return columns
+
+    async def export_sales_by_product(
+        self, product_id: str,
+        size: Optional[int] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        currency: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        prefetch: int = 4
+    ) -> 'SalesColumns':
+        """
+        Выгрузить все продажи по продукту в колонки, без моделей на строку.
+        Фильтры те же, что у get_sales_by_product.
+        :param str product_id: Идентификатор продукта
+        :param int size: Количество элементов на странице
+        :param int prefetch: Сколько страниц загружать наперёд
+        :return: SalesColumns
+        """
+        from LavaTopPayment.export import SalesColumns
+
+        columns = SalesColumns()
+        async for page in self.iter_sales_by_product_pages(
+            product_id, size=size,
+            from_date=from_date, to_date=to_date,
+            currency=currency, status=status, search=search,
+            prefetch=prefetch
+        ):
+            columns.extend(page.items)
+        return columns
+
+    async def aggregate_sales(
+        self,
+        product_ids: Optional[Iterable[str]] = None,
+        concurrency: int = 8,
+        page_size: int = 500,
+        prefetch: int = 2,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None
+    ) -> 'SalesSummary':
+        """
+        Итоги продаж по продуктам, валютам и статусам.
+        Продукты загружаются параллельно, продажи сразу сворачиваются
+        в итоги и в памяти не хранятся.
+        :param product_ids: Продукты, по умолчанию все из get_sales
+        :param int concurrency: Сколько продуктов загружать одновременно
+        :param int page_size: Размер страницы
+        :param int prefetch: Сколько страниц продукта загружать наперёд
+        :param datetime from_date: Начало периода продаж
+        :param datetime to_date: Конец периода продаж
+        :return: SalesSummary
+        """
+        from LavaTopPayment.aggregation import aggregate_sales
+
+        return await aggregate_sales(
+            self, product_ids,
+            concurrency=concurrency,
+            page_size=page_size,
+            prefetch=prefetch,
+            from_date=from_date,
+            to_date=to_date
+        )
+
+    async def iter_sales_by_product_pages(
+        self, product_id: str,
+        size: Optional[int] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        currency: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        prefetch: int = 4
+    ) -> AsyncIterator['RawPage']:
+        """
+        Все страницы продаж по продукту без разбора в модели:
+        элементы страниц - словари в формате PartnerSaleDetailsDto.
+        Фильтры те же, что у get_sales_by_product.
+        :param str product_id: Идентификатор продукта
+        :param int size: Количество элементов на странице
+        :param int prefetch: Сколько страниц загружать наперёд
+        :return: RawPage
+        """
+        pages = iter_pages(
+            lambda page: self._call_page(
+                'get_sales_by_product', product_id=product_id,
+                page=page, size=size, from_date=from_date, to_date=to_date,
+                currency=currency, status=status, search=search
+            ),
+            prefetch=prefetch
+        )
+        try:
+            async for page in pages:
+                yield page
+        finally:
+            await pages.aclose()
     #endregion
 
     #region Donate
     async def get_donate_link(self) -> Donate:
-        url = f"{self.base_url}/api/v1/donate"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers)
-            response.raise_for_status()
-            return Donate(**response.json())
+        return await self._call('get_donate_link')
     #endregion
 
 
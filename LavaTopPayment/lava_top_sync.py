@@ -0,0 +1,489 @@
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, \
+    List, Optional, Union
+
+import httpx
+
+from LavaTopPayment.decoding import loads
+from LavaTopPayment.endpoints import ENDPOINTS, EndpointCall, Request, \
+    next_page_url, webhook_list
+from LavaTopPayment.limits import SyncRateLimiter
+from LavaTopPayment.models.donate import Donate
+from LavaTopPayment.models.products import Invoice, PostItemResponse, \
+    ProductItemResponse, ProductsResponse
+from LavaTopPayment.models.reports import PartnerSaleDetailsDto, \
+    PartnerSalesPageDto, Reports, ReportsResponses
+from LavaTopPayment.models.types import Currency, Language, PaymentMethod
+from LavaTopPayment.models.webhooks import WebhookAuthRequest, \
+    WebhookDeliveryResponse, WebhookEventTypeDto, WebhookHistoryResponse, \
+    WebhookResponse
+from LavaTopPayment.pagination import total_pages_of
+from LavaTopPayment.retry import Attempts, RequestStats, RetryPolicy
+
+if TYPE_CHECKING:
+    from LavaTopPayment.disk_cache import DiskCache
+    from LavaTopPayment.export import RawPage
+    from LavaTopPayment.instrumentation import Instrumentation, PoolStatus, \
+        RequestEvent
+    from LavaTopPayment.records import DeliveryRecord, RecordPool, \
+        SaleRecord
+
+
+class LavaTopSync:
+    """
+    Синхронный клиент Lava.top для кода без asyncio (Django, Celery).
+    Методы и модели те же, что у LavaTop. Все запросы идут через один
+    пул соединений httpx.Client; один экземпляр можно использовать
+    из нескольких потоков.
+    """
+
+    def __init__(self, api_key: Optional[str] = None,
+                 token: Optional[str] = None,
+                 username: Optional[str] = None,
+                 password: Optional[str] = None,
+                 base_url: str = 'https://gate.lava.top',
+                 timeout: float = 5.0,
+                 max_connections: Optional[int] = 100,
+                 max_keepalive_connections: Optional[int] = 20,
+                 keepalive_expiry: Optional[float] = 30.0,
+                 http2: bool = False,
+                 transport: Optional[httpx.BaseTransport] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 rate_limit: Optional[float] = None,
+                 rate_burst: int = 1,
+                 instrumentation: Union[
+                     'Instrumentation', Iterable['Instrumentation'], None
+                 ] = None,
+                 cache: Optional['DiskCache'] = None):
+        """
+        Параметры те же, что у LavaTop.
+        :param transport: Синхронный транспорт httpx, например MockTransport
+        :param cache: DiskCache - кэш GET ответов на диске, его можно
+            делить с LavaTop и другими процессами
+        """
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.token = token
+        self.auth = (username, password) if username and password else None
+        self.headers = {}
+
+        if api_key:
+            self.headers["X-Api-Key"] = api_key
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+        self._client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            transport=transport,
+        )
+        self.cache = cache
+        self._credentials = None
+        if cache is not None:
+            self._credentials = cache.credentials_key(api_key, token,
+                                                      username, password)
+        self.retry = retry if retry is not None else RetryPolicy()
+        self._limiter = SyncRateLimiter(rate_limit, rate_burst) \
+            if rate_limit else None
+        self.stats = RequestStats()
+        self._stats_lock = threading.Lock()
+        self.instrumentation: Optional['Instrumentation'] = None
+        if instrumentation is not None:
+            from LavaTopPayment.instrumentation import instrumentation_of
+
+            self.instrumentation = instrumentation_of(instrumentation)
+
+    def __enter__(self) -> 'LavaTopSync':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Закрыть пул соединений.
+        """
+        self._client.close()
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    def pool_status(self) -> Optional['PoolStatus']:
+        """
+        Соединения пула и запросы, которые их заняли или ждут.
+        """
+        from LavaTopPayment.instrumentation import pool_status
+
+        return pool_status(self._client)
+
+    def _count(self, name: str, value: Union[int, float]) -> None:
+        with self._stats_lock:
+            setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        idempotent: Optional[bool] = None,
+        event: Optional['RequestEvent'] = None
+    ) -> httpx.Response:
+        """
+        Выполнить запрос: ограничение частоты, авторизация, повторы.
+        Решения по попыткам те же, что у LavaTop._request (Attempts).
+        """
+        if headers:
+            headers = {**self.headers, **headers}
+        else:
+            headers = self.headers
+        attempts = Attempts(self.retry, self._count, method, url, idempotent,
+                            self.instrumentation, event)
+        while True:
+            if self._limiter is not None:
+                attempts.throttled(self._limiter.acquire())
+            trace = attempts.begin()
+            extensions = {'trace': trace.trace} if trace is not None \
+                else None
+            try:
+                response = self._client.request(
+                    method, url,
+                    params=params,
+                    json=json,
+                    headers=headers,
+                    auth=self.auth,
+                    extensions=extensions
+                )
+            except httpx.TransportError as error:
+                delay = attempts.failed(error)
+                if delay is None:
+                    raise
+            else:
+                delay = attempts.received(response)
+                if delay is None:
+                    return response
+                response.close()
+            attempts.retrying(delay)
+            time.sleep(delay)
+
+    def _call(self, endpoint_name: str, /, **arguments: Any) -> Any:
+        """
+        Выполнить метод API по его описанию из ENDPOINTS.
+        См. LavaTop._call
+        """
+        endpoint = ENDPOINTS[endpoint_name]
+        return self._send(endpoint_name,
+                          endpoint.build(self.base_url, arguments),
+                          endpoint.parse)
+
+    def _call_page(self, endpoint_name: str, /,
+                   **arguments: Any) -> 'RawPage':
+        """
+        GET запрос страницы без разбора в модели.
+        """
+        from LavaTopPayment.export import RawPage
+
+        request = ENDPOINTS[endpoint_name].build(self.base_url, arguments)
+        return self._send(endpoint_name, request,
+                          lambda content: RawPage(loads(content)))
+
+    def _send(
+        self,
+        endpoint_name: str,
+        request: Request,
+        parse: Callable[[bytes], Any]
+    ) -> Any:
+        """
+        Выполнить вызов через EndpointCall: DiskCache, запрос, разбор.
+        """
+        call = EndpointCall(endpoint_name, request, parse,
+                            self.instrumentation, self.cache,
+                            self._credentials)
+        response = None
+        if call.request is not None:
+            response = self._request(*call.request, event=call.event)
+        return call.result(response)
+
+    def _iter_pages(self, fetch_page) -> Iterator[Any]:
+        page = fetch_page(None)
+        yield from page.items
+        if not page.items:
+            return
+        for number in range(page.page + 1,
+                            page.page + total_pages_of(page)):
+            page = fetch_page(number)
+            if not page.items:
+                return
+            yield from page.items
+
+    #region Webhooks
+    def create_webhook(
+        self,
+        url: str,
+        name: str,
+        api_key_id: str,
+        event_type: WebhookEventTypeDto,
+        auth_config: Optional[WebhookAuthRequest] = None,
+    ) -> WebhookResponse:
+        """
+        Создание вебхука. См. LavaTop.create_webhook
+        """
+        return self._call(
+            'create_webhook', url=url, name=name, api_key_id=api_key_id,
+            event_type=event_type, auth_config=auth_config
+        )
+
+    def get_webhooks(self) -> WebhookResponse:
+        """
+        Получить вебхуки партнёра
+        """
+        return self._call('get_webhooks')
+
+    def list_webhooks(self) -> List[WebhookResponse]:
+        """
+        Все вебхуки партнёра (список, страница с items или один вебхук)
+        """
+        return webhook_list(self._call('list_webhooks'))
+
+    def get_webhook_history(
+        self,
+        page: Optional[int] = None,
+        size: Optional[int] = None
+    ) -> WebhookHistoryResponse:
+        """
+        История вебхуков. См. LavaTop.get_webhook_history
+        """
+        return self._call('get_webhook_history', page=page, size=size)
+
+    def iter_webhook_history(
+        self,
+        size: Optional[int] = None
+    ) -> Iterator[WebhookDeliveryResponse]:
+        """
+        Вся история вебхуков по одному элементу.
+        """
+        return self._iter_pages(
+            lambda page: self.get_webhook_history(page=page, size=size)
+        )
+
+    def iter_webhook_history_records(
+        self,
+        size: Optional[int] = None,
+        pool: Optional['RecordPool'] = None
+    ) -> Iterator['DeliveryRecord']:
+        """
+        Вся история вебхуков в виде лёгких DeliveryRecord.
+        См. LavaTop.iter_webhook_history_records
+        """
+        from LavaTopPayment.records import DeliveryRecord, RecordPool
+
+        pool = pool if pool is not None else RecordPool()
+        for item in self._iter_pages(
+            lambda page: self._call_page(
+                'get_webhook_history', page=page, size=size
+            )
+        ):
+            yield DeliveryRecord.from_dict(item, pool)
+
+    def update_webhook(
+        self,
+        webhook_id: str,
+        url: str = None,
+        is_active: Optional[bool] = None,
+        name: str = None,
+        event_type: WebhookEventTypeDto = None,
+        auth_config: Optional[WebhookAuthRequest] = None,
+    ) -> WebhookResponse:
+        """
+        Обновление вебхука по ID, отправляются только переданные поля.
+        См. LavaTop.update_webhook
+        """
+        return self._call(
+            'update_webhook', webhook_id=webhook_id, url=url,
+            is_active=is_active, name=name, event_type=event_type,
+            auth_config=auth_config
+        )
+
+    def delete_webhook(self, webhook_id: str) -> None:
+        """
+        Удаление вебхука по ID.
+        """
+        self._call('delete_webhook', webhook_id=webhook_id)
+    #endregion
+
+    #region Products
+    def get_products(self, next_page: Optional[str] = None) -> ProductsResponse:
+        """
+        Метод для получения списка продуктов.
+        :param next_page: Ссылка nextPage из предыдущего ответа
+        """
+        if next_page:
+            endpoint = ENDPOINTS['get_products']
+            return self._send(
+                'get_products',
+                endpoint.at(next_page_url(self.base_url, next_page)),
+                endpoint.parse
+            )
+        return self._call('get_products')
+
+    def iter_products(
+        self
+    ) -> Iterator[Union[ProductItemResponse, PostItemResponse]]:
+        """
+        Все продукты и посты с переходом по nextPage.
+        """
+        next_page = None
+        while True:
+            page = self.get_products(next_page=next_page)
+            yield from page.items
+            next_page = page.nextPage
+            if not next_page or not page.items:
+                return
+
+    def create_invoice(
+        self,
+        email: str,
+        offer_id: str,
+        currency: Currency,
+        payment_method: Optional[PaymentMethod] = None,
+        buyer_language: Optional[Language] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Invoice:
+        """
+        Создание контракта на покупку контента. См. LavaTop.create_invoice
+        """
+        return self._call(
+            'create_invoice', email=email, offer_id=offer_id,
+            currency=currency, payment_method=payment_method,
+            buyer_language=buyer_language, idempotency_key=idempotency_key
+        )
+
+    def get_product_by_id(self, payment_id: str) -> Invoice:
+        """
+        Метод для получения платежа по ID.
+        """
+        return self._call('get_product_by_id', payment_id=payment_id)
+
+    def update_product_v2(
+        self,
+        product_id: str,
+        product_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Метод для обновления продукта.
+        """
+        return self._call(
+            'update_product_v2', product_id=product_id,
+            product_data=product_data
+        )
+    #endregion
+
+    #region Subscriptions
+    def cancel_subscription(self, contract_id: str, email: str) -> None:
+        self._call(
+            'cancel_subscription', contract_id=contract_id, email=email
+        )
+    #endregion
+
+    #region Reports
+    def get_sales(
+        self,
+        page: Optional[int] = None,
+        size: Optional[int] = None
+    ) -> Reports:
+        """
+        Получение списка продаж партнёра.
+        """
+        return self._call('get_sales', page=page, size=size)
+
+    def iter_sales(
+        self,
+        size: Optional[int] = None
+    ) -> Iterator[ReportsResponses]:
+        """
+        Все продажи партнёра по одному элементу.
+        """
+        return self._iter_pages(
+            lambda page: self.get_sales(page=page, size=size)
+        )
+
+    def get_sales_by_product(
+        self, product_id: str,
+        page: Optional[int] = None,
+        size: Optional[int] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        currency: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None
+    ) -> PartnerSalesPageDto:
+        """
+        Получение списка продаж партнёра по конкретному продукту.
+        См. LavaTop.get_sales_by_product
+        """
+        return self._call(
+            'get_sales_by_product', product_id=product_id,
+            page=page, size=size, from_date=from_date, to_date=to_date,
+            currency=currency, status=status, search=search
+        )
+
+    def iter_sales_by_product(
+        self, product_id: str,
+        size: Optional[int] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        currency: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None
+    ) -> Iterator[PartnerSaleDetailsDto]:
+        """
+        Все продажи по продукту по одному элементу.
+        """
+        return self._iter_pages(
+            lambda page: self.get_sales_by_product(
+                product_id, page=page, size=size,
+                from_date=from_date, to_date=to_date,
+                currency=currency, status=status, search=search
+            )
+        )
+
+    def iter_sales_by_product_records(
+        self, product_id: str,
+        size: Optional[int] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        currency: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        pool: Optional['RecordPool'] = None
+    ) -> Iterator['SaleRecord']:
+        """
+        Все продажи по продукту в виде лёгких SaleRecord.
+        См. LavaTop.iter_sales_by_product_records
+        """
+        from LavaTopPayment.records import RecordPool, SaleRecord
+
+        pool = pool if pool is not None else RecordPool()
+        for item in self._iter_pages(
+            lambda page: self._call_page(
+                'get_sales_by_product', product_id=product_id,
+                page=page, size=size, from_date=from_date, to_date=to_date,
+                currency=currency, status=status, search=search
+            )
+        ):
+            yield SaleRecord.from_dict(item, pool)
+    #endregion
+
+    #region Donate
+    def get_donate_link(self) -> Donate:
+        return self._call('get_donate_link')
+    #endregion
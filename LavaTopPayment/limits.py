@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from typing import Callable
+
+
+class RateLimiter:
+    """
+    Token bucket: не больше rate запросов в секунду в среднем,
+    всплеск до burst запросов подряд.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param rate: Запросов в секунду
+        :param burst: Размер корзины
+        :param clock: Источник времени
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """
+        Дождаться свободного токена.
+        :return: Сколько секунд пришлось ждать
+        """
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= 1
+        return waited
+
+
+class SyncRateLimiter:
+    """
+    Token bucket для синхронного кода, безопасен при вызове из потоков.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param rate: Запросов в секунду
+        :param burst: Размер корзины
+        :param clock: Источник времени
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Дождаться свободного токена.
+        :return: Сколько секунд пришлось ждать
+        """
+        waited = 0.0
+        with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                time.sleep(delay)
+                waited += delay
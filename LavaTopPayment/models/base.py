@@ -0,0 +1,9 @@
+from pydantic import BaseModel as PydanticBaseModel, ConfigDict
+
+
+class BaseModel(PydanticBaseModel):
+    """
+    Базовая модель пакета: схема валидации строится при первом
+    использовании модели, а не при импорте модуля.
+    """
+    model_config = ConfigDict(defer_build=True)
@@ -1,5 +1,6 @@
-from LavaTopPayment import *
-from LavaTopPayment.models.types import *
+from pydantic import Field
+
+from LavaTopPayment.models.base import BaseModel
 
 class Donate(BaseModel):
     url: str = Field(..., description='Ссылка на окно доната автора')
\ No newline at end of file
@@ -1,8 +1,11 @@
 from typing import List, Optional, Union
 from datetime import datetime
 
-from LavaTopPayment import *
-from LavaTopPayment.models.types import *
+from pydantic import Field
+
+from LavaTopPayment.models.base import BaseModel
+from LavaTopPayment.models.types import AmountTotalDto, ContractStatusDto, \
+    Currency, Language, PaymentMethod, PostType, ProductType
 
 
 # Модели данных
@@ -51,3 +54,16 @@ class Invoice(BaseModel):
         None,
         description="Ссылка на виджет оплаты продукта (пусто, если продукт бесплатный)",
     )
+
+
+class InvoiceRequest(BaseModel):
+    """Запрос на создание контракта"""
+    email: str = Field(..., description="Почта покупателя")
+    offerId: str = Field(..., description="Идентификатор цены")
+    currency: Currency = Field(..., description="Валюта")
+    paymentMethod: Optional[PaymentMethod] = Field(None, description="Тип оплаты")
+    buyerLanguage: Optional[Language] = Field(None, description="Язык пользователя")
+    idempotencyKey: Optional[str] = Field(
+        None,
+        description="Ключ идемпотентности, передаётся заголовком Idempotency-Key"
+    )
@@ -1,8 +1,11 @@
 from datetime import datetime
 from typing import List
 
-from LavaTopPayment import *
-from LavaTopPayment.models.types import *
+from pydantic import Field
+
+from LavaTopPayment.models.base import BaseModel
+from LavaTopPayment.models.types import AmountTotalDto, BuyerDto, \
+    ContractStatusDto, Currency
 
 
 class PartnerSaleDto(BaseModel):
@@ -1,6 +1,8 @@
 from enum import Enum
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import Field
+
+from LavaTopPayment.models.base import BaseModel
 
 
 # Перечисления для различных типов
@@ -1,8 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import ConfigDict, Field
 from typing import Optional, Dict, List
 from datetime import datetime
 
-from LavaTopPayment.models.types import WebhookAuthTypeDto, WebhookEventTypeDto
+from LavaTopPayment.models.base import BaseModel
+from LavaTopPayment.models.types import WebhookAuthTypeDto, WebhookEventTypeDto, \
+    Currency, ContractStatusDto
 
 
 class WebhookAuthRequest(BaseModel):
@@ -63,3 +65,36 @@ class WebhookHistoryResponse(BaseModel):
     total: int = Field(..., description="Общее количество элементов")
     page: int = Field(..., description="Номер текущей страницы")
     size: int = Field(..., description="Максимальное количество элементов на странице")
+
+
+class WebhookProductDto(BaseModel):
+    id: str
+    title: Optional[str] = None
+
+
+class WebhookBuyerDto(BaseModel):
+    email: Optional[str] = None
+
+
+class WebhookEvent(BaseModel):
+    """Событие, которое Lava.top присылает на URL вебхука"""
+    model_config = ConfigDict(extra='allow')
+
+    eventType: str = Field(..., description="Тип события, например payment.success")
+    contractId: str = Field(..., description="Идентификатор контракта")
+    parentContractId: Optional[str] = Field(
+        None,
+        description="Идентификатор родительского контракта (для подписок)"
+    )
+    product: Optional[WebhookProductDto] = None
+    buyer: Optional[WebhookBuyerDto] = None
+    amount: Optional[float] = None
+    currency: Optional[Currency] = None
+    status: Optional[ContractStatusDto] = None
+    timestamp: Optional[datetime] = None
+    errorMessage: Optional[str] = None
+
+    @property
+    def dedup_key(self) -> str:
+        """Ключ, одинаковый для повторных доставок одного события"""
+        return f'{self.eventType}:{self.contractId}:{self.status}:{self.timestamp}'
@@ -0,0 +1,101 @@
+import asyncio
+import math
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Optional, \
+    TypeVar
+
+T = TypeVar('T')
+
+
+def total_pages_of(page: Any) -> int:
+    """
+    Количество страниц в ответе. У WebhookHistoryResponse нет totalPages,
+    поэтому считаем его из total и size.
+    """
+    total_pages = getattr(page, 'totalPages', None)
+    if total_pages is not None:
+        return total_pages
+    if not page.size:
+        return 1
+    return math.ceil(page.total / page.size)
+
+
+async def iter_pages(
+    fetch_page: Callable[[Optional[int]], Awaitable[T]],
+    prefetch: int = 4,
+) -> AsyncIterator[T]:
+    """
+    Постраничный обход с упреждающей загрузкой.
+    Первая страница запрашивается без номера (сервер сам выбирает первую),
+    из неё берутся page и totalPages, после чего следующие страницы
+    загружаются параллельно окном не больше prefetch штук.
+    В памяти одновременно держится не больше prefetch + 1 страниц.
+    :param fetch_page: Корутина, загружающая страницу по номеру
+    :param prefetch: Сколько страниц загружать наперёд
+    :return: Страницы по порядку
+    """
+    first = await fetch_page(None)
+    yield first
+    if not first.items:
+        return
+
+    start = first.page + 1
+    stop = first.page + total_pages_of(first)
+    window = max(prefetch, 1)
+    pending: Deque[asyncio.Future] = deque()
+    next_page = start
+    try:
+        while next_page < stop or pending:
+            while next_page < stop and len(pending) < window:
+                pending.append(asyncio.ensure_future(fetch_page(next_page)))
+                next_page += 1
+            page = await pending.popleft()
+            yield page
+            if not page.items:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def iter_items(
+    fetch_page: Callable[[Optional[int]], Awaitable[Any]],
+    prefetch: int = 4,
+) -> AsyncIterator[Any]:
+    """
+    То же, что iter_pages, но отдаёт элементы страниц по одному.
+    """
+    pages = iter_pages(fetch_page, prefetch=prefetch)
+    try:
+        async for page in pages:
+            for item in page.items:
+                yield item
+    finally:
+        await pages.aclose()
+
+
+async def iter_cursor(
+    fetch_page: Callable[[Optional[str]], Awaitable[Any]],
+) -> AsyncIterator[Any]:
+    """
+    Обход по ссылке nextPage с загрузкой на одну страницу вперёд:
+    пока отдаются элементы страницы N, страница N + 1 уже загружается.
+    :param fetch_page: Корутина, загружающая страницу по ссылке
+        (None - первая страница)
+    :return: Элементы страниц по порядку
+    """
+    task: Optional[asyncio.Future] = asyncio.ensure_future(fetch_page(None))
+    try:
+        while task is not None:
+            page = await task
+            task = None
+            if page.nextPage and page.items:
+                task = asyncio.ensure_future(fetch_page(page.nextPage))
+            for item in page.items:
+                yield item
+    finally:
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
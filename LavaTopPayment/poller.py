@@ -0,0 +1,286 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, FrozenSet, \
+    List, NamedTuple, Optional, Set, Tuple, Union
+
+from LavaTopPayment.limits import RateLimiter
+from LavaTopPayment.models.products import Invoice
+from LavaTopPayment.models.types import ContractStatusDto
+
+if TYPE_CHECKING:
+    from LavaTopPayment.lava_top import LavaTop
+
+# Статусы, после которых контракт больше не меняется
+TERMINAL_STATUSES: FrozenSet[ContractStatusDto] = frozenset({
+    ContractStatusDto.COMPLETED,
+    ContractStatusDto.FAILED,
+    ContractStatusDto.CANCELLED,
+    ContractStatusDto.SUBSCRIPTION_ACTIVE,
+    ContractStatusDto.SUBSCRIPTION_FAILED,
+    ContractStatusDto.SUBSCRIPTION_EXPIRED,
+    ContractStatusDto.SUBSCRIPTION_CANCELLED,
+})
+
+
+class StatusChange(NamedTuple):
+    """Смена статуса контракта"""
+    invoice_id: str
+    old_status: Optional[ContractStatusDto]
+    new_status: ContractStatusDto
+    invoice: Invoice
+
+    @property
+    def final(self) -> bool:
+        return self.new_status in TERMINAL_STATUSES
+
+
+class PollerStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.changes = 0
+        self.callback_errors = 0
+        self.last_callback_error: Optional[BaseException] = None
+        self.throttled_seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f'PollerStats(requests={self.requests}, errors={self.errors}, '
+            f'changes={self.changes}, '
+            f'callback_errors={self.callback_errors}, '
+            f'throttled_seconds={self.throttled_seconds:.3f})'
+        )
+
+
+class _Tracked:
+    __slots__ = ('status', 'added_at', 'seq', 'errors')
+
+    def __init__(self, status: Optional[ContractStatusDto],
+                 added_at: float, seq: int):
+        self.status = status
+        self.added_at = added_at
+        self.seq = seq
+        self.errors = 0
+
+
+class InvoicePoller:
+    """
+    Отслеживание статусов множества контрактов.
+    Интервал опроса растёт с возрастом контракта (age * age_factor)
+    в пределах [min_interval, max_interval], контракты в статусе
+    in-progress опрашиваются с min_interval. К интервалу добавляется
+    случайный разброс jitter. Общая частота запросов ограничена rate.
+    После ошибки запроса интервал контракта удваивается (до
+    max_interval), пока запрос снова не пройдёт.
+    Контракт перестаёт отслеживаться после финального статуса.
+    Смены статуса передаются в on_change или в очередь changes.
+    Исключение из on_change не останавливает опрос: оно учитывается
+    в stats.callback_errors, а смена статуса повторно не передаётся.
+    """
+
+    def __init__(
+        self,
+        client: 'LavaTop',
+        on_change: Optional[
+            Callable[[StatusChange], Union[None, Awaitable[None]]]
+        ] = None,
+        rate: float = 10.0,
+        burst: int = 1,
+        concurrency: int = 10,
+        min_interval: float = 2.0,
+        max_interval: float = 60.0,
+        age_factor: float = 0.1,
+        jitter: float = 0.1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param client: LavaTop
+        :param on_change: Обработчик смены статуса, обычная функция
+            или корутина. Если не задан, смены складываются в changes
+        :param rate: Максимум запросов в секунду на все контракты
+        :param burst: Сколько запросов можно отправить подряд сверх rate
+        :param concurrency: Максимум одновременных запросов
+        :param min_interval: Минимальный интервал опроса контракта, секунды
+        :param max_interval: Максимальный интервал опроса контракта, секунды
+        :param age_factor: Доля возраста контракта, которая идёт в интервал
+        :param jitter: Случайный разброс интервала, доля от интервала
+        :param clock: Источник времени
+        """
+        self._client = client
+        self._on_change = on_change
+        self.changes: Optional[asyncio.Queue] = \
+            asyncio.Queue() if on_change is None else None
+        self._limiter = RateLimiter(rate, burst)
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.age_factor = age_factor
+        self.jitter = jitter
+        self._clock = clock
+        self._tracked: Dict[str, _Tracked] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self.stats = PollerStats()
+
+    async def __aenter__(self) -> 'InvoicePoller':
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.stop()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._inflight)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._tracked)
+
+    def __contains__(self, invoice_id: str) -> bool:
+        return invoice_id in self._tracked
+
+    def track(
+        self,
+        invoice_id: str,
+        status: Optional[ContractStatusDto] = None,
+        created_at: Optional[float] = None
+    ) -> None:
+        """
+        Начать отслеживание контракта.
+        :param invoice_id: Идентификатор контракта
+        :param status: Известный статус, например из create_invoice
+        :param created_at: Время создания по clock, по умолчанию сейчас
+        """
+        if status in TERMINAL_STATUSES:
+            return
+        now = self._clock()
+        entry = _Tracked(
+            status, now if created_at is None else created_at, next(self._seq)
+        )
+        self._tracked[invoice_id] = entry
+        self._schedule(invoice_id, entry, now + self._interval(entry, now))
+
+    def untrack(self, invoice_id: str) -> None:
+        """
+        Прекратить отслеживание контракта.
+        """
+        self._tracked.pop(invoice_id, None)
+        for waiter in self._waiters.pop(invoice_id, ()):
+            waiter.cancel()
+
+    async def wait(self, invoice_id: str) -> Invoice:
+        """
+        Дождаться финального статуса контракта.
+        Контракт должен отслеживаться.
+        :return: Invoice
+        """
+        if invoice_id not in self._tracked:
+            raise KeyError(invoice_id)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(invoice_id, []).append(waiter)
+        return await waiter
+
+    def _interval(self, entry: _Tracked, now: float) -> float:
+        if entry.status == ContractStatusDto.IN_PROGRESS:
+            interval = self.min_interval
+        else:
+            interval = min(
+                self.max_interval,
+                max(self.min_interval, (now - entry.added_at) * self.age_factor)
+            )
+        if entry.errors:
+            interval = min(self.max_interval, max(
+                interval, self.min_interval * 2 ** min(entry.errors, 16)
+            ))
+        if self.jitter:
+            interval += interval * self.jitter * random.random()
+        return interval
+
+    def _schedule(self, invoice_id: str, entry: _Tracked, due: float) -> None:
+        heapq.heappush(self._heap, (due, entry.seq, invoice_id))
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            due, seq, invoice_id = self._heap[0]
+            delay = due - self._clock()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            entry = self._tracked.get(invoice_id)
+            if entry is None or entry.seq != seq:
+                continue
+            await self._semaphore.acquire()
+            task = asyncio.ensure_future(self._poll(invoice_id, entry))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _poll(self, invoice_id: str, entry: _Tracked) -> None:
+        try:
+            self.stats.throttled_seconds += await self._limiter.acquire()
+            self.stats.requests += 1
+            try:
+                invoice = await self._client.get_product_by_id(invoice_id)
+            except Exception:
+                self.stats.errors += 1
+                entry.errors += 1
+                invoice = None
+            else:
+                entry.errors = 0
+            if self._tracked.get(invoice_id) is not entry:
+                return
+            if invoice is not None and invoice.status != entry.status:
+                try:
+                    await self._changed(invoice_id, entry, invoice)
+                except Exception as error:
+                    self.stats.callback_errors += 1
+                    self.stats.last_callback_error = error
+            if self._tracked.get(invoice_id) is entry:
+                now = self._clock()
+                entry.seq = next(self._seq)
+                self._schedule(invoice_id, entry, now + self._interval(entry, now))
+        finally:
+            self._semaphore.release()
+
+    async def _changed(
+        self, invoice_id: str, entry: _Tracked, invoice: Invoice
+    ) -> None:
+        change = StatusChange(invoice_id, entry.status, invoice.status, invoice)
+        entry.status = invoice.status
+        self.stats.changes += 1
+        if change.final:
+            self._tracked.pop(invoice_id, None)
+            for waiter in self._waiters.pop(invoice_id, ()):
+                if not waiter.done():
+                    waiter.set_result(invoice)
+        if self._on_change is not None:
+            result = self._on_change(change)
+            if asyncio.iscoroutine(result):
+                await result
+        else:
+            self.changes.put_nowait(change)
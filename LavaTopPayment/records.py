@@ -0,0 +1,333 @@
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+
+from LavaTopPayment.models.reports import PartnerSaleDetailsDto
+from LavaTopPayment.models.types import AmountTotalDto, BuyerDto, \
+    ContractStatusDto, Currency
+from LavaTopPayment.models.webhooks import WebhookDeliveryResponse
+
+_datetime_adapter = None
+
+
+def parse_datetime(value: Union[str, datetime]) -> datetime:
+    """
+    Время из ответа API так же, как его разбирает pydantic.
+    ISO 8601 разбирается через datetime.fromisoformat, остальные
+    форматы - через pydantic.
+    """
+    global _datetime_adapter
+    if isinstance(value, datetime):
+        return value
+    try:
+        if value.endswith('Z'):
+            return datetime.fromisoformat(value[:-1] + '+00:00')
+        return datetime.fromisoformat(value)
+    except ValueError:
+        if _datetime_adapter is None:
+            from pydantic import TypeAdapter
+
+            _datetime_adapter = TypeAdapter(datetime)
+        return _datetime_adapter.validate_python(value)
+
+
+def _dump_datetime(value: Union[str, datetime, None]) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class AmountRecord:
+    """Лёгкий AmountTotalDto. Одинаковые суммы разделяют один объект"""
+    __slots__ = ('amount', 'currency')
+
+    def __init__(self, amount: float, currency: Currency):
+        self.amount = amount
+        self.currency = currency
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'amount': self.amount, 'currency': self.currency.value}
+
+    def to_model(self) -> AmountTotalDto:
+        return AmountTotalDto.model_validate(self.to_dict())
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, AmountRecord) and \
+            (self.amount, self.currency) == (other.amount, other.currency)
+
+    def __hash__(self) -> int:
+        return hash((self.amount, self.currency))
+
+    def __repr__(self) -> str:
+        return f'AmountRecord(amount={self.amount}, ' \
+               f'currency={self.currency.value})'
+
+
+class BuyerRecord:
+    """Лёгкий BuyerDto. Один объект на покупателя"""
+    __slots__ = ('email',)
+
+    def __init__(self, email: str):
+        self.email = email
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'email': self.email}
+
+    def to_model(self) -> BuyerDto:
+        return BuyerDto.model_validate(self.to_dict())
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, BuyerRecord) and self.email == other.email
+
+    def __hash__(self) -> int:
+        return hash(self.email)
+
+    def __repr__(self) -> str:
+        return f'BuyerRecord(email={self.email!r})'
+
+
+class RecordPool:
+    """
+    Общие значения для записей одной выгрузки: статусы и валюты -
+    члены Enum, а покупатели, суммы и id вебхуков хранятся по одному
+    экземпляру. Пул растёт вместе с числом уникальных значений и
+    освобождается вместе с записями.
+    """
+
+    def __init__(self):
+        self.statuses: Dict[str, ContractStatusDto] = {
+            status.value: status for status in ContractStatusDto
+        }
+        self.currencies: Dict[str, Currency] = {
+            currency.value: currency for currency in Currency
+        }
+        self.buyers: Dict[str, BuyerRecord] = {}
+        self.amounts: Dict[Tuple[float, str], AmountRecord] = {}
+        self.strings: Dict[str, str] = {}
+
+    def status(self, value: str) -> ContractStatusDto:
+        status = self.statuses.get(value)
+        if status is None:
+            status = ContractStatusDto(value)  # ValueError как у модели
+        return status
+
+    def buyer(self, email: str) -> BuyerRecord:
+        buyer = self.buyers.get(email)
+        if buyer is None:
+            buyer = self.buyers[email] = BuyerRecord(email)
+        return buyer
+
+    def amount(self, amount: float, currency: str) -> AmountRecord:
+        key = (amount, currency)
+        record = self.amounts.get(key)
+        if record is None:
+            value = self.currencies.get(currency)
+            if value is None:
+                value = Currency(currency)
+            record = self.amounts[key] = AmountRecord(float(amount), value)
+        return record
+
+    def string(self, value: str) -> str:
+        return self.strings.setdefault(value, value)
+
+    def __len__(self) -> int:
+        return len(self.buyers) + len(self.amounts) + len(self.strings)
+
+
+class SaleRecord:
+    """
+    Лёгкий PartnerSaleDetailsDto только для чтения.
+    created хранится строкой из ответа и разбирается при первом обращении.
+    """
+    __slots__ = ('id', '_created', 'status', 'amountTotal', 'buyer')
+
+    def __init__(
+        self,
+        id: str,
+        created: Union[str, datetime],
+        status: ContractStatusDto,
+        amountTotal: AmountRecord,
+        buyer: BuyerRecord
+    ):
+        self.id = id
+        self._created = created
+        self.status = status
+        self.amountTotal = amountTotal
+        self.buyer = buyer
+
+    @property
+    def created(self) -> datetime:
+        created = self._created
+        if not isinstance(created, datetime):
+            created = self._created = parse_datetime(created)
+        return created
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: Dict[str, Any],
+        pool: RecordPool
+    ) -> 'SaleRecord':
+        """
+        Запись из словаря ответа API (элемент RawPage).
+        """
+        amount_total = data['amountTotal']
+        return cls(
+            data['id'],
+            data['created'],
+            pool.status(data['status']),
+            pool.amount(amount_total['amount'], amount_total['currency']),
+            pool.buyer(data['buyer']['email']),
+        )
+
+    @classmethod
+    def from_model(
+        cls,
+        model: PartnerSaleDetailsDto,
+        pool: RecordPool
+    ) -> 'SaleRecord':
+        return cls(
+            model.id,
+            model.created,
+            model.status,
+            pool.amount(model.amountTotal.amount,
+                        model.amountTotal.currency.value),
+            pool.buyer(model.buyer.email),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'created': _dump_datetime(self._created),
+            'status': self.status.value,
+            'amountTotal': self.amountTotal.to_dict(),
+            'buyer': self.buyer.to_dict(),
+        }
+
+    def to_model(self) -> PartnerSaleDetailsDto:
+        return PartnerSaleDetailsDto.model_validate(self.to_dict())
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, SaleRecord) and \
+            self.id == other.id and self.created == other.created and \
+            self.status == other.status and \
+            self.amountTotal == other.amountTotal and \
+            self.buyer == other.buyer
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'SaleRecord(id={self.id!r}, status={self.status.value}, ' \
+               f'amountTotal={self.amountTotal!r})'
+
+
+class DeliveryRecord:
+    """
+    Лёгкий WebhookDeliveryResponse только для чтения.
+    Время хранится строками из ответа и разбирается при первом обращении.
+    """
+    __slots__ = ('id', 'webhookId', 'isDelivered', '_deliveredAt',
+                 '_lastDeliveryAttemptAt', 'responseStatus', '_createdAt')
+
+    def __init__(
+        self,
+        id: str,
+        webhookId: str,
+        isDelivered: bool,
+        deliveredAt: Union[str, datetime, None],
+        lastDeliveryAttemptAt: Union[str, datetime, None],
+        responseStatus: Optional[int],
+        createdAt: Union[str, datetime]
+    ):
+        self.id = id
+        self.webhookId = webhookId
+        self.isDelivered = isDelivered
+        self._deliveredAt = deliveredAt
+        self._lastDeliveryAttemptAt = lastDeliveryAttemptAt
+        self.responseStatus = responseStatus
+        self._createdAt = createdAt
+
+    @property
+    def deliveredAt(self) -> Optional[datetime]:
+        value = self._deliveredAt
+        if value is not None and not isinstance(value, datetime):
+            value = self._deliveredAt = parse_datetime(value)
+        return value
+
+    @property
+    def lastDeliveryAttemptAt(self) -> Optional[datetime]:
+        value = self._lastDeliveryAttemptAt
+        if value is not None and not isinstance(value, datetime):
+            value = self._lastDeliveryAttemptAt = parse_datetime(value)
+        return value
+
+    @property
+    def createdAt(self) -> datetime:
+        value = self._createdAt
+        if not isinstance(value, datetime):
+            value = self._createdAt = parse_datetime(value)
+        return value
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: Dict[str, Any],
+        pool: RecordPool
+    ) -> 'DeliveryRecord':
+        """
+        Запись из словаря ответа API (элемент RawPage).
+        """
+        return cls(
+            data['id'],
+            pool.string(data['webhookId']),
+            data['isDelivered'],
+            data.get('deliveredAt'),
+            data.get('lastDeliveryAttemptAt'),
+            data.get('responseStatus'),
+            data['createdAt'],
+        )
+
+    @classmethod
+    def from_model(
+        cls,
+        model: WebhookDeliveryResponse,
+        pool: RecordPool
+    ) -> 'DeliveryRecord':
+        return cls(
+            model.id,
+            pool.string(model.webhookId),
+            model.isDelivered,
+            model.deliveredAt,
+            model.lastDeliveryAttemptAt,
+            model.responseStatus,
+            model.createdAt,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'webhookId': self.webhookId,
+            'isDelivered': self.isDelivered,
+            'deliveredAt': _dump_datetime(self._deliveredAt),
+            'lastDeliveryAttemptAt':
+                _dump_datetime(self._lastDeliveryAttemptAt),
+            'responseStatus': self.responseStatus,
+            'createdAt': _dump_datetime(self._createdAt),
+        }
+
+    def to_model(self) -> WebhookDeliveryResponse:
+        return WebhookDeliveryResponse.model_validate(self.to_dict())
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, DeliveryRecord) and \
+            self.id == other.id and self.webhookId == other.webhookId and \
+            self.isDelivered == other.isDelivered and \
+            self.deliveredAt == other.deliveredAt and \
+            self.lastDeliveryAttemptAt == other.lastDeliveryAttemptAt and \
+            self.responseStatus == other.responseStatus and \
+            self.createdAt == other.createdAt
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'DeliveryRecord(id={self.id!r}, ' \
+               f'webhookId={self.webhookId!r}, ' \
+               f'isDelivered={self.isDelivered})'
+
@@ -0,0 +1,255 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Callable, FrozenSet, Optional, Union
+
+import httpx
+
+if TYPE_CHECKING:
+    from LavaTopPayment.instrumentation import Instrumentation, PhaseTrace, \
+        RequestEvent
+
+IDEMPOTENT_METHODS: FrozenSet[str] = frozenset(
+    {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+)
+
+
+class RetryPolicy:
+    """
+    Правила повторов запросов.
+    Ошибки соединения и ответ 429 повторяются для любых запросов:
+    запрос до сервера не дошёл или был им отклонён.
+    Ответы 5xx и обрывы во время ответа повторяются только
+    для идемпотентных запросов.
+    Пауза: backoff * 2 ** attempt с полным разбросом (full jitter),
+    не больше max_backoff. Retry-After из ответа имеет приоритет.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        retry_statuses: FrozenSet[int] = frozenset({500, 502, 503, 504}),
+        jitter: bool = True
+    ):
+        """
+        :param max_retries: Максимум повторов одного запроса
+        :param backoff: Базовая пауза, секунды
+        :param max_backoff: Максимальная пауза, секунды
+        :param retry_statuses: Статусы 5xx, которые стоит повторять
+        :param jitter: Случайная пауза от 0 до расчётной
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.jitter = jitter
+
+    def backoff_delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def delay_for_error(
+        self, error: httpx.TransportError, attempt: int, idempotent: bool
+    ) -> Optional[float]:
+        """
+        :return: Пауза перед повтором или None, если повторять нельзя
+        """
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout,
+                              httpx.PoolTimeout)) or idempotent:
+            return self.backoff_delay(attempt)
+        return None
+
+    def delay_for_response(
+        self, response: httpx.Response, attempt: int, idempotent: bool
+    ) -> Optional[float]:
+        """
+        :return: Пауза перед повтором или None, если повторять не нужно
+        """
+        status = response.status_code
+        if attempt >= self.max_retries:
+            return None
+        if status == 429 or (idempotent and status in self.retry_statuses):
+            retry_after = parse_retry_after(
+                response.headers.get('Retry-After')
+            )
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+            return self.backoff_delay(attempt)
+        return None
+
+
+class RequestStats:
+    """Счётчики запросов клиента"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_waits = 0
+        self.throttled_seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f'RequestStats(requests={self.requests}, retries={self.retries}, '
+            f'rate_limited={self.rate_limited}, '
+            f'throttled_waits={self.throttled_waits}, '
+            f'throttled_seconds={self.throttled_seconds:.3f})'
+        )
+
+
+class Attempts:
+    """
+    Решения по попыткам одного запроса, общие для LavaTop и LavaTopSync:
+    счётчики, хуки instrumentation, повторять ли запрос и с какой
+    паузой, какой ответ - ошибка. Отправку, ожидание ограничения
+    частоты и паузы выполняет клиент:
+
+        attempts = Attempts(policy, count, method, url, idempotent,
+                            instrumentation, event)
+        while True:
+            trace = attempts.begin()
+            try:
+                response = send(trace)
+            except httpx.TransportError as error:
+                delay = attempts.failed(error)
+                if delay is None:
+                    raise
+            else:
+                delay = attempts.received(response)
+                if delay is None:
+                    return response
+                response.close()
+            attempts.retrying(delay)
+            sleep(delay)
+    """
+    __slots__ = ('policy', 'attempt', 'idempotent', 'instrumentation',
+                 'event', '_count', '_own_event')
+
+    def __init__(
+        self,
+        policy: RetryPolicy,
+        count: Callable[[str, Union[int, float]], None],
+        method: str,
+        url: str,
+        idempotent: Optional[bool] = None,
+        instrumentation: Optional['Instrumentation'] = None,
+        event: Optional['RequestEvent'] = None
+    ):
+        """
+        :param policy: RetryPolicy клиента
+        :param count: Увеличить счётчик RequestStats: count(name, value)
+        :param method: HTTP метод
+        :param url: Полный URL
+        :param idempotent: Можно ли повторять запрос после 5xx и обрывов,
+            по умолчанию определяется по методу
+        :param instrumentation: Хуки клиента
+        :param event: RequestEvent вызова; без него для запроса вне
+            вызова метода API создаётся свой и завершается здесь
+        """
+        self.policy = policy
+        self.attempt = 0
+        self.idempotent = method in IDEMPOTENT_METHODS \
+            if idempotent is None else idempotent
+        self.instrumentation = instrumentation
+        self._count = count
+        # Запрос вне вызова метода: ответ разбирает вызывающий
+        self._own_event = instrumentation is not None and event is None
+        if self._own_event:
+            from LavaTopPayment.instrumentation import RequestEvent
+
+            event = RequestEvent(None, method, url)
+        self.event = event
+
+    def throttled(self, waited: float) -> None:
+        """Учесть ожидание ограничения частоты перед попыткой"""
+        if waited:
+            self._count('throttled_waits', 1)
+            self._count('throttled_seconds', waited)
+
+    def begin(self) -> Optional['PhaseTrace']:
+        """
+        Начало попытки.
+        :return: PhaseTrace для extensions запроса или None
+        """
+        self._count('requests', 1)
+        event = self.event
+        if event is None:
+            return None
+        trace = event.begin(self.attempt, self.instrumentation.phases)
+        self.instrumentation.on_request(event)
+        return trace
+
+    def failed(self, error: httpx.TransportError) -> Optional[float]:
+        """
+        Попытка завершилась ошибкой соединения.
+        :return: Пауза перед повтором или None, если ошибку
+            нужно пробросить
+        """
+        delay = self.policy.delay_for_error(error, self.attempt,
+                                            self.idempotent)
+        if delay is None and self.event is not None:
+            self.event.failed(error)
+            self.instrumentation.on_error(self.event)
+        return delay
+
+    def received(self, response: httpx.Response) -> Optional[float]:
+        """
+        Попытка получила ответ. Ответ с ошибкой, который не будет
+        повторён, поднимает httpx.HTTPStatusError; 304 на условный
+        запрос возвращается как есть.
+        :return: Пауза перед повтором или None, если ответ окончательный
+        """
+        if response.status_code == 429:
+            self._count('rate_limited', 1)
+        event = self.event
+        if event is not None:
+            event.received(response)
+            self.instrumentation.on_response(event)
+        delay = self.policy.delay_for_response(response, self.attempt,
+                                               self.idempotent)
+        if delay is not None:
+            return delay
+        if response.status_code != 304:
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as error:
+                if event is not None:
+                    event.failed(error)
+                    self.instrumentation.on_error(event)
+                raise
+        if self._own_event:
+            self.instrumentation.on_complete(event)
+        return None
+
+    def retrying(self, delay: float) -> None:
+        """Следующая попытка после паузы delay"""
+        self.attempt += 1
+        self._count('retries', 1)
+        if self.event is not None:
+            self.event.retry_delay = delay
+            self.instrumentation.on_retry(self.event)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After в секундах: число секунд или HTTP-дата.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
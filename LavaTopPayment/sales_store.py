@@ -0,0 +1,293 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, \
+    Optional
+
+from LavaTopPayment.export import iso_timestamp
+
+if TYPE_CHECKING:
+    from LavaTopPayment.lava_top import LavaTop
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sales (
+    id TEXT PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    created REAL NOT NULL,
+    status TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    email TEXT
+);
+CREATE INDEX IF NOT EXISTS sales_product_created ON sales (product_id, created);
+CREATE INDEX IF NOT EXISTS sales_status_created ON sales (status, created);
+CREATE INDEX IF NOT EXISTS sales_currency_created ON sales (currency, created);
+CREATE INDEX IF NOT EXISTS sales_created ON sales (created);
+CREATE INDEX IF NOT EXISTS sales_email ON sales (email);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    product_id TEXT PRIMARY KEY,
+    high_water REAL NOT NULL,
+    synced_at REAL NOT NULL
+);
+'''
+
+_UPSERT = '''
+INSERT INTO sales (id, product_id, created, status, amount, currency, email)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    status = excluded.status,
+    amount = excluded.amount,
+    currency = excluded.currency,
+    email = excluded.email
+'''
+
+
+class StoredSale(NamedTuple):
+    """Продажа из локального хранилища"""
+    id: str
+    product_id: str
+    created: datetime
+    status: str
+    amount: float
+    currency: str
+    email: Optional[str]
+
+
+class SalesStore:
+    """
+    Локальное хранилище продаж в SQLite, ключ - id контракта.
+    Для каждого продукта хранится high-water mark - время самой
+    поздней загруженной продажи.
+    """
+
+    def __init__(self, path: str = 'lava_sales.sqlite3'):
+        """
+        :param path: Путь к файлу базы или ':memory:'
+        """
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> 'SalesStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def upsert(self, product_id: str, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Записать продажи одной транзакцией.
+        :param product_id: Идентификатор продукта
+        :param items: Продажи в виде словарей PartnerSaleDetailsDto
+        :return: Количество записанных продаж
+        """
+        rows = [(
+            item['id'],
+            product_id,
+            iso_timestamp(item['created']),
+            item['status'],
+            item['amountTotal']['amount'],
+            item['amountTotal']['currency'],
+            (item.get('buyer') or {}).get('email'),
+        ) for item in items]
+        with self._db:
+            self._db.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def get_checkpoint(self, product_id: str) -> Optional[datetime]:
+        row = self._db.execute(
+            'SELECT high_water FROM checkpoints WHERE product_id = ?',
+            (product_id,)
+        ).fetchone()
+        return _datetime(row[0]) if row else None
+
+    def set_checkpoint(self, product_id: str, high_water: datetime) -> None:
+        with self._db:
+            self._db.execute(
+                'INSERT INTO checkpoints (product_id, high_water, synced_at) '
+                'VALUES (?, ?, ?) ON CONFLICT (product_id) DO UPDATE SET '
+                'high_water = MAX(high_water, excluded.high_water), '
+                'synced_at = excluded.synced_at',
+                (product_id, high_water.timestamp(),
+                 datetime.now(timezone.utc).timestamp())
+            )
+
+    def reset(self, product_id: Optional[str] = None) -> None:
+        """
+        Сбросить checkpoint, чтобы следующая синхронизация
+        загрузила всё заново.
+        """
+        with self._db:
+            if product_id is None:
+                self._db.execute('DELETE FROM checkpoints')
+            else:
+                self._db.execute(
+                    'DELETE FROM checkpoints WHERE product_id = ?',
+                    (product_id,)
+                )
+
+    def query(
+        self,
+        product_id: Optional[str] = None,
+        status: Optional[str] = None,
+        currency: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        email: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[StoredSale]:
+        """
+        Поиск продаж по индексам. Сортировка по времени создания.
+        :param product_id: Идентификатор продукта
+        :param status: Статус продажи
+        :param currency: Валюта
+        :param from_date: Начало периода, включительно
+        :param to_date: Конец периода, не включительно
+        :param email: Почта покупателя
+        :param limit: Максимум записей
+        :return: Список StoredSale
+        """
+        where, args = self._where(
+            product_id, status, currency, from_date, to_date, email
+        )
+        sql = 'SELECT id, product_id, created, status, amount, currency, ' \
+              f'email FROM sales{where} ORDER BY created'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit)
+        return [
+            StoredSale(row[0], row[1], _datetime(row[2]), *row[3:])
+            for row in self._db.execute(sql, args)
+        ]
+
+    def count(
+        self,
+        product_id: Optional[str] = None,
+        status: Optional[str] = None,
+        currency: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        email: Optional[str] = None
+    ) -> int:
+        """
+        Количество продаж, фильтры те же, что у query.
+        """
+        where, args = self._where(
+            product_id, status, currency, from_date, to_date, email
+        )
+        return self._db.execute(
+            f'SELECT COUNT(*) FROM sales{where}', args
+        ).fetchone()[0]
+
+    @staticmethod
+    def _where(product_id, status, currency, from_date, to_date, email):
+        conditions = []
+        args: List[Any] = []
+        for column, value in (('product_id', product_id), ('status', status),
+                              ('currency', currency), ('email', email)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                args.append(getattr(value, 'value', value))
+        if from_date is not None:
+            conditions.append('created >= ?')
+            args.append(from_date.timestamp())
+        if to_date is not None:
+            conditions.append('created < ?')
+            args.append(to_date.timestamp())
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        return where, args
+
+
+class SyncResult(NamedTuple):
+    product_id: str
+    fetched: int
+    from_date: Optional[datetime]
+    high_water: Optional[datetime]
+
+
+class SalesSync:
+    """
+    Инкрементальная синхронизация продаж в SalesStore.
+    Загружается только окно с последнего checkpoint минус overlap:
+    перекрытие подхватывает поздние смены статуса у недавних продаж.
+    Смены статуса у продаж старше overlap не видны - для них
+    нужен store.reset() и полная синхронизация.
+    """
+
+    def __init__(
+        self,
+        client: 'LavaTop',
+        store: SalesStore,
+        overlap: timedelta = timedelta(days=3),
+        page_size: int = 500,
+        prefetch: int = 4,
+        concurrency: int = 4
+    ):
+        """
+        :param client: LavaTop
+        :param store: SalesStore
+        :param overlap: Перекрытие окна с прошлой синхронизацией
+        :param page_size: Размер страницы
+        :param prefetch: Сколько страниц загружать наперёд
+        :param concurrency: Сколько продуктов синхронизировать одновременно
+        """
+        self._client = client
+        self.store = store
+        self.overlap = overlap
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.concurrency = max(concurrency, 1)
+
+    async def sync_product(self, product_id: str) -> SyncResult:
+        """
+        Синхронизировать продажи одного продукта.
+        """
+        checkpoint = self.store.get_checkpoint(product_id)
+        from_date = checkpoint - self.overlap if checkpoint else None
+        high_water = checkpoint
+        fetched = 0
+        async for page in self._client.iter_sales_by_product_pages(
+            product_id,
+            size=self.page_size,
+            from_date=from_date,
+            prefetch=self.prefetch
+        ):
+            if not page.items:
+                continue
+            fetched += self.store.upsert(product_id, page.items)
+            newest = max(_datetime(iso_timestamp(item['created']))
+                         for item in page.items)
+            if high_water is None or newest > high_water:
+                high_water = newest
+        if high_water is not None:
+            self.store.set_checkpoint(product_id, high_water)
+        return SyncResult(product_id, fetched, from_date, high_water)
+
+    async def sync(
+        self,
+        product_ids: Optional[Iterable[str]] = None
+    ) -> List[SyncResult]:
+        """
+        Синхронизировать несколько продуктов параллельно.
+        :param product_ids: Продукты, по умолчанию все из get_sales
+        :return: Список SyncResult
+        """
+        if product_ids is None:
+            product_ids = [item.productId
+                           async for item in self._client.iter_sales()]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(product_id: str) -> SyncResult:
+            async with semaphore:
+                return await self.sync_product(product_id)
+
+        return list(await asyncio.gather(*(one(p) for p in product_ids)))
+
+
+def _datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class _Call:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных вызовов: пока вызов с ключом
+    выполняется, остальные с тем же ключом ждут его результат.
+    Отмена одного ожидающего не отменяет общий вызов; вызов
+    отменяется, только когда отменились все ожидающие.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: Ключ вызова
+        :param factory: Функция, создающая корутину вызова
+        :return: Результат общего вызова
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                self._forget(key, call)
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.task.done() and not call.task.cancelled():
+            # Ошибку уже получили ожидающие
+            call.task.exception()
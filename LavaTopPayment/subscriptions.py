@@ -0,0 +1,281 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from LavaTopPayment.export import iso_timestamp
+from LavaTopPayment.models.types import ContractStatusDto
+from LavaTopPayment.models.webhooks import WebhookEvent
+
+SUBSCRIPTION_STATUSES = frozenset({
+    ContractStatusDto.SUBSCRIPTION_ACTIVE,
+    ContractStatusDto.SUBSCRIPTION_EXPIRED,
+    ContractStatusDto.SUBSCRIPTION_CANCELLED,
+    ContractStatusDto.SUBSCRIPTION_FAILED,
+})
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS subscriptions (
+    contract_id TEXT PRIMARY KEY,
+    email TEXT,
+    product_id TEXT,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL,
+    last_payment REAL,
+    failures INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS subscriptions_status_payment
+    ON subscriptions (status, last_payment);
+CREATE INDEX IF NOT EXISTS subscriptions_email ON subscriptions (email);
+CREATE INDEX IF NOT EXISTS subscriptions_product_status
+    ON subscriptions (product_id, status);
+'''
+
+# Событие старше сохранённого состояния не меняет статус:
+# шлюз может доставить вебхуки не по порядку или повторно
+_UPSERT = '''
+INSERT INTO subscriptions
+    (contract_id, email, product_id, status, updated, last_payment, failures)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (contract_id) DO UPDATE SET
+    email = COALESCE(excluded.email, email),
+    product_id = COALESCE(excluded.product_id, product_id),
+    status = CASE WHEN excluded.updated >= updated
+        THEN excluded.status ELSE status END,
+    failures = CASE
+        WHEN excluded.updated < updated THEN failures
+        WHEN excluded.failures > 0 THEN failures + 1
+        WHEN excluded.last_payment IS NOT NULL THEN 0
+        ELSE failures END,
+    last_payment = CASE
+        WHEN excluded.last_payment IS NULL THEN last_payment
+        WHEN last_payment IS NULL THEN excluded.last_payment
+        ELSE MAX(last_payment, excluded.last_payment) END,
+    updated = MAX(updated, excluded.updated)
+'''
+
+
+class Subscription(NamedTuple):
+    """Состояние подписки из SubscriptionTracker"""
+    contract_id: str
+    email: Optional[str]
+    product_id: Optional[str]
+    status: ContractStatusDto
+    updated: datetime
+    last_payment: Optional[datetime]
+    failures: int
+
+
+class SubscriptionTracker:
+    """
+    Состояние подписок в SQLite, ключ - id контракта подписки.
+    Обновляется вебхуками RECURRENT_PAYMENT (и payment_result первого
+    платежа), поэтому узнать активных подписчиков можно запросом по
+    индексу, без повторного обхода продаж. Запоздавшие и повторные
+    события не откатывают более новое состояние.
+
+        tracker = SubscriptionTracker('subscriptions.sqlite3')
+        receiver = WebhookReceiver(tracker.apply, auth_type, auth_value)
+        active = tracker.query(status=ContractStatusDto.SUBSCRIPTION_ACTIVE)
+    """
+
+    def __init__(self, path: str = 'lava_subscriptions.sqlite3'):
+        """
+        :param path: Путь к файлу базы или ':memory:'
+        """
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> 'SubscriptionTracker':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def apply(self, event: WebhookEvent) -> Optional[str]:
+        """
+        Учесть событие вебхука. Подходит как обработчик WebhookReceiver.
+        Платёж подписки (есть parentContractId) продлевает её или
+        переводит в SUBSCRIPTION_FAILED; статус subscription-* в событии
+        записывается как есть. Остальные события пропускаются.
+        :return: Идентификатор подписки или None, если событие не о ней
+        """
+        status = event.status
+        subscription_id = event.parentContractId or event.contractId
+        paid = failed = False
+        if status in SUBSCRIPTION_STATUSES:
+            paid = status == ContractStatusDto.SUBSCRIPTION_ACTIVE
+        elif event.parentContractId is not None and status in (
+            ContractStatusDto.COMPLETED, ContractStatusDto.FAILED
+        ):
+            paid = status == ContractStatusDto.COMPLETED
+            failed = not paid
+            status = ContractStatusDto.SUBSCRIPTION_ACTIVE if paid \
+                else ContractStatusDto.SUBSCRIPTION_FAILED
+        elif event.eventType.endswith('subscription.cancelled'):
+            status = ContractStatusDto.SUBSCRIPTION_CANCELLED
+        else:
+            return None
+        when = (event.timestamp or datetime.now(timezone.utc)).timestamp()
+        with self._db:
+            self._db.execute(_UPSERT, (
+                subscription_id,
+                event.buyer.email if event.buyer else None,
+                event.product.id if event.product else None,
+                status.value,
+                when,
+                when if paid else None,
+                1 if failed else 0,
+            ))
+        return subscription_id
+
+    def set_status(
+        self,
+        contract_id: str,
+        status: ContractStatusDto,
+        email: Optional[str] = None,
+        when: Optional[datetime] = None
+    ) -> None:
+        """
+        Записать статус подписки, например после cancel_subscription.
+        """
+        when = when or datetime.now(timezone.utc)
+        with self._db:
+            self._db.execute(_UPSERT, (
+                contract_id, email, None, ContractStatusDto(status).value,
+                when.timestamp(), None, 0,
+            ))
+
+    def seed(self, product_id: str, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Начальная загрузка из продаж продукта (элементы RawPage
+        PartnerSaleDetailsDto). Берутся только подписки; время продажи
+        считается временем состояния, поэтому более новые события
+        вебхуков не перезаписываются.
+        :return: Сколько подписок записано
+        """
+        statuses = {status.value for status in SUBSCRIPTION_STATUSES}
+        rows = []
+        for item in items:
+            if item['status'] not in statuses:
+                continue
+            created = iso_timestamp(item['created'])
+            rows.append((
+                item['id'],
+                (item.get('buyer') or {}).get('email'),
+                product_id,
+                item['status'],
+                created,
+                created
+                if item['status'] == ContractStatusDto.SUBSCRIPTION_ACTIVE
+                else None,
+                0,
+            ))
+        with self._db:
+            self._db.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def expire_overdue(
+        self,
+        period: timedelta,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Перевести в SUBSCRIPTION_EXPIRED активные подписки без успешного
+        платежа дольше period.
+        :return: Сколько подписок истекло
+        """
+        now = now or datetime.now(timezone.utc)
+        deadline = (now - period).timestamp()
+        with self._db:
+            return self._db.execute(
+                'UPDATE subscriptions SET status = ?, updated = ? '
+                'WHERE status = ? AND COALESCE(last_payment, updated) < ?',
+                (ContractStatusDto.SUBSCRIPTION_EXPIRED.value,
+                 now.timestamp(),
+                 ContractStatusDto.SUBSCRIPTION_ACTIVE.value, deadline)
+            ).rowcount
+
+    def get(self, contract_id: str) -> Optional[Subscription]:
+        row = self._db.execute(
+            f'SELECT {_COLUMNS} FROM subscriptions WHERE contract_id = ?',
+            (contract_id,)
+        ).fetchone()
+        return _subscription(row) if row else None
+
+    def query(
+        self,
+        status: Optional[ContractStatusDto] = None,
+        email: Optional[str] = None,
+        product_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Subscription]:
+        """
+        Поиск подписок по индексам.
+        :param status: Статус подписки
+        :param email: Почта покупателя
+        :param product_id: Идентификатор продукта
+        :param limit: Максимум записей
+        :return: Список Subscription
+        """
+        where, args = self._where(status, email, product_id)
+        sql = f'SELECT {_COLUMNS} FROM subscriptions{where} ' \
+              'ORDER BY contract_id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit)
+        return [_subscription(row) for row in self._db.execute(sql, args)]
+
+    def count(
+        self,
+        status: Optional[ContractStatusDto] = None,
+        email: Optional[str] = None,
+        product_id: Optional[str] = None
+    ) -> int:
+        where, args = self._where(status, email, product_id)
+        return self._db.execute(
+            f'SELECT COUNT(*) FROM subscriptions{where}', args
+        ).fetchone()[0]
+
+    def counts(self) -> Dict[ContractStatusDto, int]:
+        """Количество подписок по статусам"""
+        return {
+            ContractStatusDto(status): count
+            for status, count in self._db.execute(
+                'SELECT status, COUNT(*) FROM subscriptions GROUP BY status'
+            )
+        }
+
+    @staticmethod
+    def _where(status, email, product_id):
+        conditions = []
+        args: List[Any] = []
+        for column, value in (('status', status), ('email', email),
+                              ('product_id', product_id)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                args.append(getattr(value, 'value', value))
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        return where, args
+
+
+_COLUMNS = 'contract_id, email, product_id, status, updated, last_payment, ' \
+           'failures'
+
+
+def _subscription(row) -> Subscription:
+    return Subscription(
+        row[0], row[1], row[2], ContractStatusDto(row[3]),
+        _datetime(row[4]),
+        _datetime(row[5]) if row[5] is not None else None,
+        row[6],
+    )
+
+
+def _datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
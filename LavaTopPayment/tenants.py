@@ -0,0 +1,454 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterator, \
+    List, NamedTuple, Optional
+
+import httpx
+
+from LavaTopPayment.instrumentation import PoolStatus, pool_status
+from LavaTopPayment.lava_top import LavaTop
+
+BULK_ENDPOINTS: FrozenSet[str] = frozenset({
+    'get_products', 'get_sales', 'get_sales_by_product',
+    'get_webhook_history',
+})
+"""Выгрузки и каталог; остальные методы считаются интерактивными"""
+
+INTERACTIVE = 0
+BULK = 1
+
+
+class TenantQueue:
+    """
+    Очередь одного аккаунта в FairScheduler. Передаётся в LavaTop
+    как scheduler: каждая попытка запроса берёт слот через acquire()
+    и возвращает его через release().
+    """
+
+    def __init__(self, scheduler: 'FairScheduler', tenant_id: str,
+                 weight: float = 1.0):
+        if weight <= 0:
+            raise ValueError('weight must be positive')
+        self.scheduler = scheduler
+        self.tenant_id = tenant_id
+        self.weight = weight
+        self.in_flight = 0
+        self.granted = 0
+        self.waited = 0.0
+        self.last_used = time.monotonic()
+        self.vtime = 0.0
+        self.removed = False
+        self._waiters: List[Deque[asyncio.Future]] = [deque(), deque()]
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters[INTERACTIVE]) + len(self._waiters[BULK])
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.in_flight or self.waiting)
+
+    async def acquire(self, endpoint: Optional[str] = None) -> int:
+        """
+        Дождаться слота.
+        :param endpoint: Имя метода из ENDPOINTS
+        :return: Класс запроса, его нужно передать в release()
+        """
+        kind = BULK if endpoint in self.scheduler.bulk_endpoints \
+            else INTERACTIVE
+        await self.scheduler._acquire(self, kind)
+        return kind
+
+    def release(self, kind: int) -> None:
+        self.scheduler._release(self, kind)
+
+    def __repr__(self) -> str:
+        return f'TenantQueue(tenant_id={self.tenant_id!r}, ' \
+               f'weight={self.weight}, in_flight={self.in_flight}, ' \
+               f'waiting={self.waiting}, granted={self.granted})'
+
+
+class FairScheduler:
+    """
+    Общий лимит одновременных запросов нескольких аккаунтов.
+    Интерактивные запросы (create_invoice, get_invoice, ...) идут раньше
+    выгрузок, а выгрузкам не отдаётся больше capacity - interactive_reserve
+    слотов, поэтому длинный экспорт не занимает все соединения.
+    Внутри класса слоты делятся между аккаунтами взвешенной честной
+    очередью (WFQ): аккаунт с весом 2 получает вдвое больше слотов,
+    чем аккаунт с весом 1, пока оба ждут.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        interactive_reserve: Optional[int] = None,
+        bulk_endpoints: FrozenSet[str] = BULK_ENDPOINTS
+    ):
+        """
+        :param capacity: Максимум одновременных запросов
+        :param interactive_reserve: Сколько слотов выгрузки не занимают,
+            по умолчанию четверть capacity
+        :param bulk_endpoints: Методы, которые считаются выгрузками
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        if interactive_reserve is None:
+            interactive_reserve = capacity // 4 if capacity > 1 else 0
+        if not 0 <= interactive_reserve < capacity:
+            raise ValueError('interactive_reserve must be in [0, capacity)')
+        self.capacity = capacity
+        self.interactive_reserve = interactive_reserve
+        self.bulk_endpoints = bulk_endpoints
+        self.in_flight = 0
+        self.bulk_in_flight = 0
+        self.tenants: Dict[str, TenantQueue] = {}
+        self.on_release: Optional[Callable[[TenantQueue], None]] = None
+        self._vtime = 0.0
+        self._active: List[Dict[TenantQueue, None]] = [{}, {}]
+
+    def tenant(self, tenant_id: str, weight: float = 1.0) -> TenantQueue:
+        """
+        Очередь аккаунта, создаётся при первом обращении.
+        """
+        queue = self.tenants.get(tenant_id)
+        if queue is None:
+            queue = self.tenants[tenant_id] = TenantQueue(
+                self, tenant_id, weight
+            )
+        else:
+            queue.weight = weight
+            queue.removed = False
+        return queue
+
+    def remove(self, tenant_id: str) -> None:
+        """
+        Удалить очередь аккаунта. Очередь с запросами в работе или
+        в ожидании удаляется, когда они завершатся.
+        """
+        queue = self.tenants.get(tenant_id)
+        if queue is None:
+            return
+        queue.removed = True
+        self._forget(queue)
+
+    def _forget(self, queue: TenantQueue) -> None:
+        if queue.removed and not queue.busy \
+                and self.tenants.get(queue.tenant_id) is queue:
+            del self.tenants[queue.tenant_id]
+
+    @property
+    def waiting(self) -> int:
+        return sum(queue.waiting for active in self._active
+                   for queue in active)
+
+    def _can_start(self, kind: int) -> bool:
+        if self.in_flight >= self.capacity:
+            return False
+        return kind == INTERACTIVE or \
+            self.bulk_in_flight < self.capacity - self.interactive_reserve
+
+    def _grant(self, queue: TenantQueue, kind: int) -> None:
+        self.in_flight += 1
+        self.bulk_in_flight += kind
+        self._vtime = max(self._vtime, queue.vtime)
+        queue.vtime += 1 / queue.weight
+        queue.in_flight += 1
+        queue.granted += 1
+        queue.last_used = time.monotonic()
+
+    async def _acquire(self, queue: TenantQueue, kind: int) -> None:
+        if not self._active[INTERACTIVE] and \
+                (kind == INTERACTIVE or not self._active[BULK]) and \
+                self._can_start(kind):
+            queue.vtime = max(queue.vtime, self._vtime)
+            self._grant(queue, kind)
+            return
+        if not queue.waiting:
+            queue.vtime = max(queue.vtime, self._vtime)
+        future = asyncio.get_running_loop().create_future()
+        queue._waiters[kind].append(future)
+        self._active[kind][queue] = None
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(queue, kind)
+            else:
+                waiters = queue._waiters[kind]
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    self._active[kind].pop(queue, None)
+                self._forget(queue)
+            raise
+        finally:
+            queue.waited += time.monotonic() - started
+
+    def _release(self, queue: TenantQueue, kind: int) -> None:
+        self.in_flight -= 1
+        self.bulk_in_flight -= kind
+        queue.in_flight -= 1
+        queue.last_used = time.monotonic()
+        self._dispatch()
+        self._forget(queue)
+        if self.on_release is not None:
+            self.on_release(queue)
+
+    def _dispatch(self) -> None:
+        while True:
+            if self._active[INTERACTIVE]:
+                kind = INTERACTIVE
+            elif self._active[BULK]:
+                kind = BULK
+            else:
+                return
+            if not self._can_start(kind):
+                return
+            active = self._active[kind]
+            queue = min(active,
+                        key=lambda item: item.vtime + 1 / item.weight)
+            waiters = queue._waiters[kind]
+            future = waiters.popleft()
+            if not waiters:
+                del active[queue]
+            if future.done():  # задача отменена и ещё не убрала себя
+                continue
+            self._grant(queue, kind)
+            future.set_result(None)
+
+    def __repr__(self) -> str:
+        return f'FairScheduler(capacity={self.capacity}, ' \
+               f'in_flight={self.in_flight}, ' \
+               f'bulk_in_flight={self.bulk_in_flight}, ' \
+               f'waiting={self.waiting})'
+
+
+class Credentials(NamedTuple):
+    """Авторизация и настройки аккаунта"""
+    api_key: Optional[str]
+    token: Optional[str]
+    username: Optional[str]
+    password: Optional[str]
+    weight: float
+    options: Dict[str, Any]
+
+
+class TenantManager:
+    """
+    Клиенты многих аккаунтов Lava.top поверх одного пула соединений.
+    У каждого аккаунта свои ключи, rate_limit и вес в FairScheduler;
+    max_connections общий для всех. Клиенты создаются при первом
+    обращении и выгружаются, если аккаунт не делал запросов
+    idle_timeout секунд (ключи остаются, клиент создастся заново).
+    Простаивающие клиенты ищутся при создании клиента, при обращении
+    к нему и по завершении запросов, не чаще раза в idle_timeout / 10.
+
+        async with TenantManager(max_connections=50) as manager:
+            manager.add_tenant('shop-1', api_key='...', weight=2)
+            manager.add_tenant('shop-2', api_key='...', rate_limit=5)
+            invoice = await manager.client('shop-1').create_invoice(...)
+    """
+
+    def __init__(
+        self,
+        base_url: str = 'https://gate.lava.top',
+        timeout: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 30.0,
+        http2: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        interactive_reserve: Optional[int] = None,
+        idle_timeout: Optional[float] = 300.0,
+        max_clients: Optional[int] = None,
+        **options: Any
+    ):
+        """
+        :param base_url: Адрес шлюза
+        :param timeout: Таймаут запроса в секундах
+        :param max_connections: Максимум одновременных запросов
+            и соединений на все аккаунты
+        :param max_keepalive_connections: Максимум простаивающих
+            keep-alive соединений
+        :param keepalive_expiry: Через сколько секунд закрывать
+            простаивающее соединение
+        :param http2: Включить HTTP/2 (нужен пакет httpx[http2])
+        :param transport: Свой транспорт httpx, например MockTransport
+        :param interactive_reserve: Сколько слотов выгрузки не занимают
+        :param idle_timeout: Через сколько секунд без запросов выгружать
+            клиент аккаунта, None - не выгружать
+        :param max_clients: Максимум одновременно созданных клиентов,
+            лишние выгружаются начиная с давно неиспользуемых
+        :param options: Параметры LavaTop по умолчанию для всех
+            аккаунтов (retry, coalesce, instrumentation, ...)
+        """
+        self.base_url = base_url
+        self.idle_timeout = idle_timeout
+        self.max_clients = max_clients
+        self.options = options
+        self.scheduler = FairScheduler(max_connections, interactive_reserve)
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            transport=transport,
+        )
+        self._credentials: Dict[str, Credentials] = {}
+        self._clients: Dict[str, LavaTop] = {}
+        self.evicted = 0
+        self._swept = time.monotonic()
+        self.scheduler.on_release = self._released
+
+    async def __aenter__(self) -> 'TenantManager':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Закрыть клиенты и общий пул соединений.
+        """
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        await self._client.aclose()
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    def add_tenant(
+        self,
+        tenant_id: str,
+        api_key: Optional[str] = None,
+        token: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        weight: float = 1.0,
+        **options: Any
+    ) -> None:
+        """
+        Добавить аккаунт или заменить его ключи.
+        :param tenant_id: Идентификатор аккаунта
+        :param api_key: API ключ
+        :param token: Bearer токен
+        :param username: Логин для basic авторизации
+        :param password: Пароль для basic авторизации
+        :param weight: Доля слотов аккаунта относительно остальных
+        :param options: Параметры LavaTop аккаунта (rate_limit,
+            rate_burst, retry, ...) поверх общих
+        """
+        if weight <= 0:
+            raise ValueError('weight must be positive')
+        self._credentials[tenant_id] = Credentials(
+            api_key, token, username, password, weight, options
+        )
+        self.scheduler.tenant(tenant_id, weight)
+        self._clients.pop(tenant_id, None)
+
+    def remove_tenant(self, tenant_id: str) -> None:
+        """
+        Удалить аккаунт. Уже выданный клиент дорабатывает свои запросы.
+        """
+        del self._credentials[tenant_id]
+        self._clients.pop(tenant_id, None)
+        self.scheduler.remove(tenant_id)
+
+    def client(self, tenant_id: str) -> LavaTop:
+        """
+        Клиент аккаунта поверх общего пула соединений.
+        :raises KeyError: Аккаунт не добавлен
+        """
+        client = self._clients.get(tenant_id)
+        queue = self.scheduler.tenants.get(tenant_id)
+        if client is not None:
+            queue.last_used = now = time.monotonic()
+            self._sweep(now)
+            return client
+        credentials = self._credentials[tenant_id]
+        queue = self.scheduler.tenant(tenant_id, credentials.weight)
+        client = LavaTop(
+            api_key=credentials.api_key,
+            token=credentials.token,
+            username=credentials.username,
+            password=credentials.password,
+            base_url=self.base_url,
+            http_client=self._client,
+            scheduler=queue,
+            **{**self.options, **credentials.options}
+        )
+        self._clients[tenant_id] = client
+        queue.last_used = time.monotonic()
+        self.evict_idle()
+        return client
+
+    __getitem__ = client
+
+    def __contains__(self, tenant_id: str) -> bool:
+        return tenant_id in self._credentials
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._credentials)
+
+    def __len__(self) -> int:
+        return len(self._credentials)
+
+    @property
+    def active(self) -> List[str]:
+        """Аккаунты, для которых сейчас создан клиент"""
+        return list(self._clients)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        Выгрузить клиенты аккаунтов без запросов дольше idle_timeout
+        и лишние сверх max_clients. Аккаунты с запросами в работе
+        не выгружаются.
+        :return: Сколько клиентов выгружено
+        """
+        now = time.monotonic() if now is None else now
+        self._swept = now
+        tenants = self.scheduler.tenants
+        idle = sorted(
+            (tenants[tenant_id].last_used, tenant_id)
+            for tenant_id in self._clients
+            if not tenants[tenant_id].busy
+        )
+        excess = len(self._clients) - self.max_clients \
+            if self.max_clients is not None else 0
+        evicted = 0
+        for last_used, tenant_id in idle:
+            if evicted >= excess and (
+                self.idle_timeout is None
+                or now - last_used < self.idle_timeout
+            ):
+                break
+            del self._clients[tenant_id]
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    def _sweep(self, now: float) -> None:
+        if self.idle_timeout is not None \
+                and now - self._swept >= self.idle_timeout / 10:
+            self.evict_idle(now)
+
+    def _released(self, queue: TenantQueue) -> None:
+        self._sweep(queue.last_used)
+
+    def pool_status(self) -> Optional[PoolStatus]:
+        """
+        Соединения общего пула и запросы, которые их заняли или ждут.
+        """
+        return pool_status(self._client)
+
+    def __repr__(self) -> str:
+        return f'TenantManager(tenants={len(self._credentials)}, ' \
+               f'clients={len(self._clients)}, scheduler={self.scheduler!r})'
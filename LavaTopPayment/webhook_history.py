@@ -0,0 +1,281 @@
+import asyncio
+import math
+from array import array
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, NamedTuple, \
+    Optional, Tuple
+
+from LavaTopPayment.export import RawPage, iso_timestamp
+from LavaTopPayment.records import DeliveryRecord, RecordPool
+
+if TYPE_CHECKING:
+    from LavaTopPayment.lava_top import LavaTop
+
+Cursor = Tuple[float, str]
+
+
+class WebhookStats:
+    """
+    Статистика доставок одного вебхука: счётчики за всё время
+    и скользящее окно последних window доставок (успех и задержка
+    доставки от createdAt) в массивах фиксированного размера.
+    """
+    __slots__ = ('delivered', 'undelivered', 'recovered', 'statuses',
+                 'latency_ewma', '_outcomes', '_latencies', '_next', '_size')
+
+    def __init__(self, window: int = 1000):
+        self.delivered = 0
+        self.undelivered = 0
+        self.recovered = 0
+        self.statuses: Dict[Optional[int], int] = {}
+        self.latency_ewma: Optional[float] = None
+        self._outcomes = array('b', bytes(window))
+        self._latencies = array('d', bytes(8 * window))
+        self._next = 0
+        self._size = 0
+
+    def add(self, record: DeliveryRecord) -> None:
+        if record.isDelivered:
+            self.delivered += 1
+        else:
+            self.undelivered += 1
+        status = record.responseStatus
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        latency = -1.0
+        finished = record.deliveredAt if record.isDelivered \
+            else record.lastDeliveryAttemptAt
+        if finished is not None:
+            latency = max(
+                0.0, finished.timestamp() - record.createdAt.timestamp()
+            )
+            self.latency_ewma = latency if self.latency_ewma is None \
+                else self.latency_ewma + 0.05 * (latency - self.latency_ewma)
+        index = self._next
+        self._outcomes[index] = 1 if record.isDelivered else 0
+        self._latencies[index] = latency
+        self._next = (index + 1) % len(self._outcomes)
+        self._size = min(self._size + 1, len(self._outcomes))
+
+    def mark_recovered(self) -> None:
+        """Недоставленная доставка позже прошла успешно"""
+        self.undelivered -= 1
+        self.delivered += 1
+        self.recovered += 1
+
+    @property
+    def total(self) -> int:
+        return self.delivered + self.undelivered
+
+    @property
+    def success_rate(self) -> float:
+        """Доля успешных доставок в окне"""
+        if not self._size:
+            return 1.0
+        return sum(self._outcomes[:self._size]) / self._size
+
+    def latency(self, q: float = 0.5) -> Optional[float]:
+        """Квантиль задержки доставки в окне, секунды"""
+        samples = sorted(value for value in self._latencies[:self._size]
+                         if value >= 0)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1,
+                           max(0, math.ceil(q * len(samples)) - 1))]
+
+    def __repr__(self) -> str:
+        p50 = self.latency(0.5)
+        return f'WebhookStats(total={self.total}, ' \
+               f'undelivered={self.undelivered}, ' \
+               f'success_rate={self.success_rate:.3f}, ' \
+               f'p50={p50 if p50 is None else round(p50, 3)})'
+
+
+class ScanResult(NamedTuple):
+    """Итог одного прохода по истории"""
+    pages: int
+    new: int
+    undelivered: List[DeliveryRecord]
+    recovered: List[DeliveryRecord]
+
+
+class WebhookHistoryScanner:
+    """
+    Инкрементальный обход истории вебхуков.
+    Помнит курсор (createdAt, id) самой новой обработанной доставки и
+    листает историю от новых к старым только до него, поэтому проход по
+    большой истории стоит нескольких запросов. Порядок сортировки
+    истории определяется по первой странице (или задаётся order).
+    Недоставленные доставки не старше lookback секунд перепроверяются
+    не более чем на recheck_pages страницах после курсора: если шлюз
+    доставил их повторно, они попадают в recovered. Без таких доставок
+    проход заканчивается на курсоре.
+
+        scanner = WebhookHistoryScanner(client)
+        async for delivery in scanner.watch(interval=60):
+            replay(delivery)
+    """
+
+    def __init__(
+        self,
+        client: 'LavaTop',
+        page_size: int = 100,
+        lookback: float = 3600.0,
+        recheck_pages: int = 2,
+        window: int = 1000,
+        order: Optional[str] = None,
+        cursor: Optional[Cursor] = None
+    ):
+        """
+        :param client: LavaTop
+        :param page_size: Размер страницы истории
+        :param lookback: Сколько секунд до курсора перепроверять
+            недоставленные доставки
+        :param recheck_pages: Сколько страниц после курсора можно
+            загрузить за проход ради перепроверки
+        :param window: Размер окна статистики на вебхук
+        :param order: 'desc' - сначала новые, 'asc' - сначала старые,
+            None - определить по первой странице
+        :param cursor: Курсор прошлого запуска (scanner.cursor)
+        """
+        if order not in (None, 'asc', 'desc'):
+            raise ValueError("order must be 'asc', 'desc' or None")
+        self.client = client
+        self.page_size = page_size
+        self.lookback = lookback
+        self.recheck_pages = recheck_pages
+        self.window = window
+        self.order = order
+        self.cursor = cursor
+        self.stats: Dict[str, WebhookStats] = {}
+        self.pool = RecordPool()
+        self._pending: Dict[str, Tuple[float, str]] = {}
+
+    def _stats(self, webhook_id: str) -> WebhookStats:
+        stats = self.stats.get(webhook_id)
+        if stats is None:
+            stats = self.stats[webhook_id] = WebhookStats(self.window)
+        return stats
+
+    async def _fetch(self, page: Optional[int], size: int) -> RawPage:
+        return await self.client.get_webhook_history_page(
+            page=page, size=size
+        )
+
+    @staticmethod
+    def _detect_order(page: RawPage) -> str:
+        if len(page.items) < 2:
+            return 'desc'
+        first = iso_timestamp(page.items[0]['createdAt'])
+        last = iso_timestamp(page.items[-1]['createdAt'])
+        return 'asc' if first < last else 'desc'
+
+    async def _newest_first(self) -> AsyncIterator[RawPage]:
+        """
+        Страницы истории от новых к старым, элементы страниц
+        тоже от новых к старым.
+        """
+        size = self.page_size
+        if self.order != 'asc':
+            first = await self._fetch(0, size)
+            if self.order is None:
+                self.order = self._detect_order(first)
+        else:
+            first = await self._fetch(0, 1)
+        if self.order == 'desc':
+            number = 0
+            page = first
+            while True:
+                yield page
+                if len(page.items) < size:
+                    return
+                number += 1
+                page = await self._fetch(number, size)
+        else:
+            pages = math.ceil(first.total / size) if first.total else 0
+            for number in range(pages - 1, -1, -1):
+                page = await self._fetch(number, size)
+                page.items.reverse()
+                yield page
+
+    async def scan(self) -> ScanResult:
+        """
+        Один проход: новые доставки после курсора, затем перепроверка
+        недоставленных в пределах recheck_pages страниц.
+        :return: ScanResult, undelivered и recovered - от старых к новым
+        """
+        cursor = self.cursor
+        if cursor is not None:
+            self._forget_pending(cursor[0] - self.lookback)
+        # Перепроверка заканчивается на самой старой ожидающей доставке
+        waiting = dict(self._pending)
+        oldest = min(waiting.values()) if waiting else None
+        newest = cursor
+        seen = set()
+        undelivered: List[DeliveryRecord] = []
+        recovered: List[DeliveryRecord] = []
+        new = 0
+        pages = 0
+        rechecked = 0
+        pages_iter = self._newest_first()
+        try:
+            async for page in pages_iter:
+                pages += 1
+                recheck = False
+                done = False
+                for item in page.items:
+                    key = (iso_timestamp(item['createdAt']), item['id'])
+                    if key[1] in seen:
+                        continue
+                    seen.add(key[1])
+                    if cursor is not None and key <= cursor:
+                        recheck = True
+                        if oldest is None or key < oldest:
+                            done = True
+                            break
+                        if item['isDelivered'] and key[1] in waiting:
+                            record = DeliveryRecord.from_dict(item, self.pool)
+                            del waiting[key[1]], self._pending[key[1]]
+                            self._stats(record.webhookId).mark_recovered()
+                            recovered.append(record)
+                        continue
+                    record = DeliveryRecord.from_dict(item, self.pool)
+                    new += 1
+                    if newest is None or key > newest:
+                        newest = key
+                    self._stats(record.webhookId).add(record)
+                    if not record.isDelivered:
+                        self._pending[key[1]] = key
+                        undelivered.append(record)
+                if done:
+                    break
+                if recheck:
+                    # Страница с курсором бесплатна, следующие - из бюджета
+                    rechecked += 1
+                    if not waiting or rechecked > self.recheck_pages:
+                        break
+        finally:
+            await pages_iter.aclose()
+        self.cursor = newest
+        if newest is not None:
+            self._forget_pending(newest[0] - self.lookback)
+        undelivered.reverse()
+        recovered.reverse()
+        return ScanResult(pages, new, undelivered, recovered)
+
+    def _forget_pending(self, horizon: float) -> None:
+        self._pending = {
+            id: key for id, key in self._pending.items() if key[0] > horizon
+        }
+
+    async def watch(
+        self,
+        interval: float = 60.0
+    ) -> AsyncIterator[DeliveryRecord]:
+        """
+        Проходы раз в interval секунд; отдаёт новые недоставленные
+        доставки по мере обнаружения.
+        """
+        while True:
+            result = await self.scan()
+            for record in result.undelivered:
+                yield record
+            await asyncio.sleep(interval)
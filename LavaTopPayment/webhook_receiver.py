@@ -0,0 +1,286 @@
+import asyncio
+import base64
+import hmac
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from pydantic import ValidationError
+
+from LavaTopPayment.models.types import WebhookAuthTypeDto
+from LavaTopPayment.models.webhooks import WebhookEvent
+
+
+class RecentIds:
+    """
+    Множество недавно виденных ключей с ограничением по размеру (LRU)
+    и по времени жизни.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 100_000,
+        ttl: Optional[float] = 3600.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._items: 'OrderedDict[str, float]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        seen_at = self._items.get(key)
+        if seen_at is None:
+            return False
+        if self.ttl is not None and self._clock() - seen_at > self.ttl:
+            del self._items[key]
+            return False
+        return True
+
+    def add(self, key: str) -> bool:
+        """
+        Запомнить ключ.
+        :return: False, если ключ уже был
+        """
+        if key in self:
+            self._items.move_to_end(key)
+            return False
+        self._items[key] = self._clock()
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return True
+
+    def discard(self, key: str) -> None:
+        self._items.pop(key, None)
+
+
+class ReceiverStats:
+    def __init__(self):
+        self.received = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.unauthorized = 0
+        self.invalid = 0
+        self.too_large = 0
+        self.rejected = 0
+        self.handled = 0
+        self.failed = 0
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{key}={value}' for key, value in vars(self).items())
+        return f'ReceiverStats({fields})'
+
+
+class WebhookReceiver:
+    """
+    ASGI-приложение для приёма вебхуков Lava.top.
+    Проверяет авторизацию (basic / api_key), разбирает тело
+    сразу из байтов в WebhookEvent, отбрасывает повторные доставки
+    и сразу отвечает 200. Обработка идёт в фоне пулом воркеров
+    через ограниченную очередь. Если очередь заполнена, отвечает 503,
+    чтобы шлюз доставил событие позже. Тело больше max_body
+    отклоняется с 413.
+
+    По умолчанию доставка не более одного раза: 200 уходит до
+    обработки, и событие, на котором обработчик упал, шлюз повторно
+    не пришлёт. С ack_after_handler=True ответ ждёт обработчика:
+    при ошибке receiver отвечает 500, и шлюз доставит событие ещё раз
+    (не менее одного раза; обработчик должен быть идемпотентным).
+
+        receiver = WebhookReceiver(handle, WebhookAuthTypeDto.API_KEY, 'secret')
+        # uvicorn module:receiver
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[WebhookEvent], Union[None, Awaitable[None]]],
+        auth_type: WebhookAuthTypeDto = WebhookAuthTypeDto.NONE,
+        auth_value: Optional[str] = None,
+        queue_size: int = 10_000,
+        workers: int = 4,
+        dedup_size: int = 100_000,
+        dedup_ttl: Optional[float] = 3600.0,
+        retry_after: int = 5,
+        max_body: int = 1 << 20,
+        ack_after_handler: bool = False
+    ):
+        """
+        :param handler: Обработчик события, обычная функция или корутина
+        :param auth_type: Тип авторизации, как в WebhookAuthRequest
+        :param auth_value: Значение authValue из WebhookAuthRequest.
+            Для basic - строка "login:password"
+        :param queue_size: Размер очереди необработанных событий
+        :param workers: Количество воркеров
+        :param dedup_size: Сколько ключей событий помнить для дедупликации
+        :param dedup_ttl: Сколько секунд помнить ключ события
+        :param retry_after: Значение Retry-After при переполненной очереди
+        :param max_body: Максимальный размер тела запроса, байты
+        :param ack_after_handler: Отвечать только после обработки события
+        """
+        if auth_type != WebhookAuthTypeDto.NONE and not auth_value:
+            raise ValueError('auth_value is required for auth_type '
+                             f'{auth_type.value}')
+        self._handler = handler
+        self.auth_type = auth_type
+        self._auth_header, self._expected = self._auth_check(
+            auth_type, auth_value
+        )
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.workers = max(workers, 1)
+        self.seen = RecentIds(dedup_size, dedup_ttl)
+        self._retry_after = str(retry_after).encode()
+        self.max_body = max_body
+        self.ack_after_handler = ack_after_handler
+        self._tasks: List[asyncio.Task] = []
+        self.stats = ReceiverStats()
+
+    @staticmethod
+    def _auth_check(auth_type: WebhookAuthTypeDto, auth_value: Optional[str]):
+        if auth_type == WebhookAuthTypeDto.BASIS:
+            token = base64.b64encode(auth_value.encode()).decode()
+            return b'authorization', f'Basic {token}'.encode()
+        if auth_type == WebhookAuthTypeDto.API_KEY:
+            return b'x-api-key', auth_value.encode()
+        return None, None
+
+    def start(self) -> None:
+        """
+        Запустить воркеры. Вызывается сам при lifespan startup
+        или при первом запросе.
+        """
+        if not self._tasks:
+            self._tasks = [
+                asyncio.ensure_future(self._worker())
+                for _ in range(self.workers)
+            ]
+
+    async def stop(self, drain: bool = True) -> None:
+        """
+        Остановить воркеры.
+        :param drain: Сначала обработать всё, что уже в очереди
+        """
+        if drain and self._tasks:
+            await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def authorized(self, headers: List[Any]) -> bool:
+        if self._auth_header is None:
+            return True
+        for name, value in headers:
+            if name.lower() == self._auth_header:
+                return hmac.compare_digest(value, self._expected)
+        return False
+
+    def accept(self, body: bytes) -> int:
+        """
+        Принять тело запроса: разбор, дедупликация, постановка в очередь.
+        :return: HTTP статус ответа
+        """
+        return self._accept(body, None)
+
+    def _accept(self, body: bytes, done: Optional[asyncio.Future]) -> int:
+        self.stats.received += 1
+        try:
+            event = WebhookEvent.model_validate_json(body)
+        except ValidationError:
+            self.stats.invalid += 1
+            return 400
+        key = event.dedup_key
+        if key in self.seen:
+            self.stats.duplicates += 1
+            if done is not None:
+                done.set_result(True)
+            return 200
+        try:
+            self.queue.put_nowait((event, done))
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            return 503
+        if done is None:
+            self.seen.add(key)
+        self.stats.accepted += 1
+        return 200
+
+    async def __call__(self, scope: Dict[str, Any], receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        self.start()
+        if scope['method'] != 'POST':
+            await self._respond(send, 405)
+            return
+        if not self.authorized(scope['headers']):
+            self.stats.unauthorized += 1
+            await self._respond(send, 401)
+            return
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body:
+                self.stats.too_large += 1
+                await self._respond(send, 413)
+                return
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        body = b''.join(chunks)
+        done = asyncio.get_running_loop().create_future() \
+            if self.ack_after_handler else None
+        status = self._accept(body, done)
+        if done is not None and status == 200:
+            status = 200 if await done else 500
+        await self._respond(send, status)
+
+    async def _respond(self, send, status: int) -> None:
+        headers = [(b'content-length', b'0')]
+        if status == 503:
+            headers.append((b'retry-after', self._retry_after))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _worker(self) -> None:
+        while True:
+            event, done = await self.queue.get()
+            ok = False
+            try:
+                result = self._handler(event)
+                if asyncio.iscoroutine(result):
+                    await result
+                self.stats.handled += 1
+                ok = True
+            except Exception:
+                self.stats.failed += 1
+                # Повторная доставка события не будет считаться дублем
+                self.seen.discard(event.dedup_key)
+            finally:
+                self.queue.task_done()
+                if done is not None and not done.done():
+                    done.set_result(ok)
+            if ok and done is not None:
+                self.seen.add(event.dedup_key)
@@ -0,0 +1,297 @@
+from datetime import timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, \
+    Optional, Tuple
+
+from LavaTopPayment.batch import Batch, BatchResult
+from LavaTopPayment.models.types import WebhookEventTypeDto
+from LavaTopPayment.models.webhooks import WebhookAuthRequest, \
+    WebhookResponse
+
+if TYPE_CHECKING:
+    from LavaTopPayment.lava_top import LavaTop
+
+WebhookKey = Tuple[str, str, str]
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+class WebhookSpec(NamedTuple):
+    """Желаемый вебхук. Ключ - (url, eventType, apiKeyId)"""
+    url: str
+    event_type: WebhookEventTypeDto
+    api_key_id: str
+    name: str
+    is_active: bool = True
+    auth_config: Optional[WebhookAuthRequest] = None
+
+    @property
+    def key(self) -> WebhookKey:
+        return (self.url, WebhookEventTypeDto(self.event_type).value,
+                self.api_key_id)
+
+
+def webhook_key(webhook: WebhookResponse) -> WebhookKey:
+    return webhook.url, webhook.eventType.value, webhook.apiKeyId
+
+
+class WebhookAction(NamedTuple):
+    """
+    Одно изменение плана. changes - аргументы create_webhook
+    или update_webhook (только изменённые поля), before - прежние
+    значения этих полей.
+    """
+    kind: str
+    key: WebhookKey
+    webhook_id: Optional[str] = None
+    changes: Dict[str, Any] = {}
+    before: Dict[str, Any] = {}
+
+    def __str__(self) -> str:
+        url, event_type, api_key_id = self.key
+        target = f'{event_type} {url} (apiKeyId={api_key_id})'
+        if self.kind == CREATE:
+            fields = ', '.join(
+                f'{name}={_show(value)}' for name, value in self.changes.items()
+                if name not in ('url', 'event_type', 'api_key_id')
+                and value is not None
+            )
+            return f'+ create {target}: {fields}'
+        if self.kind == UPDATE:
+            fields = ', '.join(
+                f'{name}: {_show(self.before.get(name))} -> {_show(value)}'
+                for name, value in self.changes.items()
+            )
+            return f'~ update {self.webhook_id} {target}: {fields}'
+        return f'- delete {self.webhook_id} {target}'
+
+
+class WebhookPlan:
+    """Минимальный набор изменений; str(plan) - план для dry-run"""
+
+    def __init__(self, actions: List[WebhookAction], unchanged: int):
+        self.actions = actions
+        self.unchanged = unchanged
+
+    def _of(self, kind: str) -> List[WebhookAction]:
+        return [action for action in self.actions if action.kind == kind]
+
+    @property
+    def creates(self) -> List[WebhookAction]:
+        return self._of(CREATE)
+
+    @property
+    def updates(self) -> List[WebhookAction]:
+        return self._of(UPDATE)
+
+    @property
+    def deletes(self) -> List[WebhookAction]:
+        return self._of(DELETE)
+
+    def __bool__(self) -> bool:
+        return bool(self.actions)
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def __str__(self) -> str:
+        lines = [str(action) for action in self.actions]
+        lines.append(
+            f'{len(self.creates)} to create, {len(self.updates)} to update, '
+            f'{len(self.deletes)} to delete, {self.unchanged} unchanged'
+        )
+        return '\n'.join(lines)
+
+    def __repr__(self) -> str:
+        return f'WebhookPlan(create={len(self.creates)}, ' \
+               f'update={len(self.updates)}, delete={len(self.deletes)}, ' \
+               f'unchanged={self.unchanged})'
+
+
+class WebhookActionBatch(Batch):
+    """Параллельное выполнение действий плана"""
+
+    def __init__(self, client: 'LavaTop', actions: List[WebhookAction],
+                 concurrency: int = 5):
+        super().__init__(actions, concurrency)
+        self._client = client
+
+    async def process(self, action: WebhookAction) -> Any:
+        if action.kind == CREATE:
+            changes = dict(action.changes)
+            is_active = changes.pop('is_active', True)
+            webhook = await self._client.create_webhook(**changes)
+            if not is_active:
+                webhook = await self._client.update_webhook(
+                    webhook.id, is_active=False
+                )
+            return webhook
+        if action.kind == UPDATE:
+            return await self._client.update_webhook(
+                action.webhook_id, **action.changes
+            )
+        await self._client.delete_webhook(action.webhook_id)
+        return None
+
+
+class WebhookReconciler:
+    """
+    Приведение вебхуков аккаунта к желаемому состоянию.
+    Текущие вебхуки загружаются одним запросом и сопоставляются
+    с желаемыми по (url, eventType, apiKeyId); изменённым вебхукам
+    отправляются только отличающиеся поля. Сначала параллельно
+    выполняются создания и изменения, затем удаления, поэтому при
+    смене url новый вебхук появляется раньше, чем удаляется старый.
+    Если создание или изменение не удалось, удаления не выполняются.
+
+        reconciler = WebhookReconciler(client, [
+            WebhookSpec(url, WebhookEventTypeDto.PAYMENT_RESULT, key_id,
+                        'payments', auth_config=auth),
+        ])
+        plan = await reconciler.plan()
+        print(plan)  # dry-run
+        results = await reconciler.apply(plan)
+    """
+
+    def __init__(
+        self,
+        client: 'LavaTop',
+        desired: Iterable[WebhookSpec],
+        prune: bool = True,
+        rotate_auth: bool = False,
+        concurrency: int = 5
+    ):
+        """
+        :param client: LavaTop
+        :param desired: Желаемые вебхуки
+        :param prune: Удалять вебхуки, которых нет среди желаемых
+        :param rotate_auth: Всегда отправлять auth_config: шлюз не
+            возвращает authValue, и без этого смена только ключа
+            (тот же authType) не видна
+        :param concurrency: Сколько запросов выполнять одновременно
+        """
+        self._client = client
+        self.desired: Dict[WebhookKey, WebhookSpec] = {}
+        for spec in desired:
+            if spec.key in self.desired:
+                raise ValueError(f'Duplicate webhook {spec.key}')
+            self.desired[spec.key] = spec
+        self.prune = prune
+        self.rotate_auth = rotate_auth
+        self.concurrency = concurrency
+
+    def diff(self, current: Iterable[WebhookResponse]) -> WebhookPlan:
+        """
+        План изменений относительно текущих вебхуков, без запросов.
+        Дубликаты одного ключа удаляются, остаётся активный и самый
+        новый.
+        """
+        index: Dict[WebhookKey, List[WebhookResponse]] = {}
+        for webhook in current:
+            index.setdefault(webhook_key(webhook), []).append(webhook)
+        actions: List[WebhookAction] = []
+        deletes: List[WebhookAction] = []
+        unchanged = 0
+        for key, webhooks in index.items():
+            webhooks.sort(key=lambda webhook: (
+                webhook.isActive, _updated(webhook)
+            ), reverse=True)
+            spec = self.desired.get(key)
+            if spec is None and not self.prune:
+                continue
+            extra = webhooks[1:] if spec is not None else webhooks
+            deletes.extend(WebhookAction(DELETE, key, webhook.id)
+                           for webhook in extra)
+            if spec is None:
+                continue
+            action = self._update(key, webhooks[0], spec)
+            if action is None:
+                unchanged += 1
+            else:
+                actions.append(action)
+        for key, spec in self.desired.items():
+            if key not in index:
+                changes = {
+                    'url': spec.url,
+                    'name': spec.name,
+                    'api_key_id': spec.api_key_id,
+                    'event_type': WebhookEventTypeDto(spec.event_type),
+                    'auth_config': spec.auth_config,
+                }
+                if not spec.is_active:
+                    changes['is_active'] = False
+                actions.append(WebhookAction(CREATE, key, changes=changes))
+        return WebhookPlan(actions + deletes, unchanged)
+
+    def _update(self, key: WebhookKey, webhook: WebhookResponse,
+                spec: WebhookSpec) -> Optional[WebhookAction]:
+        changes: Dict[str, Any] = {}
+        before: Dict[str, Any] = {}
+        if webhook.name != spec.name:
+            changes['name'], before['name'] = spec.name, webhook.name
+        if webhook.isActive != spec.is_active:
+            changes['is_active'] = spec.is_active
+            before['is_active'] = webhook.isActive
+        auth = spec.auth_config
+        if auth is not None and (self.rotate_auth
+                                 or auth.authType != webhook.authType):
+            changes['auth_config'] = auth
+            before['auth_config'] = webhook.authType
+        if not changes:
+            return None
+        return WebhookAction(UPDATE, key, webhook.id, changes, before)
+
+    async def plan(self) -> WebhookPlan:
+        """
+        Загрузить текущие вебхуки и построить план.
+        """
+        return self.diff(await self._client.list_webhooks())
+
+    async def apply(
+        self,
+        plan: Optional[WebhookPlan] = None,
+        dry_run: bool = False
+    ) -> List[BatchResult]:
+        """
+        Выполнить план.
+        :param plan: План из plan(), по умолчанию строится заново
+        :param dry_run: Только построить план, без изменений
+        :return: BatchResult на каждое выполненное действие
+            (request - WebhookAction), по порядку плана
+        """
+        if plan is None:
+            plan = await self.plan()
+        if dry_run or not plan:
+            return []
+        changes = [action for action in plan.actions if action.kind != DELETE]
+        results = await WebhookActionBatch(
+            self._client, changes, self.concurrency
+        ).collect()
+        if any(not result.ok for result in results):
+            return results
+        deletes = await WebhookActionBatch(
+            self._client, plan.deletes, self.concurrency
+        ).collect()
+        return results + [result._replace(index=len(results) + result.index)
+                          for result in deletes]
+
+
+def _updated(webhook: WebhookResponse) -> float:
+    """
+    Время последнего изменения в секундах от эпохи, без зоны - UTC.
+    Шлюз отдаёт время и с зоной, и без неё, а такие datetime
+    сравнивать нельзя.
+    """
+    moment = webhook.updatedAt or webhook.createdAt
+    if moment is None:
+        return float('-inf')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _show(value: Any) -> str:
+    if isinstance(value, WebhookAuthRequest):
+        return repr(value.authType.value)
+    return repr(getattr(value, 'value', value))
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from LavaTopPayment.aggregation import SalesSummary, Totals, aggregate_sales
+
+
+def _sale(amount, currency='RUB', status='completed'):
+    return {'amountTotal': {'amount': amount, 'currency': currency},
+            'status': status}
+
+
+SALES = {
+    'p1': [[_sale(100), _sale(50), _sale(5, 'USD')],
+           [_sale(100, status='failed')]],
+    'p2': [[_sale(10, 'USD'), _sale(20, 'USD')]],
+    'p3': [],
+}
+
+
+class Sales:
+    """Клиент со страницами продаж по продуктам"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.active = self.max_active = 0
+
+    async def iter_sales(self):
+        for product_id in self.pages:
+            yield SimpleNamespace(productId=product_id)
+
+    async def iter_sales_by_product_pages(self, product_id, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            for items in self.pages[product_id]:
+                await asyncio.sleep(0)
+                yield SimpleNamespace(items=items)
+        finally:
+            self.active -= 1
+
+
+def test_totals_by_dimension():
+    client = Sales(SALES)
+    summary = asyncio.run(aggregate_sales(client, concurrency=2))
+    assert summary.count == 6
+    assert summary.by_product() == {'p1': Totals(4, 255.0),
+                                    'p2': Totals(2, 30.0)}
+    assert summary.by_currency() == {'RUB': Totals(3, 250.0),
+                                     'USD': Totals(3, 35.0)}
+    assert summary.by_status() == {'completed': Totals(5, 185.0),
+                                   'failed': Totals(1, 100.0)}
+    assert client.max_active <= 2
+
+
+def test_explicit_products_only():
+    summary = asyncio.run(aggregate_sales(Sales(SALES), ['p2']))
+    assert summary.cells == {('p2', 'USD', 'completed'): Totals(2, 30.0)}
+
+
+def test_merge_and_add():
+    first = SalesSummary()
+    first.add_sales('p1', [_sale(100), _sale(5, 'USD')])
+    second = SalesSummary()
+    second.add_sales('p1', [_sale(50)])
+    second.add('p2', 'RUB', 'completed', 7.0, count=2)
+    total = first + second
+    assert total.cells == {
+        ('p1', 'RUB', 'completed'): Totals(2, 150.0),
+        ('p1', 'USD', 'completed'): Totals(1, 5.0),
+        ('p2', 'RUB', 'completed'): Totals(2, 7.0),
+    }
+    # + не меняет слагаемые, merge дописывает в себя
+    assert first.count == 2 and second.count == 3
+    assert first.merge(second) == total
+
+
+def test_dict_round_trip_through_json():
+    summary = asyncio.run(aggregate_sales(Sales(SALES)))
+    restored = SalesSummary.from_dict(
+        json.loads(json.dumps(summary.to_dict())))
+    assert restored == summary
+    assert restored is not summary
+    assert repr(restored) == 'SalesSummary(products=2, count=6)'
@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import httpx
+
+from LavaTopPayment.batch import Batch
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.models.types import ContractStatusDto
+from LavaTopPayment.retry import RetryPolicy
+from LavaTopPayment.subscriptions import SubscriptionTracker
+
+
+class Echo(Batch):
+    def __init__(self, requests, concurrency=2, fail=()):
+        super().__init__(requests, concurrency)
+        self.fail = set(fail)
+        self.processed = 0
+
+    async def process(self, request):
+        await asyncio.sleep(0)
+        self.processed += 1
+        if request in self.fail:
+            raise ValueError(request)
+        return request * 2
+
+
+def test_collect_keeps_order_and_errors():
+    batch = Echo(range(20), concurrency=4, fail={3})
+    results = asyncio.run(batch.collect())
+    assert [result.index for result in results] == list(range(20))
+    assert results[3].error is not None and not results[3].ok
+    assert [result.result for result in results if result.ok] == \
+        [value * 2 for value in range(20) if value != 3]
+    assert batch.stats.succeeded == 19 and batch.stats.failed == 1
+
+
+def test_early_break_does_not_hang():
+    # Воркеры с полным буфером результатов должны отменяться без зависания
+    async def main():
+        batch = Echo(range(1000), concurrency=3)
+        async for _ in batch:
+            break
+        return batch
+
+    batch = asyncio.run(asyncio.wait_for(main(), 5))
+    assert batch.processed < 1000
+
+
+def test_aclose_does_not_hang():
+    async def main():
+        results = Echo(range(1000), concurrency=3).__aiter__()
+        await results.__anext__()
+        await asyncio.sleep(0.01)  # буфер результатов заполнен
+        await asyncio.wait_for(results.aclose(), 5)
+
+    asyncio.run(main())
+
+
+class Subscriptions:
+    """Шлюз отмены подписок: статусы ответов по contractId и запросы"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.cancelled = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        contract_id = request.url.params['contractId']
+        self.cancelled.append(contract_id)
+        return httpx.Response(self.statuses.get(contract_id, 204))
+
+
+def _cancel(gateway, rows, progress, tracker=None, stop_after=None):
+    async def main():
+        async with LavaTop(api_key='key', retry=RetryPolicy(max_retries=0),
+                           transport=httpx.MockTransport(gateway)) as client:
+            batch = client.cancel_subscriptions(rows, concurrency=2,
+                                                progress=progress,
+                                                tracker=tracker)
+            results = []
+            async for result in batch:
+                results.append(result)
+                if len(results) == stop_after:
+                    break
+            return batch, results
+
+    return asyncio.run(main())
+
+
+ROWS = [(f'c{i}', f'buyer{i}@example.com') for i in range(6)]
+
+
+def test_progress_file_resumes_after_failures(tmp_path):
+    progress = str(tmp_path / 'cancel.jsonl')
+    first = Subscriptions({'c1': 404, 'c2': 503})
+    batch, results = _cancel(first, ROWS, progress)
+    assert sorted(first.cancelled) == [row[0] for row in ROWS]
+    assert [result.ok for result in sorted(results)] == \
+        [True, False, False, True, True, True]
+
+    # 4xx окончательна, 503 повторяется
+    second = Subscriptions({})
+    batch, results = _cancel(second, ROWS, progress)
+    assert second.cancelled == ['c2']
+    assert batch.skipped == 5
+    assert [result.request[0] for result in results if result.ok] == ['c2']
+
+    third = Subscriptions({})
+    batch, results = _cancel(third, ROWS, progress)
+    assert (third.cancelled, results, batch.skipped) == ([], [], 6)
+
+
+def test_progress_survives_early_stop_and_torn_line(tmp_path):
+    progress = tmp_path / 'cancel.jsonl'
+    rows = [(f'c{i}', f'buyer{i}@example.com') for i in range(50)]
+    _cancel(Subscriptions({}), rows, str(progress), stop_after=2)
+    # Воркеры, прерванные остановкой, пишут ошибку без статуса,
+    # такие подписки повторяются
+    records = [json.loads(line)
+               for line in progress.read_text().splitlines()]
+    done = [record['contractId'] for record in records if record['ok']]
+    assert 2 <= len(done) < len(rows)
+    with open(progress, 'a') as file:
+        file.write('{"contractId": "c49", "ok": tr')  # оборванная запись
+
+    second = Subscriptions({})
+    batch, _ = _cancel(second, [{'contractId': contract_id, 'email': email}
+                                for contract_id, email in rows],
+                       str(progress))
+    assert sorted(second.cancelled) == \
+        sorted(row[0] for row in rows if row[0] not in done)
+    assert batch.skipped == len(done)
+
+    # Запись после оборванной строки не склеилась с ней
+    third = Subscriptions({})
+    batch, _ = _cancel(third, rows, str(progress))
+    assert third.cancelled == []
+    assert batch.skipped == len(rows)
+
+
+def test_tracker_receives_cancellations(tmp_path):
+    tracker = SubscriptionTracker(str(tmp_path / 'subscriptions.sqlite3'))
+    _cancel(Subscriptions({'c1': 404}), ROWS[:2], None, tracker=tracker)
+    assert tracker.get('c0').status == ContractStatusDto.SUBSCRIPTION_CANCELLED
+    assert tracker.get('c1') is None
+    tracker.close()
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from LavaTopPayment.cache import CatalogCache
+from LavaTopPayment.models.products import ProductItemResponse
+
+
+def _product(version):
+    return ProductItemResponse(
+        id='p1', title=f'v{version}', type='COURSE',
+        offers=[{'id': f'o{version}', 'name': 'offer',
+                 'prices': [{'amount': 10.0, 'currency': 'RUB'}]}],
+    )
+
+
+class Loader:
+    """Загрузчик каталога: каждая загрузка - новая версия продукта"""
+
+    def __init__(self):
+        self.loads = 0
+        self.release = asyncio.Event()
+        self.release.set()
+        self.fail = False
+
+    async def __call__(self):
+        self.loads += 1
+        version = self.loads
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError('gateway is down')
+        return [_product(version)]
+
+
+def _cache(loader, now, ttl=10, stale_ttl=0):
+    return CatalogCache(loader, ttl=ttl, stale_ttl=stale_ttl,
+                        clock=lambda: now[0])
+
+
+def test_fresh_snapshot_is_reused_until_ttl():
+    async def main():
+        now = [0.0]
+        loader = Loader()
+        cache = _cache(loader, now)
+        first = await cache.get()
+        now[0] = 9.9
+        same = await cache.get()
+        now[0] = 10.0
+        expired = await cache.get()
+        return first, same, expired, loader.loads
+
+    first, same, expired, loads = asyncio.run(main())
+    assert same is first
+    assert expired.products['p1'].title == 'v2'
+    assert set(expired.offers) == {'o2'} and loads == 2
+
+
+def test_stale_snapshot_is_served_while_refreshing():
+    async def main():
+        now = [0.0]
+        loader = Loader()
+        cache = _cache(loader, now, stale_ttl=5)
+        first = await cache.get()
+        now[0] = 12.0
+        loader.release.clear()
+        stale = await asyncio.wait_for(cache.get(), 1)
+        again = await asyncio.wait_for(cache.get(), 1)
+        loads = loader.loads
+        loader.release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        fresh = await cache.get()
+        return first, stale, again, loads, fresh
+
+    first, stale, again, loads, fresh = asyncio.run(main())
+    assert stale is first and again is first
+    assert loads == 2
+    assert fresh.products['p1'].title == 'v2'
+
+
+def test_expired_past_stale_window_waits_for_load():
+    async def main():
+        now = [0.0]
+        loader = Loader()
+        cache = _cache(loader, now, stale_ttl=5)
+        await cache.get()
+        now[0] = 15.0
+        return (await cache.get()).products['p1'].title
+
+    assert asyncio.run(main()) == 'v2'
+
+
+def test_concurrent_gets_share_one_load():
+    async def main():
+        loader = Loader()
+        loader.release.clear()
+        cache = _cache(loader, [0.0])
+        waiters = [asyncio.ensure_future(cache.get()) for _ in range(10)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        snapshots = await asyncio.gather(*waiters)
+        return snapshots, loader.loads
+
+    snapshots, loads = asyncio.run(main())
+    assert loads == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+
+
+def test_invalidate_during_load_discards_its_result():
+    async def main():
+        loader = Loader()
+        loader.release.clear()
+        cache = _cache(loader, [0.0])
+        pending = asyncio.ensure_future(cache.get())
+        await asyncio.sleep(0)
+        cache.invalidate()
+        loader.release.set()
+        # Ожидающий получает свою загрузку, но в кэш она не попадает
+        old = await pending
+        new = await cache.get()
+        return old, new, loader.loads
+
+    old, new, loads = asyncio.run(main())
+    assert old.products['p1'].title == 'v1'
+    assert new.products['p1'].title == 'v2' and loads == 2
+
+
+def test_failed_background_refresh_keeps_stale_snapshot():
+    async def main():
+        now = [0.0]
+        loader = Loader()
+        cache = _cache(loader, now, stale_ttl=5)
+        first = await cache.get()
+        now[0] = 12.0
+        loader.fail = True
+        stale = await cache.get()
+        await asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            await cache.refresh()
+        return first, stale, await cache.get_offer('o1')
+
+    first, stale, offer = asyncio.run(main())
+    assert stale is first
+    assert offer.product.id == 'p1' and offer.prices[0].amount == 10.0
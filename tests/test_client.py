@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+
+from LavaTopPayment.lava_top import LavaTop
+
+
+def _gateway(seen):
+    def handle(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={'url': 'https://lava.top/d'})
+
+    return httpx.MockTransport(handle)
+
+
+def test_transport_receives_every_request():
+    seen = []
+
+    async def main():
+        async with LavaTop(api_key='key', transport=_gateway(seen),
+                           base_url='https://gate.test/') as client:
+            pool = client._client
+            first = await client.get_donate_link()
+            second = await client.get_donate_link()
+            assert client._client is pool
+            assert client.pool_status() is None
+            return first, second
+
+    first, second = asyncio.run(main())
+    assert first.url == second.url == 'https://lava.top/d'
+    assert [str(request.url) for request in seen] == \
+        ['https://gate.test/api/v1/donate'] * 2
+    assert all(request.headers['X-Api-Key'] == 'key' for request in seen)
+
+
+def test_aclose_closes_owned_client():
+    async def main():
+        client = LavaTop(transport=_gateway([]))
+        http_client = client._client
+        assert not client.is_closed
+        async with client:
+            await client.get_donate_link()
+        return client, http_client
+
+    client, http_client = asyncio.run(main())
+    assert client.is_closed and http_client.is_closed
+
+
+def test_aclose_keeps_shared_client_open():
+    seen = []
+
+    async def main():
+        async with httpx.AsyncClient(transport=_gateway(seen)) as shared:
+            first = LavaTop(api_key='a', http_client=shared)
+            second = LavaTop(api_key='b', http_client=shared)
+            await first.get_donate_link()
+            await first.aclose()
+            # Второй клиент продолжает работать через общий пул
+            await second.get_donate_link()
+            state = (first.is_closed, second.is_closed, shared.is_closed)
+            await second.aclose()
+        return state, shared, second
+
+    state, shared, second = asyncio.run(main())
+    assert state == (True, False, False)
+    # Закрытие общего пула закрывает и клиентов поверх него
+    assert shared.is_closed and second.is_closed
+    assert [request.headers['X-Api-Key'] for request in seen] == ['a', 'b']
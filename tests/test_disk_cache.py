@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from LavaTopPayment import disk_cache
+from LavaTopPayment.disk_cache import IMMUTABLE, CachedResponse, DiskCache
+from LavaTopPayment.emulator import GatewayEmulator
+from LavaTopPayment.instrumentation import Instrumentation
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.lava_top_sync import LavaTopSync
+
+
+class Recorder(Instrumentation):
+    """Хуки по порядку; on_complete без on_request - ошибка"""
+
+    def __init__(self):
+        self.calls = []
+
+    def on_request(self, event):
+        event.context['open'] = True
+        self.calls.append(('request', event.endpoint))
+
+    def on_response(self, event):
+        self.calls.append(('response', event.endpoint))
+
+    def on_complete(self, event):
+        assert event.context.pop('open'), 'on_complete without on_request'
+        self.calls.append(('complete', event.endpoint))
+
+    def on_error(self, event):
+        self.calls.append(('error', event.endpoint))
+
+
+async def _twice(cache, instrumentation, emulator=None):
+    emulator = emulator or GatewayEmulator(settle_after=None)
+    async with LavaTop(api_key='key', transport=emulator.transport(),
+                       cache=cache,
+                       instrumentation=instrumentation) as client:
+        first = await client.get_donate_link()
+        second = await client.get_donate_link()
+    return first, second
+
+
+def test_cache_hit_skips_instrumentation_hooks():
+    cache = DiskCache(':memory:')
+    recorder = Recorder()
+    first, second = asyncio.run(_twice(cache, recorder))
+    assert first == second
+    assert recorder.calls == [('request', 'get_donate_link'),
+                              ('response', 'get_donate_link'),
+                              ('complete', 'get_donate_link')]
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_cache_hit_with_opentelemetry():
+    pytest.importorskip('opentelemetry')
+    from LavaTopPayment.instrumentation import OpenTelemetryInstrumentation
+
+    cache = DiskCache(':memory:')
+    asyncio.run(_twice(cache, OpenTelemetryInstrumentation()))
+    assert cache.stats.hits == 1
+
+
+def test_locked_database_falls_through_to_network(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = DiskCache(path, timeout=0.01)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute('BEGIN IMMEDIATE')
+    emulator = GatewayEmulator(settle_after=None)
+    started = time.perf_counter()
+    try:
+        first, second = asyncio.run(_twice(cache, None, emulator))
+    finally:
+        writer.execute('ROLLBACK')
+        writer.close()
+    assert time.perf_counter() - started < 1
+    assert first == second
+    assert emulator.stats.requests == 2
+    assert cache.stats.busy == 2
+    assert len(cache) == 0
+
+
+def test_stale_entry_is_revalidated_with_etag():
+    emulator = GatewayEmulator(settle_after=None, etags=True)
+    cache = DiskCache(':memory:', ttl={'get_donate_link': 0})
+    first, second = asyncio.run(_twice(cache, None, emulator))
+    assert first == second
+    assert emulator.stats.not_modified == 1
+    assert (cache.stats.misses, cache.stats.revalidated, cache.stats.hits) \
+        == (1, 1, 0)
+
+
+def test_changed_resource_is_reloaded():
+    async def main():
+        emulator = GatewayEmulator(products=1, settle_after=None, etags=True)
+        cache = DiskCache(':memory:', ttl={'get_products': 0})
+        async with LavaTop(api_key='key', transport=emulator.transport(),
+                           cache=cache) as client:
+            before = await client.get_products()
+            product = before.items[0].id
+            await client.update_product_v2(product, {'title': 'Новое'})
+            after = await client.get_products()
+        return before, after, cache.stats
+
+    before, after, stats = asyncio.run(main())
+    assert before.items[0].title == 'Продукт 0'
+    assert after.items[0].title == 'Новое'
+    assert (stats.misses, stats.revalidated) == (2, 0)
+
+
+def test_entries_are_keyed_by_credentials():
+    async def main():
+        emulator = GatewayEmulator(settle_after=None)
+        cache = DiskCache(':memory:')
+        for api_key in ('a', 'b', 'a'):
+            async with LavaTop(api_key=api_key, cache=cache,
+                               transport=emulator.transport()) as client:
+                await client.get_donate_link()
+        return emulator.stats.requests, cache.stats
+
+    requests, stats = asyncio.run(main())
+    assert requests == 2
+    assert (stats.misses, stats.hits) == (2, 1)
+
+
+def test_closed_sales_pages_never_expire():
+    cache = DiskCache(':memory:')
+    now = datetime(2024, 6, 10, tzinfo=timezone.utc).timestamp()
+    closed = {'toDate': '2024-06-01T00:00:00+00:00'}
+    open_ = {'toDate': '2024-06-09T12:00:00+00:00'}
+    assert cache.ttl_for('get_sales_by_product', closed, now) == IMMUTABLE
+    assert cache.ttl_for('get_sales_by_product', open_, now) == 60.0
+    assert cache.ttl_for('get_sales_by_product', None, now) == 60.0
+    entry = CachedResponse(b'{}', None, None, now - 10 ** 7)
+    assert cache.fresh(entry, 'get_sales_by_product', closed, now)
+    assert not cache.fresh(entry, 'get_sales_by_product', open_, now)
+
+
+def test_least_recently_read_entries_are_evicted(monkeypatch):
+    clock = iter(range(1, 1000))
+    monkeypatch.setattr(disk_cache.time, 'time', lambda: next(clock))
+    cache = DiskCache(':memory:', max_bytes=25)
+    for key in 'abc':
+        if key == 'c':
+            assert cache.get('a') is not None
+        cache.put(key, 'get_products', httpx.Response(200, content=b'x' * 10))
+    assert [cache.get(key) is not None for key in 'abc'] == \
+        [True, False, True]
+    assert (cache.size, cache.stats.evicted) == (20, 1)
+
+
+def test_no_store_responses_are_not_cached():
+    cache = DiskCache(':memory:')
+    cache.put('key', 'get_products', httpx.Response(
+        200, content=b'{}', headers={'Cache-Control': 'no-store'}))
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_credentials_key_is_keyed_per_database(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    first = DiskCache(path).credentials_key('api-key', None, None, None)
+    again = DiskCache(path).credentials_key('api-key', None, None, None)
+    other = DiskCache(str(tmp_path / 'other.sqlite3')).credentials_key(
+        'api-key', None, None, None)
+    plain = hashlib.sha256(
+        json.dumps(['api-key', None, None, None]).encode()).hexdigest()
+    assert first == again
+    assert first not in (other, plain)
+
+
+def test_entries_keyed_without_secret_are_dropped(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = DiskCache(path)
+    cache.put('key', 'get_products', httpx.Response(200, content=b'{}'))
+    cache._db.execute('DELETE FROM meta')
+    cache._db.commit()
+    cache.close()
+    assert len(DiskCache(path)) == 0
+
+
+def test_cache_survives_reopening(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    emulator = GatewayEmulator(settle_after=None)
+
+    async def once():
+        async with LavaTop(api_key='key', cache=DiskCache(path),
+                           transport=emulator.transport()) as client:
+            return await client.get_donate_link()
+
+    assert asyncio.run(once()) == asyncio.run(once())
+    assert emulator.stats.requests == 1
+
+
+def _etag_gateway(seen):
+    def gateway(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304, headers={'ETag': '"v1"'})
+        return httpx.Response(200, headers={'ETag': '"v1"'},
+                              json={'url': 'https://lava.top/d'})
+
+    return gateway
+
+
+def test_sync_client_revalidates_stale_entry():
+    cache = DiskCache(':memory:', ttl={'get_donate_link': 0})
+    recorder = Recorder()
+    seen = []
+    with LavaTopSync(api_key='key', cache=cache, instrumentation=recorder,
+                     transport=httpx.MockTransport(_etag_gateway(seen))
+                     ) as client:
+        first = client.get_donate_link()
+        second = client.get_donate_link()
+    assert first == second
+    assert seen == [None, '"v1"']
+    assert (cache.stats.misses, cache.stats.revalidated) == (1, 1)
+    assert recorder.calls.count(('complete', 'get_donate_link')) == 2
+
+
+def test_sync_and_async_clients_share_entries():
+    cache = DiskCache(':memory:')
+    asyncio.run(_twice(cache, None))
+    seen = []
+    with LavaTopSync(api_key='key', cache=cache,
+                     transport=httpx.MockTransport(_etag_gateway(seen))
+                     ) as client:
+        link = client.get_donate_link()
+    assert link.url and seen == []
+    assert cache.stats.hits == 2
+
+
+def test_sync_client_shares_cache_between_threads(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'))
+    seen = []
+    with LavaTopSync(api_key='key', cache=cache,
+                     transport=httpx.MockTransport(_etag_gateway(seen))
+                     ) as client:
+        with ThreadPoolExecutor(4) as pool:
+            links = list(pool.map(lambda _: client.get_donate_link(),
+                                  range(20)))
+    assert len({link.url for link in links}) == 1
+    assert cache.stats.hits + cache.stats.misses == 20
+    assert len(seen) == cache.stats.misses
@@ -0,0 +1,180 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from LavaTopPayment.endpoints import ENDPOINTS
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.lava_top_sync import LavaTopSync
+from LavaTopPayment.models.types import ContractStatusDto, Currency, \
+    Language, PaymentMethod, WebhookAuthTypeDto, WebhookEventTypeDto
+from LavaTopPayment.models.webhooks import WebhookAuthRequest
+
+BASE = 'https://gate.lava.top'
+PRODUCT = '00000000-0000-0000-0000-000000000001'
+FROM = datetime(2024, 1, 1, tzinfo=timezone.utc)
+TO = datetime(2024, 2, 1, 12, 30, tzinfo=timezone.utc)
+AUTH = WebhookAuthRequest(authType=WebhookAuthTypeDto.API_KEY,
+                          authValue='secret')
+
+
+class Sent(Exception):
+    """Запрос перехвачен до отправки"""
+
+    def __init__(self, request: httpx.Request):
+        super().__init__(request.url)
+        self.request = request
+
+
+def _capture(request: httpx.Request) -> httpx.Response:
+    raise Sent(request)
+
+
+# (метод API, имя в ENDPOINTS, args, kwargs,
+#  (HTTP метод, путь, query, JSON тело, заголовки запроса))
+CASES = [
+    ('create_webhook', 'create_webhook',
+     ('https://shop/hook', 'payments', 'key-id',
+      WebhookEventTypeDto.PAYMENT_RESULT),
+     {'auth_config': AUTH},
+     ('POST', '/api/v1/webhooks', {}, {
+         'url': 'https://shop/hook', 'name': 'payments',
+         'apiKeyId': 'key-id', 'eventType': 'payment_result',
+         'authConfig': {'authType': 'api_key', 'authValue': 'secret'},
+     }, {})),
+    ('get_webhooks', 'get_webhooks', (), {},
+     ('GET', '/api/v1/webhooks', {}, None, {})),
+    ('list_webhooks', 'list_webhooks', (), {},
+     ('GET', '/api/v1/webhooks', {}, None, {})),
+    ('get_webhook_history', 'get_webhook_history', (),
+     {'page': 2, 'size': 50},
+     ('GET', '/api/v1/webhook-history', {'page': '2', 'size': '50'}, None,
+      {})),
+    ('update_webhook', 'update_webhook', ('w1',),
+     {'is_active': False, 'name': 'renamed'},
+     ('PUT', '/api/v1/webhooks/w1', {},
+      {'isActive': False, 'name': 'renamed'}, {})),
+    ('delete_webhook', 'delete_webhook', ('w1',), {},
+     ('DELETE', '/api/v1/webhooks/w1', {}, None, {})),
+    ('get_products', 'get_products', (), {},
+     ('GET', '/api/v2/products', {}, None, {})),
+    ('create_invoice', 'create_invoice',
+     ('buyer@example.com', 'offer-1', Currency.RUB),
+     {'payment_method': PaymentMethod.BANK131,
+      'buyer_language': Language.RU, 'idempotency_key': 'order-1'},
+     ('POST', '/api/v2/invoice', {}, {
+         'email': 'buyer@example.com', 'offerId': 'offer-1',
+         'currency': 'RUB', 'paymentMethod': 'BANK131',
+         'buyerLanguage': 'RU',
+     }, {'idempotency-key': 'order-1'})),
+    ('get_product_by_id', 'get_product_by_id', ('invoice-1',), {},
+     ('GET', '/api/v1/invoice', {'id': 'invoice-1'}, None, {})),
+    ('update_product_v2', 'update_product_v2',
+     (PRODUCT, {'offers': [{'id': 'offer-1'}]}), {},
+     ('PUT', f'/api/v2/products/{PRODUCT}', {},
+      {'offers': [{'id': 'offer-1'}]}, {})),
+    ('cancel_subscription', 'cancel_subscription',
+     ('contract-1', 'buyer@example.com'), {},
+     ('DELETE', '/api/v1/subscriptions',
+      {'contractId': 'contract-1', 'email': 'buyer@example.com'}, None, {})),
+    ('get_sales', 'get_sales', (), {'page': 0, 'size': 20},
+     ('GET', '/api/v1/sales', {'page': '0', 'size': '20'}, None, {})),
+    ('get_sales_by_product', 'get_sales_by_product', (PRODUCT,), {
+        'page': 1, 'size': 10, 'from_date': FROM, 'to_date': TO,
+        'currency': Currency.USD, 'status': ContractStatusDto.COMPLETED,
+        'search': 'buyer',
+    },
+     ('GET', f'/api/v1/sales/{PRODUCT}', {
+         'page': '1', 'size': '10',
+         'fromDate': '2024-01-01T00:00:00+00:00',
+         'toDate': '2024-02-01T12:30:00+00:00',
+         'currency': 'USD', 'status': 'completed', 'search': 'buyer',
+     }, None, {})),
+    ('get_donate_link', 'get_donate_link', (), {},
+     ('GET', '/api/v1/donate', {}, None, {})),
+]
+
+# Страницы без разбора в модели, только у LavaTop
+PAGE_CASES = [
+    ('get_webhook_history_page', (), {'page': 3, 'size': 25},
+     ('GET', '/api/v1/webhook-history', {'page': '3', 'size': '25'}, None,
+      {})),
+]
+
+
+def _wire(request: httpx.Request):
+    return (
+        request.method,
+        request.url.path,
+        dict(request.url.params),
+        json.loads(request.content) if request.content else None,
+    )
+
+
+def _check(request: httpx.Request, expected) -> None:
+    method, path, query, body, headers = expected
+    assert _wire(request) == (method, path, query, body)
+    assert request.url.host == 'gate.lava.top'
+    assert request.headers['x-api-key'] == 'api-key'
+    for name, value in headers.items():
+        assert request.headers[name] == value
+    if 'idempotency-key' not in headers:
+        assert 'idempotency-key' not in request.headers
+
+
+async def _send_async(name, args, kwargs) -> httpx.Request:
+    async with LavaTop(api_key='api-key', base_url=BASE,
+                       transport=httpx.MockTransport(_capture)) as client:
+        with pytest.raises(Sent) as sent:
+            await getattr(client, name)(*args, **kwargs)
+    return sent.value.request
+
+
+def _send_sync(name, args, kwargs) -> httpx.Request:
+    with LavaTopSync(api_key='api-key', base_url=BASE,
+                     transport=httpx.MockTransport(_capture)) as client:
+        with pytest.raises(Sent) as sent:
+            getattr(client, name)(*args, **kwargs)
+    return sent.value.request
+
+
+def test_cases_cover_every_endpoint():
+    assert sorted(case[1] for case in CASES) == sorted(ENDPOINTS)
+
+
+@pytest.mark.parametrize('name, endpoint, args, kwargs, expected', CASES,
+                         ids=[case[0] for case in CASES])
+def test_async_request(name, endpoint, args, kwargs, expected):
+    _check(asyncio.run(_send_async(name, args, kwargs)), expected)
+
+
+@pytest.mark.parametrize('name, endpoint, args, kwargs, expected', CASES,
+                         ids=[case[0] for case in CASES])
+def test_sync_request(name, endpoint, args, kwargs, expected):
+    _check(_send_sync(name, args, kwargs), expected)
+
+
+@pytest.mark.parametrize('name, args, kwargs, expected', PAGE_CASES,
+                         ids=[case[0] for case in PAGE_CASES])
+def test_async_page_request(name, args, kwargs, expected):
+    _check(asyncio.run(_send_async(name, args, kwargs)), expected)
+
+
+def test_update_webhook_sends_only_given_fields():
+    request = _send_sync('update_webhook', ('w1',), {'url': 'https://new'})
+    assert json.loads(request.content) == {'url': 'https://new'}
+
+
+def test_bearer_and_basic_auth():
+    def send(**credentials) -> httpx.Request:
+        with LavaTopSync(base_url=BASE, transport=httpx.MockTransport(
+                _capture), **credentials) as client:
+            with pytest.raises(Sent) as sent:
+                client.get_donate_link()
+        return sent.value.request
+
+    assert send(token='t').headers['authorization'] == 'Bearer t'
+    assert send(username='u', password='p').headers['authorization'] == \
+        httpx.BasicAuth('u', 'p')._auth_header
@@ -0,0 +1,100 @@
+import csv
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from LavaTopPayment.export import DictColumn, ReportColumns, SalesColumns, \
+    iso_timestamp
+
+SALES = [
+    {'id': 's1', 'created': '2025-01-01T10:00:00Z', 'status': 'completed',
+     'amountTotal': {'amount': 100.0, 'currency': 'RUB'},
+     'buyer': {'email': 'a@example.com'}},
+    {'id': 's2', 'created': '2025-01-02T10:00:00+03:00', 'status': 'failed',
+     'amountTotal': {'amount': 5.5, 'currency': 'USD'}, 'buyer': None},
+    {'id': 's3', 'created': '2025-01-03T10:00:00', 'status': 'completed',
+     'amountTotal': {'amount': 100.0, 'currency': 'RUB'},
+     'buyer': {'email': 'a@example.com'}},
+]
+
+REPORTS = [
+    {'productId': 'p1', 'title': 'Course', 'status': 'active', 'sales': [
+        {'currency': 'RUB', 'count': 3, 'amountTotal': 300.0},
+        {'currency': 'USD', 'count': 1, 'amountTotal': 5.5},
+    ]},
+    {'productId': 'p2', 'title': 'Book', 'status': 'active', 'sales': []},
+]
+
+
+def _sales():
+    columns = SalesColumns()
+    columns.extend(SALES)
+    return columns
+
+
+def test_dict_column_stores_each_value_once():
+    column = DictColumn('B')
+    for value in ('RUB', 'USD', 'RUB', None, 'RUB'):
+        column.append(value)
+    assert list(column) == ['RUB', 'USD', 'RUB', None, 'RUB']
+    assert column.values == ['RUB', 'USD', None]
+    assert list(column.codes) == [0, 1, 0, 2, 0] and len(column) == 5
+
+
+def test_iso_timestamp_defaults_to_utc():
+    assert iso_timestamp('2025-01-01T00:00:00') == \
+        iso_timestamp('2025-01-01T00:00:00Z') == \
+        datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert iso_timestamp('2025-01-01T03:00:00+03:00') == \
+        iso_timestamp('2025-01-01T00:00:00Z')
+
+
+def test_sales_csv():
+    output = io.StringIO()
+    _sales().write_csv(output)
+    rows = list(csv.reader(io.StringIO(output.getvalue())))
+    assert rows[0] == list(SalesColumns.columns)
+    assert rows[1] == ['s1', '2025-01-01T10:00:00+00:00', 'completed',
+                       '100.0', 'RUB', 'a@example.com']
+    assert rows[2][1] == '2025-01-02T07:00:00+00:00'
+    assert rows[2][5] == '' and len(rows) == 4
+
+
+def test_report_columns_flatten_sales():
+    columns = ReportColumns()
+    columns.extend(REPORTS)
+    output = io.StringIO()
+    columns.write_csv(output)
+    rows = list(csv.reader(io.StringIO(output.getvalue())))
+    assert len(columns) == 2
+    assert rows[1:] == [['p1', 'Course', 'active', 'RUB', '3', '300.0'],
+                        ['p1', 'Course', 'active', 'USD', '1', '5.5']]
+
+
+def test_sales_numpy():
+    numpy = pytest.importorskip('numpy')
+    arrays = _sales().to_numpy()
+    assert arrays['created'].dtype == numpy.dtype('datetime64[us]')
+    assert str(arrays['created'][0]) == '2025-01-01T10:00:00.000000'
+    assert arrays['amount'].tolist() == [100.0, 5.5, 100.0]
+    assert arrays['email'].tolist() == ['a@example.com', None,
+                                        'a@example.com']
+    assert arrays['id'].tolist() == ['s1', 's2', 's3']
+
+
+def test_sales_arrow_and_parquet(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    pytest.importorskip('pyarrow.parquet')
+    table = _sales().to_arrow()
+    assert table.column_names == list(SalesColumns.columns)
+    assert table.schema.field('created').type == \
+        pyarrow.timestamp('us', tz='UTC')
+    assert pyarrow.types.is_dictionary(table.schema.field('status').type)
+    assert table.column('currency').to_pylist() == ['RUB', 'USD', 'RUB']
+    assert table.column('email').to_pylist() == ['a@example.com', None,
+                                                 'a@example.com']
+    path = str(tmp_path / 'sales.parquet')
+    _sales().write_parquet(path)
+    assert pyarrow.parquet.read_table(path).column('id').to_pylist() == \
+        ['s1', 's2', 's3']
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+
+import pytest
+
+# Бюджеты медианы холодного импорта, мс: замеренная медиана
+# (package 0.5, webhook_event 120-150, client 340-420; httpx и pydantic
+# вместе - около 250) и запас около 1.5 раза. Возврат к загрузке
+# моделей или модулей возможностей при импорте их превышает
+BUDGETS = {
+    'package': 5,
+    'webhook_event': 200,
+    'client': 550,
+}
+
+# Модули возможностей, которые импорт клиента не должен загружать
+FEATURE_MODULES = (
+    'LavaTopPayment.aggregation', 'LavaTopPayment.batch',
+    'LavaTopPayment.cache', 'LavaTopPayment.disk_cache',
+    'LavaTopPayment.export', 'LavaTopPayment.instrumentation',
+    'LavaTopPayment.records', 'sqlite3', 'csv',
+)
+
+
+def _loaded(statement: str) -> set:
+    output = subprocess.run(
+        [sys.executable, '-c',
+         f'import sys\n{statement}\nprint("\\n".join(sys.modules))'],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return set(output.split())
+
+
+def test_budget():
+    budgets = [f'--budget={name}={limit}' for name, limit in BUDGETS.items()]
+    result = subprocess.run(
+        [sys.executable, '-m', 'LavaTopPayment.benchmarks.import_time',
+         '--runs', '5', *budgets, *BUDGETS],
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_package_import_loads_nothing():
+    loaded = _loaded('import LavaTopPayment')
+    assert 'httpx' not in loaded
+    assert 'pydantic' not in loaded
+
+
+@pytest.mark.parametrize('statement', [
+    'from LavaTopPayment import LavaTop',
+    'from LavaTopPayment import LavaTopSync',
+])
+def test_client_import_skips_feature_modules(statement):
+    loaded = _loaded(statement)
+    assert not loaded.intersection(FEATURE_MODULES)
+
+
+def test_features_load_on_use():
+    loaded = _loaded(
+        'from LavaTopPayment import LavaTop\n'
+        'LavaTop(api_key="key").create_invoices([])'
+    )
+    assert 'LavaTopPayment.batch' in loaded
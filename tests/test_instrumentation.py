@@ -0,0 +1,143 @@
+import asyncio
+
+import httpx
+import pytest
+
+from LavaTopPayment.instrumentation import Instrumentation, \
+    MetricsCollector, MultiInstrumentation
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.lava_top_sync import LavaTopSync
+from LavaTopPayment.retry import RetryPolicy
+
+
+class Recorder(Instrumentation):
+    def __init__(self):
+        self.calls = []
+
+    def on_request(self, event):
+        self.calls.append(('request', event.attempt))
+
+    def on_response(self, event):
+        self.calls.append(('response', event.status))
+
+    def on_retry(self, event):
+        self.calls.append(('retry', event.retry_delay))
+
+    def on_complete(self, event):
+        self.calls.append(('complete', event.status))
+
+    def on_error(self, event):
+        self.calls.append(('error', type(event.error).__name__))
+
+
+def _gateway(*replies):
+    replies = list(replies)
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        reply = replies.pop(0) if replies else 200
+        if isinstance(reply, Exception):
+            raise reply
+        if isinstance(reply, bytes):
+            return httpx.Response(200, content=reply)
+        return httpx.Response(reply, headers={'Retry-After': '0'},
+                              json={'url': 'https://lava.top/d'})
+
+    return httpx.MockTransport(handle)
+
+
+def _async(transport, instrumentation, call=None):
+    async def main():
+        async with LavaTop(transport=transport,
+                           instrumentation=instrumentation,
+                           retry=RetryPolicy(max_retries=2, backoff=0)
+                           ) as client:
+            try:
+                await (call or LavaTop.get_donate_link)(client)
+            except (httpx.HTTPError, ValueError) as error:
+                return error
+
+    return asyncio.run(main())
+
+
+def _sync(transport, instrumentation):
+    with LavaTopSync(transport=transport, instrumentation=instrumentation,
+                     retry=RetryPolicy(max_retries=2, backoff=0)) as client:
+        try:
+            client.get_donate_link()
+        except (httpx.HTTPError, ValueError) as error:
+            return error
+
+
+RETRIED = [('request', 0), ('response', 503), ('retry', 0.0),
+           ('request', 1), ('response', 200), ('complete', 200)]
+
+
+@pytest.mark.parametrize('run', [_async, _sync])
+def test_hook_order_across_retries(run):
+    recorder = Recorder()
+    metrics = MetricsCollector()
+    run(_gateway(503), [recorder, metrics])
+    assert recorder.calls == RETRIED
+    endpoint = metrics.endpoints['get_donate_link']
+    assert (endpoint.calls, endpoint.attempts, endpoint.retries,
+            endpoint.errors) == (1, 2, 1, 0)
+    assert endpoint.statuses == {503: 1, 200: 1}
+    assert (endpoint.network.count, endpoint.decode.count) == (2, 1)
+    assert endpoint.response_bytes > 0
+
+
+@pytest.mark.parametrize('run', [_async, _sync])
+def test_final_error_status(run):
+    recorder = Recorder()
+    metrics = MetricsCollector()
+    error = run(_gateway(404), [recorder, metrics])
+    assert error.response.status_code == 404
+    assert recorder.calls == [('request', 0), ('response', 404),
+                              ('error', 'HTTPStatusError')]
+    endpoint = metrics.endpoints['get_donate_link']
+    assert (endpoint.calls, endpoint.errors, endpoint.decode.count) == \
+        (1, 1, 0)
+
+
+@pytest.mark.parametrize('run', [_async, _sync])
+def test_connection_error_after_retries(run):
+    recorder = Recorder()
+    refused = httpx.ConnectError('refused')
+    run(_gateway(refused, refused, refused), recorder)
+    assert recorder.calls == [
+        ('request', 0), ('retry', 0.0), ('request', 1), ('retry', 0.0),
+        ('request', 2), ('error', 'ConnectError'),
+    ]
+
+
+@pytest.mark.parametrize('run', [_async, _sync])
+def test_invalid_body_is_reported_once(run):
+    recorder = Recorder()
+    metrics = MetricsCollector()
+    run(_gateway(b'{"url": '), [recorder, metrics])
+    assert recorder.calls == [('request', 0), ('response', 200),
+                              ('error', 'ValidationError')]
+    endpoint = metrics.endpoints['get_donate_link']
+    assert endpoint.errors == 1 and endpoint.decode.count == 0
+    assert endpoint.decode.total == 0.0
+
+
+def test_request_outside_endpoint_completes_itself():
+    recorder = Recorder()
+    metrics = MetricsCollector()
+
+    async def call(client):
+        await client._request('GET', 'https://gate.lava.top/api/v1/donate')
+
+    _async(_gateway(), MultiInstrumentation(recorder, metrics), call)
+    assert recorder.calls == [('request', 0), ('response', 200),
+                              ('complete', 200)]
+    assert list(metrics.endpoints) == ['GET']
+
+
+def test_reset_clears_metrics():
+    metrics = MetricsCollector()
+    _async(_gateway(), metrics)
+    assert metrics.endpoints
+    metrics.reset()
+    assert metrics.endpoints == {}
@@ -0,0 +1,41 @@
+import asyncio
+
+from LavaTopPayment.benchmarks.mock_gateway import MockGateway, product_id
+from LavaTopPayment.emulator import GatewayEmulator
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.lava_top_sync import LavaTopSync
+from LavaTopPayment.models.types import Currency
+
+
+def test_mock_gateway_is_an_emulator():
+    gateway = MockGateway(products=3, sales=0)
+    assert isinstance(gateway, GatewayEmulator)
+    assert list(gateway.products) == [product_id(i) for i in range(3)]
+
+
+def test_contracts_come_from_the_emulator():
+    async def main():
+        gateway = MockGateway(products=2, sales=0)
+        async with LavaTop(api_key='key',
+                           transport=gateway.transport()) as client:
+            invoice = await client.create_invoice(
+                'buyer@example.com', gateway.offer_id(1), Currency.USD)
+            found = await client.get_product_by_id(invoice.id)
+        return invoice, found, gateway.requests
+
+    invoice, found, requests = asyncio.run(main())
+    assert found.id == invoice.id
+    assert invoice.amountTotal.currency == Currency.USD
+    assert requests == 2
+
+
+def test_sync_transport_serves_reports():
+    gateway = MockGateway(products=5, products_page_size=2, sales=45)
+    with LavaTopSync(api_key='key',
+                     transport=gateway.sync_transport()) as client:
+        products = [product.id for product in client.iter_products()]
+        sales = client.get_sales_by_product(product_id(0), size=20, page=2)
+        history = client.get_webhook_history(size=10)
+    assert products == [product_id(i) for i in range(5)]
+    assert [len(sales.items), sales.total] == [5, 45]
+    assert len(history.items) == 10
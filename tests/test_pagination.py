@@ -0,0 +1,184 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from LavaTopPayment.benchmarks.mock_gateway import MockGateway, product_id, \
+    sale_payload
+from LavaTopPayment.endpoints import next_page_url
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.lava_top_sync import LavaTopSync
+from LavaTopPayment.pagination import iter_cursor, iter_items, iter_pages, \
+    total_pages_of
+
+
+def _products_page(next_page):
+    return {'items': [], 'nextPage': next_page}
+
+
+def test_next_page_url_relative_and_same_origin():
+    base = 'https://gate.lava.top'
+    assert next_page_url(base, '/api/v2/products?page=2') == \
+        'https://gate.lava.top/api/v2/products?page=2'
+    assert next_page_url(base, base + '/api/v2/products?page=2') == \
+        'https://gate.lava.top/api/v2/products?page=2'
+
+
+@pytest.mark.parametrize('link', [
+    'https://evil.example/api/v2/products',
+    '//evil.example/api/v2/products',
+    'http://gate.lava.top/api/v2/products',
+    'https://gate.lava.top:8443/api/v2/products',
+])
+def test_next_page_url_rejects_other_origin(link):
+    with pytest.raises(ValueError):
+        next_page_url('https://gate.lava.top', link)
+
+
+def test_foreign_next_page_is_not_requested():
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        return httpx.Response(200, json=_products_page(
+            'https://evil.example/api/v2/products?page=1'
+        ))
+
+    async def main():
+        async with LavaTop(api_key='key',
+                           transport=httpx.MockTransport(handler)) as client:
+            page = await client.get_products()
+            with pytest.raises(ValueError):
+                await client.get_products(next_page=page.nextPage)
+
+    asyncio.run(main())
+    with LavaTopSync(api_key='key',
+                     transport=httpx.MockTransport(handler)) as client:
+        page = client.get_products()
+        with pytest.raises(ValueError):
+            client.get_products(next_page=page.nextPage)
+    assert hosts == ['gate.lava.top', 'gate.lava.top']
+
+
+class Pages:
+    """
+    Страницы по номеру со случайной задержкой; считает загрузки
+    в работе и максимум одновременных.
+    """
+
+    def __init__(self, count, size=3, total_pages=True, empty=()):
+        self.count = count
+        self.size = size
+        self.total_pages = total_pages
+        self.empty = set(empty)
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = 0
+
+    async def __call__(self, page):
+        page = 0 if page is None else page
+        self.requested.append(page)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Поздние страницы приходят раньше ранних
+            await asyncio.sleep(0.001 * ((self.count - page) % 4))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        items = [] if page in self.empty else \
+            [page * self.size + i for i in range(self.size)]
+        data = {'items': items, 'page': page, 'size': self.size,
+                'total': self.count * self.size}
+        if self.total_pages:
+            data['totalPages'] = self.count
+        return SimpleNamespace(**data)
+
+
+def _collect(iterator, limit=None):
+    async def main():
+        items = []
+        try:
+            async for item in iterator:
+                items.append(item)
+                if len(items) == limit:
+                    break
+        finally:
+            await iterator.aclose()
+        return items
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('prefetch', [1, 3, 8])
+def test_pages_come_in_order_within_the_window(prefetch):
+    pages = Pages(10)
+    items = _collect(iter_items(pages, prefetch=prefetch))
+    assert items == list(range(30))
+    assert sorted(pages.requested) == list(range(10))
+    assert pages.max_in_flight == min(prefetch, 9)
+
+
+def test_total_pages_from_total_and_size():
+    pages = Pages(4, total_pages=False)
+    assert _collect(iter_items(pages)) == list(range(12))
+    assert total_pages_of(SimpleNamespace(total=7, size=3)) == 3
+    assert total_pages_of(SimpleNamespace(total=0, size=0)) == 1
+
+
+def test_empty_first_page_stops():
+    pages = Pages(5, empty={0})
+    assert [page.items for page in _collect(iter_pages(pages))] == [[]]
+    assert pages.requested == [0]
+
+
+def test_empty_page_ends_the_walk():
+    pages = Pages(10, empty={3})
+    assert _collect(iter_items(pages, prefetch=2)) == list(range(9))
+    assert max(pages.requested) <= 5
+
+
+def test_early_stop_cancels_prefetched_pages():
+    pages = Pages(50)
+    assert _collect(iter_items(pages, prefetch=4), limit=4) == [0, 1, 2, 3]
+    assert len(pages.requested) <= 1 + 4 + 4
+    assert pages.in_flight == 0
+    assert pages.cancelled > 0
+
+
+def test_cursor_loads_one_page_ahead():
+    loaded = []
+
+    async def fetch(link):
+        page = int(link or 0)
+        loaded.append(page)
+        return SimpleNamespace(items=[page], nextPage=str(page + 1)
+                               if page < 9 else None)
+
+    async def main():
+        seen = []
+        async for item in iter_cursor(fetch):
+            # Загружено не больше чем на страницу вперёд
+            assert len(loaded) <= item + 2
+            seen.append(item)
+        return seen
+
+    assert asyncio.run(main()) == list(range(10))
+
+
+def test_client_streams_every_sale_in_order():
+    gateway = MockGateway(products=1, sales=95)
+
+    async def main():
+        async with LavaTop(api_key='key',
+                           transport=gateway.transport()) as client:
+            return [sale.id async for sale in client.iter_sales_by_product(
+                product_id(0), size=10, prefetch=3)]
+
+    ids = asyncio.run(main())
+    assert ids == [sale_payload(product_id(0), i)['id'] for i in range(95)]
+    assert gateway.requests == 10
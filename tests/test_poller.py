@@ -0,0 +1,137 @@
+import asyncio
+
+from LavaTopPayment.models.products import Invoice
+from LavaTopPayment.models.types import ContractStatusDto
+from LavaTopPayment.poller import InvoicePoller, _Tracked
+
+NEW = ContractStatusDto.NEW
+IN_PROGRESS = ContractStatusDto.IN_PROGRESS
+COMPLETED = ContractStatusDto.COMPLETED
+
+
+class Contracts:
+    """Клиент с заданной последовательностью статусов по контрактам"""
+
+    def __init__(self, statuses, errors=0):
+        self.statuses = {key: list(value) for key, value in statuses.items()}
+        self.errors = errors
+        self.requests = 0
+
+    async def get_product_by_id(self, invoice_id):
+        self.requests += 1
+        if self.errors:
+            self.errors -= 1
+            raise RuntimeError('404')
+        statuses = self.statuses[invoice_id]
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        return Invoice(id=invoice_id, status=status,
+                       amountTotal={'currency': 'RUB', 'amount': 100})
+
+
+def _poller(client, **kwargs):
+    kwargs.setdefault('rate', 1000)
+    return InvoicePoller(client, min_interval=0.01, max_interval=0.2,
+                         jitter=0, **kwargs)
+
+
+def test_interval_grows_with_age_and_backs_off_on_errors():
+    now = [100.0]
+
+    async def main():
+        poller = InvoicePoller(Contracts({}), min_interval=2, max_interval=60,
+                               age_factor=0.1, jitter=0,
+                               clock=lambda: now[0])
+        entry = _Tracked(NEW, 0.0, 0)
+        aged = poller._interval(entry, 100.0), poller._interval(entry, 1e6)
+        young = poller._interval(_Tracked(NEW, 99.0, 0), 100.0)
+        active = poller._interval(_Tracked(IN_PROGRESS, 0.0, 0), 100.0)
+        entry = _Tracked(IN_PROGRESS, 100.0, 0)
+        backoff = []
+        for errors in (1, 2, 3, 100):
+            entry.errors = errors
+            backoff.append(poller._interval(entry, 100.0))
+        return aged, young, active, backoff
+
+    aged, young, active, backoff = asyncio.run(main())
+    assert aged == (10.0, 60)
+    assert (young, active) == (2, 2)
+    assert backoff == [4, 8, 16, 60]
+
+
+def test_wait_returns_final_invoice_and_stops_tracking():
+    async def main():
+        client = Contracts({'i1': [NEW, IN_PROGRESS, COMPLETED]})
+        async with _poller(client) as poller:
+            poller.track('i1', NEW)
+            invoice = await asyncio.wait_for(poller.wait('i1'), 2)
+            changes = [poller.changes.get_nowait()
+                       for _ in range(poller.changes.qsize())]
+            requests = client.requests
+            await asyncio.sleep(0.05)
+            return invoice, changes, 'i1' in poller, \
+                client.requests - requests
+
+    invoice, changes, tracked, extra = asyncio.run(main())
+    assert invoice.status == COMPLETED
+    assert [(change.old_status, change.new_status) for change in changes] == \
+        [(NEW, IN_PROGRESS), (IN_PROGRESS, COMPLETED)]
+    assert changes[-1].final and not changes[0].final
+    assert not tracked and extra == 0
+
+
+def test_terminal_status_is_not_tracked():
+    async def main():
+        poller = _poller(Contracts({}))
+        poller.track('i1', COMPLETED)
+        return len(poller)
+
+    assert asyncio.run(main()) == 0
+
+
+def test_callback_receives_changes_instead_of_queue():
+    async def main():
+        received = []
+
+        async def on_change(change):
+            received.append(change.new_status)
+
+        client = Contracts({'i1': [IN_PROGRESS, COMPLETED]})
+        async with _poller(client, on_change=on_change) as poller:
+            poller.track('i1', NEW)
+            await asyncio.wait_for(poller.wait('i1'), 2)
+            return received, poller.changes
+
+    assert asyncio.run(main()) == ([IN_PROGRESS, COMPLETED], None)
+
+
+def test_raising_callback_does_not_stop_polling():
+    async def main():
+        def on_change(change):
+            raise ValueError(change.new_status)
+
+        client = Contracts({'i1': [IN_PROGRESS, IN_PROGRESS, COMPLETED]})
+        async with _poller(client, on_change=on_change) as poller:
+            poller.track('i1', NEW)
+            invoice = await asyncio.wait_for(poller.wait('i1'), 2)
+            return invoice.status, poller.stats
+
+    status, stats = asyncio.run(main())
+    assert status == COMPLETED
+    assert stats.callback_errors == 2 and stats.changes == 2
+    assert isinstance(stats.last_callback_error, ValueError)
+
+
+def test_errors_back_off_until_request_succeeds():
+    async def main():
+        client = Contracts({'i1': [COMPLETED]}, errors=3)
+        async with _poller(client) as poller:
+            poller.track('i1', IN_PROGRESS)
+            await asyncio.sleep(0.05)
+            # 0.01 + 0.02 + 0.04: третья ошибка ещё не случилась
+            errors = poller.stats.errors
+            invoice = await asyncio.wait_for(poller.wait('i1'), 2)
+            return errors, poller.stats.errors, invoice.status
+
+    early, errors, status = asyncio.run(main())
+    assert early < 3
+    assert (errors, status) == (3, COMPLETED)
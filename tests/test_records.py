@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from LavaTopPayment.models.reports import PartnerSaleDetailsDto
+from LavaTopPayment.models.types import ContractStatusDto, Currency
+from LavaTopPayment.models.webhooks import WebhookDeliveryResponse
+from LavaTopPayment.records import DeliveryRecord, RecordPool, SaleRecord, \
+    parse_datetime
+
+SALE = {
+    'id': 's1',
+    'created': '2025-01-01T10:00:00.123456Z',
+    'status': 'completed',
+    'amountTotal': {'amount': 99.9, 'currency': 'EUR'},
+    'buyer': {'email': 'buyer@example.com'},
+}
+
+DELIVERIES = [
+    {'id': 'd1', 'webhookId': 'w1', 'isDelivered': True,
+     'deliveredAt': '2025-01-01T10:00:01+03:00',
+     'lastDeliveryAttemptAt': '2025-01-01T10:00:01+03:00',
+     'responseStatus': 200, 'createdAt': '2025-01-01T10:00:00+03:00'},
+    {'id': 'd2', 'webhookId': 'w1', 'isDelivered': False,
+     'deliveredAt': None, 'lastDeliveryAttemptAt': None,
+     'responseStatus': None, 'createdAt': '2025-01-02T10:00:00'},
+]
+
+
+def test_parse_datetime_matches_pydantic():
+    for value in (SALE['created'], '2025-01-01T10:00:00',
+                  '2025-01-01T10:00:00+03:00', '2025-01-01'):
+        model = PartnerSaleDetailsDto.model_validate(
+            {**SALE, 'created': value})
+        assert parse_datetime(value) == model.created
+    # Не ISO формат разбирается через pydantic
+    assert parse_datetime('1735725600') == \
+        datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+
+
+def test_sale_round_trip_is_lossless():
+    pool = RecordPool()
+    record = SaleRecord.from_dict(SALE, pool)
+    model = PartnerSaleDetailsDto.model_validate(SALE)
+    assert record.to_model() == model
+    assert SaleRecord.from_model(model, pool) == record
+    assert SaleRecord.from_model(record.to_model(), pool).to_model() == model
+    assert record.created == model.created
+    assert (record.status, record.amountTotal.currency) == \
+        (ContractStatusDto.COMPLETED, Currency.EUR)
+
+
+def test_delivery_round_trip_is_lossless():
+    pool = RecordPool()
+    for data in DELIVERIES:
+        record = DeliveryRecord.from_dict(data, pool)
+        model = WebhookDeliveryResponse.model_validate(data)
+        assert record.to_model() == model
+        assert DeliveryRecord.from_model(model, pool) == record
+        assert (record.deliveredAt, record.createdAt) == \
+            (model.deliveredAt, model.createdAt)
+
+
+def test_pool_shares_values():
+    pool = RecordPool()
+    first = SaleRecord.from_dict(SALE, pool)
+    second = SaleRecord.from_dict({**SALE, 'id': 's2'}, pool)
+    assert first.buyer is second.buyer
+    assert first.amountTotal is second.amountTotal
+    deliveries = [DeliveryRecord.from_dict(data, pool) for data in DELIVERIES]
+    assert deliveries[0].webhookId is deliveries[1].webhookId
+    assert len(pool) == 3
+
+
+def test_invalid_values_fail_like_the_model():
+    pool = RecordPool()
+    with pytest.raises(ValueError):
+        SaleRecord.from_dict({**SALE, 'status': 'unknown'}, pool)
+    with pytest.raises(ValueError):
+        SaleRecord.from_dict(
+            {**SALE, 'amountTotal': {'amount': 1, 'currency': 'XXX'}}, pool)
@@ -0,0 +1,199 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.lava_top_sync import LavaTopSync
+from LavaTopPayment.limits import RateLimiter
+from LavaTopPayment.models.types import Currency
+from LavaTopPayment.retry import RetryPolicy, parse_retry_after
+
+POLICY = RetryPolicy(max_retries=3, backoff=0.5, max_backoff=3.0,
+                     jitter=False)
+
+
+def _response(status, **headers) -> httpx.Response:
+    return httpx.Response(status, headers=headers)
+
+
+def test_backoff_doubles_up_to_the_cap():
+    assert [POLICY.backoff_delay(attempt) for attempt in range(5)] == \
+        [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_jitter_stays_within_the_backoff():
+    policy = RetryPolicy(backoff=1.0, max_backoff=4.0)
+    delays = [policy.backoff_delay(3) for _ in range(200)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.parametrize('status, idempotent, expected', [
+    (429, False, 0.5),
+    (429, True, 0.5),
+    (503, True, 0.5),
+    (503, False, None),
+    (501, True, None),
+    (404, True, None),
+    (200, True, None),
+])
+def test_which_responses_are_retried(status, idempotent, expected):
+    assert POLICY.delay_for_response(_response(status), 0, idempotent) == \
+        expected
+
+
+def test_retry_after_wins_and_is_capped():
+    assert POLICY.delay_for_response(
+        _response(429, **{'Retry-After': '2'}), 0, False) == 2.0
+    assert POLICY.delay_for_response(
+        _response(503, **{'Retry-After': '120'}), 0, True) == 3.0
+
+
+def test_no_retry_after_max_retries():
+    assert POLICY.delay_for_response(_response(429), 2, True) == 2.0
+    assert POLICY.delay_for_response(_response(429), 3, True) is None
+    assert POLICY.delay_for_error(httpx.ConnectError('x'), 3, True) is None
+
+
+def test_which_errors_are_retried():
+    connect = httpx.ConnectError('refused')
+    read = httpx.ReadTimeout('slow')
+    assert POLICY.delay_for_error(connect, 0, False) == 0.5
+    assert POLICY.delay_for_error(httpx.PoolTimeout('pool'), 1, False) == 1.0
+    assert POLICY.delay_for_error(read, 0, False) is None
+    assert POLICY.delay_for_error(read, 0, True) == 0.5
+
+
+def test_parse_retry_after():
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert parse_retry_after('5') == 5.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after('') is None
+    assert parse_retry_after('soon') is None
+    assert 25 < parse_retry_after(format_datetime(later, usegmt=True)) <= 30
+    assert parse_retry_after('Mon, 01 Jan 2001 00:00:00 GMT') == 0.0
+
+
+class Gateway:
+    """Отвечает заданными статусами по очереди, затем 200"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        reply = self.replies.pop(0) if self.replies else 200
+        if isinstance(reply, Exception):
+            raise reply
+        return httpx.Response(reply, headers={'Retry-After': '0'}, json={
+            'url': 'https://lava.top/d', 'id': 'i', 'status': 'new',
+            'amountTotal': {'amount': 1.0, 'currency': 'RUB'},
+        })
+
+
+def _run(gateway, call, max_retries=3):
+    async def main():
+        async with LavaTop(api_key='key', transport=httpx.MockTransport(
+                gateway), retry=RetryPolicy(max_retries, backoff=0)) as client:
+            try:
+                return await call(client), client.stats
+            except httpx.HTTPError as error:
+                return error, client.stats
+
+    return asyncio.run(main())
+
+
+def _invoice(client):
+    return client.create_invoice('buyer@example.com', 'offer', Currency.RUB)
+
+
+def test_get_is_retried_on_5xx():
+    gateway = Gateway(503, 502)
+    result, stats = _run(gateway, lambda client: client.get_donate_link())
+    assert result.url == 'https://lava.top/d'
+    assert (gateway.requests, stats.retries) == (3, 2)
+
+
+def test_post_is_not_retried_on_5xx():
+    gateway = Gateway(503)
+    result, stats = _run(gateway, _invoice)
+    assert isinstance(result, httpx.HTTPStatusError)
+    assert (gateway.requests, stats.retries) == (1, 0)
+
+
+def test_post_is_retried_on_429_and_connect_error():
+    gateway = Gateway(429, httpx.ConnectError('refused'))
+    result, stats = _run(gateway, _invoice)
+    assert result.id == 'i'
+    assert (gateway.requests, stats.retries, stats.rate_limited) == (3, 2, 1)
+
+
+def test_gives_up_after_max_retries():
+    gateway = Gateway(503, 503, 503)
+    result, stats = _run(gateway, lambda client: client.get_donate_link(),
+                         max_retries=2)
+    assert result.response.status_code == 503
+    assert (gateway.requests, stats.retries) == (3, 2)
+
+
+def _run_sync(gateway, call, max_retries=3):
+    with LavaTopSync(api_key='key', transport=httpx.MockTransport(gateway),
+                     retry=RetryPolicy(max_retries, backoff=0)) as client:
+        try:
+            return call(client), client.stats
+        except httpx.HTTPError as error:
+            return error, client.stats
+
+
+def test_sync_follows_the_same_rules():
+    gateway = Gateway(503, 502)
+    result, stats = _run_sync(gateway, lambda client: client.get_donate_link())
+    assert result.url == 'https://lava.top/d'
+    assert (gateway.requests, stats.retries) == (3, 2)
+
+    gateway = Gateway(503)
+    result, stats = _run_sync(gateway, _invoice)
+    assert result.response.status_code == 503
+    assert (gateway.requests, stats.retries) == (1, 0)
+
+    gateway = Gateway(429, httpx.ConnectError('refused'))
+    result, stats = _run_sync(gateway, _invoice)
+    assert result.id == 'i'
+    assert (gateway.requests, stats.retries, stats.rate_limited) == (3, 2, 1)
+
+    gateway = Gateway(503)
+    result, stats = _run_sync(gateway, lambda client: client.create_invoice(
+        'buyer@example.com', 'offer', Currency.RUB, idempotency_key='k'))
+    assert (result.id, gateway.requests) == ('i', 2)
+
+
+def test_sync_waits_retry_after(monkeypatch):
+    delays = []
+    monkeypatch.setattr('LavaTopPayment.lava_top_sync.time.sleep',
+                        delays.append)
+    replies = [429, 503]
+
+    def gateway(request: httpx.Request) -> httpx.Response:
+        if replies:
+            return httpx.Response(replies.pop(0),
+                                  headers={'Retry-After': '2'})
+        return httpx.Response(200, json={'url': 'https://lava.top/d'})
+
+    with LavaTopSync(transport=httpx.MockTransport(gateway),
+                     retry=RetryPolicy(max_backoff=5.0)) as client:
+        client.get_donate_link()
+    assert delays == [2.0, 2.0]
+
+
+def test_rate_limiter_allows_burst_then_waits():
+    async def main():
+        limiter = RateLimiter(rate=50, burst=2)
+        return [await limiter.acquire() for _ in range(3)]
+
+    first, second, third = asyncio.run(main())
+    assert first == second == 0.0
+    assert third == pytest.approx(0.02, abs=0.005)
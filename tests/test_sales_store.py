@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from LavaTopPayment.sales_store import SalesStore, SalesSync
+
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def _sale(number, day, status='completed'):
+    return {
+        'id': f's{number}',
+        'created': (START + timedelta(days=day)).isoformat(),
+        'status': status,
+        'amountTotal': {'amount': 10.0 * number, 'currency': 'RUB'},
+        'buyer': {'email': f'buyer{number}@example.com'},
+    }
+
+
+class Sales:
+    """Клиент с продажами продукта: отдаёт те, что не старше from_date"""
+
+    def __init__(self, sales):
+        self.sales = sales
+        self.windows = []
+
+    async def iter_sales_by_product_pages(self, product_id, size=None,
+                                          from_date=None, prefetch=None):
+        self.windows.append(from_date)
+        items = [sale for sale in self.sales
+                 if from_date is None
+                 or datetime.fromisoformat(sale['created']) >= from_date]
+        for start in range(0, len(items), size):
+            yield SimpleNamespace(items=items[start:start + size])
+
+
+def test_upsert_is_idempotent_and_updates_status():
+    with SalesStore(':memory:') as store:
+        sales = [_sale(1, 0), _sale(2, 1, 'new')]
+        store.upsert('p1', sales)
+        store.upsert('p1', sales)
+        store.upsert('p1', [_sale(2, 1, 'completed')])
+        stored = store.query(product_id='p1')
+        count = store.count(status='completed')
+    assert [sale.id for sale in stored] == ['s1', 's2']
+    assert stored[1].created == START + timedelta(days=1)
+    assert (stored[1].status, stored[1].email) == \
+        ('completed', 'buyer2@example.com')
+    assert count == 2
+
+
+def test_checkpoint_only_moves_forward():
+    with SalesStore(':memory:') as store:
+        store.set_checkpoint('p1', START + timedelta(days=5))
+        store.set_checkpoint('p1', START + timedelta(days=2))
+        checkpoint = store.get_checkpoint('p1')
+        store.reset('p1')
+        reset = store.get_checkpoint('p1')
+    assert checkpoint == START + timedelta(days=5)
+    assert reset is None
+
+
+def test_sync_advances_checkpoint_and_refetches_overlap():
+    async def main():
+        client = Sales([_sale(1, 0), _sale(2, 4, 'new'), _sale(3, 9)])
+        with SalesStore(':memory:') as store:
+            sync = SalesSync(client, store, overlap=timedelta(days=6),
+                             page_size=2)
+            first = await sync.sync_product('p1')
+            # Поздняя смена статуса недавней продажи и новая продажа
+            client.sales[1] = _sale(2, 4, 'completed')
+            client.sales.append(_sale(4, 12))
+            second = await sync.sync_product('p1')
+            stored = {sale.id: sale.status for sale in store.query()}
+        return client.windows, first, second, stored
+
+    windows, first, second, stored = asyncio.run(main())
+    assert windows == [None, START + timedelta(days=3)]
+    assert (first.fetched, first.high_water) == \
+        (3, START + timedelta(days=9))
+    # Окно второго прохода: продажи 2, 3 и 4
+    assert (second.fetched, second.high_water) == \
+        (3, START + timedelta(days=12))
+    assert stored == {'s1': 'completed', 's2': 'completed',
+                      's3': 'completed', 's4': 'completed'}
+
+
+def test_sync_without_sales_keeps_no_checkpoint():
+    async def main():
+        with SalesStore(':memory:') as store:
+            result = await SalesSync(Sales([]), store).sync(['p1', 'p2'])
+            return result, store.get_checkpoint('p1')
+
+    results, checkpoint = asyncio.run(main())
+    assert [result.fetched for result in results] == [0, 0]
+    assert checkpoint is None
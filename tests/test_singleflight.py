@@ -0,0 +1,146 @@
+import asyncio
+
+import httpx
+import pytest
+
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.singleflight import SingleFlight
+
+
+class Calls:
+    """Фабрика вызовов, ждущих release; считает запуски и отмены"""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    def __call__(self, value='result', error=None):
+        async def call():
+            self.started += 1
+            try:
+                await self.release.wait()
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            if error is not None:
+                raise error
+            return value
+
+        return call
+
+
+def test_concurrent_calls_share_one_flight():
+    async def main():
+        flight = SingleFlight()
+        calls = Calls()
+        waiters = [asyncio.ensure_future(flight.do('key', calls()))
+                   for _ in range(5)]
+        other = asyncio.ensure_future(flight.do('other', calls('other')))
+        await asyncio.sleep(0)
+        in_flight = len(flight)
+        calls.release.set()
+        return await asyncio.gather(*waiters, other), calls.started, \
+            in_flight, len(flight)
+
+    results, started, in_flight, left = asyncio.run(main())
+    assert results == ['result'] * 5 + ['other']
+    assert (started, in_flight, left) == (2, 2, 0)
+
+
+def test_cancelling_one_waiter_keeps_the_call():
+    async def main():
+        flight = SingleFlight()
+        calls = Calls()
+        first = asyncio.ensure_future(flight.do('key', calls()))
+        second = asyncio.ensure_future(flight.do('key', calls()))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        calls.release.set()
+        return first.cancelled(), await second, calls.cancelled
+
+    assert asyncio.run(main()) == (True, 'result', 0)
+
+
+def test_cancelling_all_waiters_cancels_the_call():
+    async def main():
+        flight = SingleFlight()
+        calls = Calls()
+        waiters = [asyncio.ensure_future(flight.do('key', calls()))
+                   for _ in range(3)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        forgotten = len(flight)
+        # Новый вызов с тем же ключом не получает отменённый
+        calls.release.set()
+        result = await flight.do('key', calls('again'))
+        return forgotten, calls.cancelled, calls.started, result
+
+    assert asyncio.run(main()) == (0, 1, 2, 'again')
+
+
+def test_error_reaches_every_waiter():
+    async def main():
+        flight = SingleFlight()
+        calls = Calls()
+        waiters = [asyncio.ensure_future(
+            flight.do('key', calls(error=ValueError('boom'))))
+            for _ in range(3)]
+        await asyncio.sleep(0)
+        calls.release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True), \
+            len(flight)
+
+    errors, left = asyncio.run(main())
+    assert [str(error) for error in errors] == ['boom'] * 3
+    assert left == 0
+
+
+def test_client_coalesces_identical_gets():
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.params['id'])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={
+            'id': request.url.params['id'], 'status': 'completed',
+            'amountTotal': {'amount': 1.0, 'currency': 'RUB'},
+        })
+
+    async def main():
+        async with LavaTop(api_key='key', coalesce=True,
+                           transport=httpx.MockTransport(handler)) as client:
+            return await asyncio.gather(
+                *(client.get_product_by_id('a') for _ in range(10)),
+                client.get_product_by_id('b'),
+            )
+
+    invoices = asyncio.run(main())
+    assert [invoice.id for invoice in invoices] == ['a'] * 10 + ['b']
+    assert sorted(requests) == ['a', 'b']
+
+
+@pytest.mark.parametrize('coalesce', [False, True])
+def test_cancelled_caller_does_not_break_the_others(coalesce):
+    started = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        started.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={'url': 'https://lava.top/d'})
+
+    async def main():
+        async with LavaTop(api_key='key', coalesce=coalesce,
+                           transport=httpx.MockTransport(handler)) as client:
+            first = asyncio.ensure_future(client.get_donate_link())
+            second = asyncio.ensure_future(client.get_donate_link())
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return (await second).url, first.cancelled()
+
+    assert asyncio.run(main()) == ('https://lava.top/d', True)
+    assert len(started) == (1 if coalesce else 2)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+from LavaTopPayment.models.types import ContractStatusDto
+from LavaTopPayment.models.webhooks import WebhookEvent
+from LavaTopPayment.subscriptions import SubscriptionTracker
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _event(status, minutes, contract_id='s1', parent=None,
+           event_type='subscription.recurring.payment.success'):
+    return WebhookEvent(
+        eventType=event_type,
+        contractId=contract_id,
+        parentContractId=parent,
+        product={'id': 'p1'},
+        buyer={'email': 'buyer@example.com'},
+        status=status,
+        timestamp=START + timedelta(minutes=minutes),
+    )
+
+
+def test_late_event_does_not_roll_back_status():
+    with SubscriptionTracker(':memory:') as tracker:
+        tracker.apply(_event(ContractStatusDto.SUBSCRIPTION_CANCELLED, 10))
+        tracker.apply(_event(ContractStatusDto.SUBSCRIPTION_ACTIVE, 5))
+        subscription = tracker.get('s1')
+    assert subscription.status == ContractStatusDto.SUBSCRIPTION_CANCELLED
+    assert subscription.updated == START + timedelta(minutes=10)
+    # Запоздавший платёж всё же учитывается как последний успешный
+    assert subscription.last_payment == START + timedelta(minutes=5)
+    assert subscription.failures == 0
+
+
+def test_recurring_payments_are_linked_by_parent():
+    with SubscriptionTracker(':memory:') as tracker:
+        assert tracker.apply(
+            _event(ContractStatusDto.SUBSCRIPTION_ACTIVE, 0)) == 's1'
+        assert tracker.apply(_event(ContractStatusDto.COMPLETED, 30,
+                                    contract_id='r1', parent='s1')) == 's1'
+        # Разовый платёж без родителя - не событие подписки
+        assert tracker.apply(
+            _event(ContractStatusDto.COMPLETED, 40, contract_id='o1',
+                   event_type='payment.success')) is None
+        subscriptions = tracker.query()
+    assert [s.contract_id for s in subscriptions] == ['s1']
+    assert subscriptions[0].last_payment == START + timedelta(minutes=30)
+    assert subscriptions[0].product_id == 'p1'
+
+
+def test_failures_are_counted_and_reset_by_payment():
+    with SubscriptionTracker(':memory:') as tracker:
+        tracker.apply(_event(ContractStatusDto.SUBSCRIPTION_ACTIVE, 0))
+        for minutes in (10, 20):
+            tracker.apply(_event(ContractStatusDto.FAILED, minutes,
+                                 contract_id=f'r{minutes}', parent='s1'))
+        failed = tracker.get('s1')
+        # Повтор старой неудачи после более нового события не считается
+        tracker.apply(_event(ContractStatusDto.FAILED, 5,
+                             contract_id='r5', parent='s1'))
+        repeated = tracker.get('s1').failures
+        tracker.apply(_event(ContractStatusDto.COMPLETED, 30,
+                             contract_id='r30', parent='s1'))
+        paid = tracker.get('s1')
+    assert failed.status == ContractStatusDto.SUBSCRIPTION_FAILED
+    assert (failed.failures, repeated) == (2, 2)
+    assert paid.status == ContractStatusDto.SUBSCRIPTION_ACTIVE
+    assert paid.failures == 0
+
+
+def test_expire_overdue_and_counts():
+    with SubscriptionTracker(':memory:') as tracker:
+        tracker.apply(_event(ContractStatusDto.SUBSCRIPTION_ACTIVE, 0))
+        tracker.apply(_event(ContractStatusDto.SUBSCRIPTION_ACTIVE, 0,
+                             contract_id='s2'))
+        tracker.apply(_event(ContractStatusDto.COMPLETED, 60 * 24 * 20,
+                             contract_id='r1', parent='s2'))
+        expired = tracker.expire_overdue(timedelta(days=30),
+                                         now=START + timedelta(days=40))
+        counts = tracker.counts()
+    assert expired == 1
+    assert counts == {ContractStatusDto.SUBSCRIPTION_ACTIVE: 1,
+                      ContractStatusDto.SUBSCRIPTION_EXPIRED: 1}
@@ -0,0 +1,182 @@
+import asyncio
+
+import httpx
+
+from LavaTopPayment.tenants import BULK, INTERACTIVE, FairScheduler, \
+    TenantManager
+
+
+def _donate(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={'url': 'https://lava.top/donate'})
+
+
+def test_interactive_goes_before_bulk():
+    async def main():
+        scheduler = FairScheduler(capacity=1, interactive_reserve=0)
+        shop = scheduler.tenant('shop')
+        other = scheduler.tenant('other')
+        first = await shop.acquire('create_invoice')
+        order = []
+
+        async def request(queue, endpoint):
+            kind = await queue.acquire(endpoint)
+            order.append(endpoint)
+            queue.release(kind)
+
+        tasks = [asyncio.ensure_future(request(shop, 'get_sales')),
+                 asyncio.ensure_future(request(other, 'get_products')),
+                 asyncio.ensure_future(request(other, 'create_invoice'))]
+        await asyncio.sleep(0)
+        shop.release(first)
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        return order
+
+    assert asyncio.run(main()) == \
+        ['create_invoice', 'get_sales', 'get_products']
+
+
+def test_bulk_leaves_interactive_reserve():
+    async def main():
+        scheduler = FairScheduler(capacity=4, interactive_reserve=1)
+        shop = scheduler.tenant('shop')
+        kinds = [await shop.acquire('get_sales') for _ in range(3)]
+        bulk = asyncio.ensure_future(shop.acquire('get_sales'))
+        await asyncio.sleep(0)
+        assert not bulk.done()
+        assert scheduler.bulk_in_flight == 3
+        interactive = await asyncio.wait_for(
+            shop.acquire('create_invoice'), 1)
+        assert interactive == INTERACTIVE
+        assert scheduler.in_flight == 4
+        shop.release(kinds[0])
+        assert await asyncio.wait_for(bulk, 1) == BULK
+        return scheduler.bulk_in_flight
+
+    assert asyncio.run(main()) == 3
+
+
+def test_slots_are_shared_by_weight():
+    async def main():
+        scheduler = FairScheduler(capacity=1, interactive_reserve=0)
+        heavy = scheduler.tenant('heavy', weight=2)
+        light = scheduler.tenant('light', weight=1)
+        await heavy.acquire('get_sales')
+        order = []
+
+        async def request(queue):
+            kind = await queue.acquire('get_sales')
+            order.append(queue.tenant_id)
+            await asyncio.sleep(0)
+            queue.release(kind)
+
+        tasks = [asyncio.ensure_future(request(queue))
+                 for queue in (heavy, light) for _ in range(6)]
+        await asyncio.sleep(0)
+        heavy.release(BULK)
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        return order[:9]
+
+    order = asyncio.run(main())
+    assert order.count('heavy') == 6
+    assert order.count('light') == 3
+
+
+def test_removed_busy_queue_is_dropped_after_release():
+    async def main():
+        scheduler = FairScheduler(capacity=1, interactive_reserve=0)
+        shop = scheduler.tenant('shop')
+        kind = await shop.acquire('create_invoice')
+        waiter = asyncio.ensure_future(shop.acquire('create_invoice'))
+        await asyncio.sleep(0)
+        scheduler.remove('shop')
+        assert 'shop' in scheduler.tenants
+        shop.release(kind)
+        shop.release(await waiter)
+        return scheduler.tenants, scheduler.in_flight
+
+    assert asyncio.run(main()) == ({}, 0)
+
+
+def test_removed_queue_with_cancelled_waiter_is_dropped():
+    async def main():
+        scheduler = FairScheduler(capacity=1, interactive_reserve=0)
+        other = scheduler.tenant('other')
+        shop = scheduler.tenant('shop')
+        kind = await other.acquire('create_invoice')
+        waiter = asyncio.ensure_future(shop.acquire('create_invoice'))
+        await asyncio.sleep(0)
+        scheduler.remove('shop')
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        other.release(kind)
+        return list(scheduler.tenants)
+
+    assert asyncio.run(main()) == ['other']
+
+
+def test_remove_tenant_while_request_in_flight():
+    async def main():
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def slow(request: httpx.Request) -> httpx.Response:
+            started.set()
+            await finish.wait()
+            return _donate(request)
+
+        async with TenantManager(
+                transport=httpx.MockTransport(slow)) as manager:
+            manager.add_tenant('shop', api_key='key')
+            request = asyncio.ensure_future(
+                manager.client('shop').get_donate_link())
+            await started.wait()
+            manager.remove_tenant('shop')
+            busy = 'shop' in manager.scheduler.tenants
+            finish.set()
+            await request
+            return busy, dict(manager.scheduler.tenants)
+
+    assert asyncio.run(main()) == (True, {})
+
+
+def test_idle_clients_are_evicted_on_access():
+    async def main():
+        async with TenantManager(transport=httpx.MockTransport(_donate),
+                                 idle_timeout=0.05) as manager:
+            manager.add_tenant('idle', api_key='a')
+            manager.add_tenant('busy', api_key='b')
+            manager.client('idle')
+            manager.client('busy')
+            await asyncio.sleep(0.1)
+            manager.client('busy')
+            return manager.active, manager.evicted
+
+    assert asyncio.run(main()) == (['busy'], 1)
+
+
+def test_idle_clients_are_evicted_on_release():
+    async def main():
+        async with TenantManager(transport=httpx.MockTransport(_donate),
+                                 idle_timeout=0.05) as manager:
+            manager.add_tenant('idle', api_key='a')
+            manager.add_tenant('busy', api_key='b')
+            manager.client('idle')
+            busy = manager.client('busy')
+            await asyncio.sleep(0.1)
+            await busy.get_donate_link()
+            return manager.active
+
+    assert asyncio.run(main()) == ['busy']
+
+
+def test_eviction_is_throttled():
+    async def main():
+        async with TenantManager(transport=httpx.MockTransport(_donate),
+                                 idle_timeout=60) as manager:
+            manager.add_tenant('shop', api_key='a')
+            manager.client('shop')
+            swept = manager._swept
+            manager.client('shop')
+            return manager._swept == swept
+
+    assert asyncio.run(main())
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.webhook_history import WebhookHistoryScanner
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class History:
+    """Заглушка /api/v1/webhook-history со счётчиком запросов"""
+
+    def __init__(self, order: str = 'desc'):
+        self.order = order
+        self.deliveries = []
+        self.requests = 0
+
+    def add(self, count: int, delivered: bool = True) -> None:
+        for _ in range(count):
+            index = len(self.deliveries)
+            self.deliveries.append({
+                'id': f'd{index:06d}',
+                'webhookId': f'w{index % 3}',
+                'isDelivered': delivered,
+                'deliveredAt': None,
+                'lastDeliveryAttemptAt': None,
+                'responseStatus': 200 if delivered else 500,
+                'createdAt': (START + timedelta(seconds=index)).isoformat(),
+            })
+
+    def deliver(self, index: int) -> None:
+        self.deliveries[index]['isDelivered'] = True
+        self.deliveries[index]['responseStatus'] = 200
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        page = int(request.url.params.get('page', 0))
+        size = int(request.url.params.get('size', 20))
+        items = self.deliveries if self.order == 'asc' \
+            else self.deliveries[::-1]
+        return httpx.Response(200, json={
+            'items': items[page * size:(page + 1) * size],
+            'total': len(items), 'page': page, 'size': size,
+        })
+
+
+def _scans(history: History, steps, **options):
+    """Проходы сканера; steps - функции, меняющие историю перед проходом"""
+    async def main():
+        async with LavaTop(api_key='key', transport=httpx.MockTransport(
+                history.handler)) as client:
+            scanner = WebhookHistoryScanner(client, **options)
+            results = []
+            for step in steps:
+                step()
+                before = history.requests
+                result = await scanner.scan()
+                results.append((result, history.requests - before))
+            return scanner, results
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('order, requests', [('desc', 1), ('asc', 3)])
+def test_second_scan_stops_at_cursor(order, requests):
+    history = History(order)
+    _, results = _scans(history, [
+        lambda: history.add(1000),
+        lambda: history.add(7),
+    ], page_size=100)
+    first, second = results
+    assert first[0].new == 1000
+    assert second[0].new == 7
+    assert second[1] <= requests
+
+
+def test_no_new_items_costs_one_request():
+    history = History()
+    _, results = _scans(history, [lambda: history.add(1000), lambda: None],
+                        page_size=100)
+    assert results[1][0].new == 0
+    assert results[1][1] == 1
+
+
+def test_recovered_delivery_is_reported():
+    history = History()
+    _, results = _scans(history, [
+        lambda: (history.add(50), history.add(1, delivered=False),
+                 history.add(20)),
+        lambda: (history.deliver(50), history.add(5)),
+    ], page_size=10)
+    first, second = results
+    assert [record.id for record in first[0].undelivered] == ['d000050']
+    assert [record.id for record in second[0].recovered] == ['d000050']
+    # 5 новых + страница с курсором и ожидающей доставкой
+    assert second[1] == 3
+
+
+def test_recheck_is_bounded_by_budget():
+    history = History()
+    scanner, results = _scans(history, [
+        lambda: (history.add(1, delivered=False), history.add(500)),
+        lambda: history.add(5),
+    ], page_size=10, recheck_pages=2)
+    second = results[1]
+    assert second[0].recovered == []
+    # страница с курсором и не больше recheck_pages сверх неё
+    assert second[1] == 3
+    assert 'd000000' in scanner._pending
+
+
+def test_pending_expires_after_lookback():
+    history = History()
+    scanner, results = _scans(history, [
+        lambda: (history.add(1, delivered=False), history.add(100)),
+        lambda: history.add(100),
+    ], page_size=50, lookback=50)
+    assert 'd000000' not in scanner._pending
+    assert results[1][1] == 3  # только новые, без перепроверки
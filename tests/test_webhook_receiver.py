@@ -0,0 +1,194 @@
+import asyncio
+import base64
+import json
+
+import httpx
+
+from LavaTopPayment.models.types import WebhookAuthTypeDto
+from LavaTopPayment.webhook_receiver import WebhookReceiver
+
+KEY = {'x-api-key': 'secret'}
+
+
+def _body(contract_id='c1', status='completed'):
+    return json.dumps({
+        'eventType': 'payment.success',
+        'contractId': contract_id,
+        'status': status,
+        'timestamp': '2024-10-01T12:00:00+03:00',
+    }).encode()
+
+
+async def _post(receiver, body, headers=KEY):
+    transport = httpx.ASGITransport(app=receiver)
+    async with httpx.AsyncClient(transport=transport,
+                                 base_url='http://receiver') as client:
+        return await client.post('/', content=body, headers=headers)
+
+
+def test_auth_is_checked():
+    async def main():
+        handled = []
+        receiver = WebhookReceiver(handled.append,
+                                   WebhookAuthTypeDto.API_KEY, 'secret')
+        statuses = [
+            (await _post(receiver, _body(), {})).status_code,
+            (await _post(receiver, _body(), {'x-api-key': 'wrong'})
+             ).status_code,
+            (await _post(receiver, _body())).status_code,
+        ]
+        await receiver.stop()
+        return statuses, len(handled), receiver.stats.unauthorized
+
+    assert asyncio.run(main()) == ([401, 401, 200], 1, 2)
+
+
+def test_basic_auth():
+    async def main():
+        receiver = WebhookReceiver(lambda event: None,
+                                   WebhookAuthTypeDto.BASIS, 'login:password')
+        token = base64.b64encode(b'login:password').decode()
+        status = (await _post(receiver, _body(),
+                              {'authorization': f'Basic {token}'})
+                  ).status_code
+        await receiver.stop()
+        return status
+
+    assert asyncio.run(main()) == 200
+
+
+def test_duplicates_are_handled_once():
+    async def main():
+        handled = []
+        receiver = WebhookReceiver(handled.append)
+        statuses = [(await _post(receiver, body)).status_code
+                    for body in (_body(), _body(), _body('c2'))]
+        await receiver.stop()
+        return statuses, [event.contractId for event in handled], \
+            receiver.stats.duplicates
+
+    assert asyncio.run(main()) == ([200, 200, 200], ['c1', 'c2'], 1)
+
+
+def test_invalid_body_is_rejected():
+    async def main():
+        receiver = WebhookReceiver(lambda event: None)
+        statuses = [(await _post(receiver, body)).status_code
+                    for body in (b'{"eventType": ', b'{}')]
+        await receiver.stop()
+        return statuses, receiver.stats.invalid
+
+    assert asyncio.run(main()) == ([400, 400], 2)
+
+
+def test_large_body_is_rejected():
+    async def main():
+        receiver = WebhookReceiver(lambda event: None, max_body=100)
+        chunks = [b' ' * 60, b' ' * 60]
+
+        async def receive():
+            return {'type': 'http.request', 'body': chunks.pop(0),
+                    'more_body': bool(chunks)}
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/',
+                 'headers': []}
+        await receiver(scope, receive, send)
+        await receiver.stop()
+        return sent[0]['status'], receiver.stats.too_large, \
+            receiver.stats.received
+
+    assert asyncio.run(main()) == (413, 1, 0)
+
+
+def test_full_queue_answers_503_with_retry_after():
+    async def main():
+        release = asyncio.Event()
+
+        async def handler(event):
+            await release.wait()
+
+        receiver = WebhookReceiver(handler, queue_size=1, workers=1,
+                                   retry_after=7)
+        first = await _post(receiver, _body('c1'))
+        await asyncio.sleep(0)  # воркер забрал первое событие
+        second = await _post(receiver, _body('c2'))
+        third = await _post(receiver, _body('c3'))
+        release.set()
+        await receiver.stop()
+        # Отклонённое событие не запомнено и примется при повторе
+        retried = await _post(receiver, _body('c3'))
+        await receiver.stop()
+        return [response.status_code
+                for response in (first, second, third, retried)], \
+            third.headers.get('retry-after'), receiver.stats.handled
+
+    assert asyncio.run(main()) == ([200, 200, 503, 200], '7', 3)
+
+
+def test_failed_event_is_acknowledged_by_default():
+    async def main():
+        calls = []
+
+        def handler(event):
+            calls.append(event.contractId)
+            if len(calls) == 1:
+                raise RuntimeError('db is down')
+
+        receiver = WebhookReceiver(handler)
+        first = await _post(receiver, _body())
+        await receiver.stop()
+        second = await _post(receiver, _body())
+        await receiver.stop()
+        return first.status_code, second.status_code, calls, \
+            receiver.stats.failed
+
+    assert asyncio.run(main()) == (200, 200, ['c1', 'c1'], 1)
+
+
+def test_ack_after_handler_reports_failure():
+    async def main():
+        calls = []
+
+        async def handler(event):
+            calls.append(event.contractId)
+            if len(calls) == 1:
+                raise RuntimeError('db is down')
+
+        receiver = WebhookReceiver(handler, ack_after_handler=True)
+        statuses = [(await _post(receiver, _body())).status_code
+                    for _ in range(3)]
+        await receiver.stop()
+        return statuses, calls, receiver.stats.duplicates
+
+    assert asyncio.run(main()) == ([500, 200, 200], ['c1', 'c1'], 1)
+
+
+def test_lifespan_starts_and_drains_workers():
+    async def main():
+        handled = []
+        receiver = WebhookReceiver(handled.append, workers=2)
+        messages = asyncio.Queue()
+        sent = []
+
+        async def send(message):
+            sent.append(message['type'])
+
+        lifespan = asyncio.ensure_future(
+            receiver({'type': 'lifespan'}, messages.get, send))
+        await messages.put({'type': 'lifespan.startup'})
+        await asyncio.sleep(0)
+        workers = len(receiver._tasks)
+        for i in range(5):
+            receiver.accept(_body(f'c{i}'))
+        await messages.put({'type': 'lifespan.shutdown'})
+        await asyncio.wait_for(lifespan, 1)
+        return workers, sent, len(handled), receiver._tasks
+
+    assert asyncio.run(main()) == (
+        2, ['lifespan.startup.complete', 'lifespan.shutdown.complete'], 5, []
+    )
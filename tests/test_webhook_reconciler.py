@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timezone
+
+from LavaTopPayment.emulator import Faults, GatewayEmulator
+from LavaTopPayment.lava_top import LavaTop
+from LavaTopPayment.models.types import WebhookAuthTypeDto, \
+    WebhookEventTypeDto
+from LavaTopPayment.models.webhooks import WebhookAuthRequest, \
+    WebhookResponse
+from LavaTopPayment.webhook_reconciler import CREATE, DELETE, UPDATE, \
+    WebhookReconciler, WebhookSpec
+
+PAYMENTS = WebhookEventTypeDto.PAYMENT_RESULT
+RECURRENT = WebhookEventTypeDto.RECURRENT_PAYMENT
+
+
+def _webhook(id, url='https://shop/hook', event_type=PAYMENTS,
+             name='payments', active=True, **times) -> WebhookResponse:
+    return WebhookResponse(id=id, name=name, apiKeyId='key', url=url,
+                           eventType=event_type, isActive=active,
+                           authType=WebhookAuthTypeDto.NONE, **times)
+
+
+def _spec(url='https://shop/hook', event_type=PAYMENTS, name='payments',
+          **kwargs) -> WebhookSpec:
+    return WebhookSpec(url, event_type, 'key', name, **kwargs)
+
+
+def test_duplicates_with_naive_and_aware_times():
+    reconciler = WebhookReconciler(None, [_spec()])
+    plan = reconciler.diff([
+        _webhook('old', updatedAt=datetime(2024, 1, 1,
+                                           tzinfo=timezone.utc)),
+        _webhook('new', updatedAt=datetime(2024, 6, 1)),
+        _webhook('created', createdAt=datetime(2024, 3, 1)),
+        _webhook('undated'),
+    ])
+    assert [(action.kind, action.webhook_id) for action in plan.actions] \
+        == [(DELETE, 'created'), (DELETE, 'old'), (DELETE, 'undated')]
+    assert plan.unchanged == 1
+
+
+def test_active_duplicate_is_kept_over_newer_inactive():
+    reconciler = WebhookReconciler(None, [_spec()])
+    plan = reconciler.diff([
+        _webhook('inactive', active=False,
+                 updatedAt=datetime(2025, 1, 1, tzinfo=timezone.utc)),
+        _webhook('active', createdAt=datetime(2024, 1, 1)),
+    ])
+    assert [action.webhook_id for action in plan.deletes] == ['inactive']
+
+
+def test_diff_sends_only_changed_fields():
+    auth = WebhookAuthRequest(authType=WebhookAuthTypeDto.API_KEY,
+                              authValue='secret')
+    reconciler = WebhookReconciler(None, [
+        _spec(name='renamed'),
+        _spec(event_type=RECURRENT, auth_config=auth),
+        _spec(url='https://shop/new'),
+    ], prune=False)
+    plan = reconciler.diff([
+        _webhook('a'),
+        _webhook('b', event_type=RECURRENT, name='payments'),
+        _webhook('stale', url='https://shop/stale'),
+    ])
+    assert [(action.kind, action.webhook_id, action.changes)
+            for action in plan.updates] == [
+        (UPDATE, 'a', {'name': 'renamed'}),
+        (UPDATE, 'b', {'auth_config': auth}),
+    ]
+    assert [action.changes['url'] for action in plan.creates] == \
+        ['https://shop/new']
+    assert not plan.deletes
+    assert str(plan).endswith(
+        '1 to create, 2 to update, 0 to delete, 0 unchanged')
+
+
+def test_apply_converges_against_emulator():
+    async def main():
+        emulator = GatewayEmulator(settle_after=None, webhook_list=True)
+        async with LavaTop(api_key='key',
+                           transport=emulator.transport()) as client:
+            await client.create_webhook('https://shop/stale', 'stale', 'key',
+                                        PAYMENTS)
+            reconciler = WebhookReconciler(client, [
+                _spec(), _spec(event_type=RECURRENT, is_active=False),
+            ])
+            plan = await reconciler.plan()
+            results = await reconciler.apply(plan)
+            webhooks = await client.list_webhooks()
+            return plan, results, webhooks, await reconciler.plan()
+
+    plan, results, webhooks, again = asyncio.run(main())
+    assert [action.kind for action in plan.actions] == \
+        [CREATE, CREATE, DELETE]
+    assert all(result.ok for result in results)
+    assert sorted((webhook.eventType, webhook.isActive)
+                  for webhook in webhooks) == \
+        sorted([(PAYMENTS, True), (RECURRENT, False)])
+    assert not again
+
+
+def test_failed_create_skips_deletes():
+    async def main():
+        emulator = GatewayEmulator(settle_after=None, webhook_list=True)
+        async with LavaTop(api_key='key',
+                           transport=emulator.transport()) as client:
+            await client.create_webhook('https://shop/stale', 'stale', 'key',
+                                        PAYMENTS)
+            emulator.endpoint_faults['create_webhook'] = Faults(
+                error_rate=1.0, error_status=400)
+            results = await WebhookReconciler(client, [_spec()]).apply()
+            return results, len(await client.list_webhooks())
+
+    results, remaining = asyncio.run(main())
+    assert [result.ok for result in results] == [False]
+    assert remaining == 1